@@ -6,11 +6,11 @@ from .extra import (
     ai_signals,
     casablanca_companies,
     casablanca_companies_search,
-    get_market_pulse,
+    market_pulse,
     news,
     portfolio,
 )
-from .market import get_market_overview
+from .market_data import get_market_overview
 
 
 router = APIRouter(tags=["Compat"])
@@ -24,7 +24,7 @@ router.add_api_route(
 )
 router.add_api_route(
     "/market-pulse",
-    get_market_pulse,
+    market_pulse,
     methods=["GET"],
     name="compat_market_pulse",
 )
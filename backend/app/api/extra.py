@@ -9,7 +9,7 @@ import time
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request
-from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -17,12 +17,21 @@ from sqlalchemy import func
 from ..db import models
 from ..db.database import get_db
 from ..services.challenge_engine import ChallengeEngine
-from .market_data import get_market_overview as market_overview_handler
+from ..services.fill_prices import fill_prices
+from .market_data import binary_response, encoded_response, market_data_service, wire_format
 from ..services.ai_service import AIService
+from ..services.bvc_sectors import sector_aggregator
 from ..services.caching import cache
 from ..services.access_control import require_funded_account
-from ..services.casablanca_service import get_casablanca_live_data
+from ..services.candles import CANDLE_CAPACITY, CANDLE_INTERVALS
+from ..services.casablanca_service import bvc_broadcaster, get_casablanca_live_data
+from ..services.instruments import MARKET_BVC, MARKETS
+from ..services.market_movers import ALL_MARKETS
+from ..services.market_scraper import bvc_indices
 from ..services.news_service import NewsService
+from ..services.quote_store import normalize_symbol
+from ..services.search_index import instrument_search
+from ..services.wire_formats import MEDIA_JSON, columns_from_rows, encode_columns
 
 try:
     import requests
@@ -32,6 +41,8 @@ except Exception:
 
 router = APIRouter(prefix="/api", tags=["Extras"])
 
+BVC_STREAM_KEEPALIVE_SECONDS = 15.0
+
 
 def require_admin(
     db: Session = Depends(get_db),
@@ -140,7 +151,8 @@ class TradeRequest(BaseModel):
     asset: str
     side: str
     quantity: float
-    price: float
+    # Ignored: trades fill at the server's price (see fill_prices).
+    price: Optional[float] = None
     market: Optional[str] = None
     take_profit: Optional[float] = None
     stop_loss: Optional[float] = None
@@ -370,23 +382,36 @@ def _activate_challenge(
     return {"status": "success", "account_id": new_account.id}
 
 
-@cache(ttl_seconds=int(os.environ.get("MARKET_PULSE_TTL", "8")))
 async def get_market_pulse() -> Dict[str, Any]:
-    assets = await market_overview_handler()
-    movers = [a for a in assets if a.get("change_pct") is not None]
-    movers.sort(key=lambda item: item.get("change_pct", 0), reverse=True)
-    gainers = movers[:5]
-    losers = list(reversed(movers[-5:]))
-    return {
-        "timestamp": int(time.time()),
-        "gainers": gainers,
-        "losers": losers,
-    }
+    snapshot = await market_data_service.get_market_snapshot_async()
+    return snapshot.pulse
 
 
 @router.get("/market-pulse")
-async def market_pulse() -> Dict[str, Any]:
-    return await get_market_pulse()
+async def market_pulse(
+    request: Request,
+    market: Optional[str] = Query(None),
+    k: int = Query(5, ge=1, le=50),
+) -> Response:
+    """
+    Top-k gainers and losers with advancers/decliners breadth, read from the
+    movers index the snapshot publisher keeps up to date. `market` narrows it
+    to one market of the instrument registry (full name, or `bvc`); a known
+    market without quoted movers has empty gainers and losers.
+    """
+    snapshot = await market_data_service.get_market_snapshot_async()
+    headers = {"X-Snapshot-Status": snapshot.status}
+    if market is None and k == 5:
+        return encoded_response(request, snapshot.encoded("pulse"), headers)
+    key = ALL_MARKETS
+    if market is not None:
+        names = {name.lower(): name for name in MARKETS}
+        names.update({"bvc": MARKET_BVC, "all": ALL_MARKETS, ALL_MARKETS: ALL_MARKETS})
+        key = names.get(market.strip().lower())
+        if key is None:
+            raise HTTPException(status_code=400, detail=f"Unknown market, expected one of: {', '.join(sorted(names))}")
+    body = snapshot.encoded(f"pulse:{key}:{k}", lambda current: current.market_pulse(key, k))
+    return encoded_response(request, body, headers)
 
 
 @cache(ttl_seconds=int(os.environ.get("BVC_CACHE_TTL", "10")))
@@ -396,10 +421,12 @@ async def get_casablanca_companies() -> Dict[str, Any]:
 
 @router.get("/casablanca/companies")
 async def casablanca_companies(
+    request: Request,
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
     minimal: bool = False,
 ) -> Dict[str, Any]:
+    media_type = wire_format(request)
     result = await get_casablanca_companies()
     items = result.get("data", []) if isinstance(result, dict) else []
 
@@ -417,6 +444,10 @@ async def casablanca_companies(
             for item in items
         ]
 
+    if media_type != MEDIA_JSON:
+        metadata = {"status": result.get("status", "success"), "total": total, "limit": limit, "offset": offset}
+        return binary_response(encode_columns(columns_from_rows(items), media_type, metadata), media_type)
+
     return {
         "status": result.get("status", "success"),
         "total": total,
@@ -433,16 +464,15 @@ async def casablanca_companies_search(
     offset: int = Query(0, ge=0),
     minimal: bool = False,
 ) -> Dict[str, Any]:
+    """
+    Companies whose ticker, name or sector contains `query` (accents and
+    case ignored), best matches first.
+    """
     result = await get_casablanca_companies()
     items = result.get("data", []) if isinstance(result, dict) else []
 
-    needle = query.strip().lower()
-    filtered = [
-        item for item in items
-        if needle in str(item.get("ticker", "")).lower()
-        or needle in str(item.get("label", "")).lower()
-        or needle in str(item.get("sector", "")).lower()
-    ]
+    matches = instrument_search.index(items).search(query, MARKET_BVC)
+    filtered = instrument_search.board_items(document["symbol"] for document in matches)
 
     total = len(filtered)
     filtered = filtered[offset:offset + limit]
@@ -466,6 +496,35 @@ async def casablanca_companies_search(
         "items": filtered,
     }
 
+@router.get("/casablanca/sectors")
+async def casablanca_sectors() -> Dict[str, Any]:
+    """
+    Per-sector constituents, advancers/decliners, average and price-weighted
+    variation and synthetic index level, precomputed at each BVC refresh.
+    """
+    result = await get_casablanca_companies()
+    return sector_aggregator.payload(result if isinstance(result, dict) else {})
+
+
+@router.get("/casablanca/sectors/{slug}/history")
+def casablanca_sector_history(
+    slug: str,
+    interval: str = Query("1d"),
+    points: int = Query(30, ge=1, le=CANDLE_CAPACITY),
+) -> Dict[str, Any]:
+    """
+    Synthetic index of one sector (slug as returned by /casablanca/sectors):
+    daily closes for `1d`, bars built from the recorded levels for `1m`,
+    `5m` and `1h`.
+    """
+    slug = slug.strip().upper()
+    if interval in CANDLE_INTERVALS:
+        return {"slug": slug, "interval": interval, "bars": sector_aggregator.store.bars(slug, CANDLE_INTERVALS[interval], points)}
+    if interval != "1d":
+        raise HTTPException(status_code=400, detail=f"Unsupported interval, expected one of: 1d, {', '.join(CANDLE_INTERVALS)}")
+    return {"slug": slug, "interval": interval, "closes": sector_aggregator.store.daily_closes(slug, points)}
+
+
 @router.get("/news")
 def news() -> List[Dict[str, Any]]:
     return NewsService.get_latest()
@@ -587,7 +646,11 @@ def payment_history(user_id: int, db: Session = Depends(get_db)) -> List[Dict[st
 
 
 @router.post("/trade")
-def execute_trade(payload: TradeRequest, db: Session = Depends(get_db)) -> Dict[str, Any]:
+async def execute_trade(payload: TradeRequest, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    """
+    Fills the trade at the server's price (see fill_prices); the database
+    work runs in a worker thread so a slow fill never blocks the loop.
+    """
     asset = payload.asset.strip()
     side = payload.side.strip().lower()
     if not asset:
@@ -596,16 +659,23 @@ def execute_trade(payload: TradeRequest, db: Session = Depends(get_db)) -> Dict[
         return {"error": "Invalid side (use buy or sell)"}
     if payload.quantity <= 0:
         return {"error": "Quantity must be greater than 0"}
-    if payload.price <= 0:
-        return {"error": "Price must be greater than 0"}
+    symbol = normalize_symbol(asset)
+    if symbol is None:
+        return {"error": f"Unknown asset {asset}"}
+    fill = await fill_prices.price_async(symbol)
+    if fill is None:
+        return {"error": f"No current price available for {symbol}"}
+    return await asyncio.to_thread(_fill_trade, db, payload, side, symbol, fill)
 
+
+def _fill_trade(db: Session, payload: TradeRequest, side: str, symbol: str, fill: Dict[str, Any]) -> Dict[str, Any]:
     result = ChallengeEngine.process_trade(
         db,
         payload.account_id,
-        asset,
+        symbol,
         side,
         payload.quantity,
-        payload.price,
+        fill["price"],
         payload.market,
         payload.take_profit,
         payload.stop_loss,
@@ -618,6 +688,8 @@ def execute_trade(payload: TradeRequest, db: Session = Depends(get_db)) -> Dict[
     if account:
         ChallengeEngine.evaluate_account_celery(db, account)
 
+    if isinstance(result, dict):
+        result = {**result, "fill": fill}
     return result
 
 
@@ -807,13 +879,48 @@ async def bvc_overview() -> Dict[str, Any]:
     return await asyncio.to_thread(get_casablanca_live_data)
 
 
+@router.get("/bvc/indices")
+def bvc_indices_overview() -> Dict[str, Any]:
+    """
+    Casablanca indices, market capitalisation and volume, and the top
+    movers, from the scheduled browser scrape. Never scrapes inline.
+    """
+    return bvc_indices.payload()
+
+
 @router.get("/bvc/stream")
-async def bvc_stream(interval: float = Query(5.0, ge=3.0, le=60.0)) -> StreamingResponse:
+async def bvc_stream(
+    request: Request,
+    interval: float = Query(5.0, ge=3.0, le=60.0),
+) -> StreamingResponse:
     async def event_stream():
-        while True:
-            data = await asyncio.to_thread(get_casablanca_live_data)
-            yield f"data: {json.dumps(data)}\n\n"
-            await asyncio.sleep(interval)
+        subscription = bvc_broadcaster.subscribe()
+        last_sent = 0.0
+        try:
+            while not await request.is_disconnected():
+                try:
+                    data = await subscription.get(timeout=BVC_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if data is None:
+                    # Dropped as a slow consumer; the client reconnects.
+                    break
+                # Honour the client's interval by sending only the newest payload,
+                # draining the queue meanwhile so a long interval is never mistaken
+                # for a slow consumer. Only a client that stops reading fills it.
+                deadline = last_sent + interval
+                while data is not None and time.monotonic() < deadline:
+                    try:
+                        data = await subscription.get(timeout=deadline - time.monotonic())
+                    except asyncio.TimeoutError:
+                        break
+                if data is None:
+                    break
+                last_sent = time.monotonic()
+                yield b"data: " + data + b"\n\n"
+        finally:
+            bvc_broadcaster.unsubscribe(subscription)
 
     return StreamingResponse(
         event_stream(),
@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
 
 from ..services.casablanca_service import get_casablanca_live_data
 
@@ -14,10 +16,21 @@ async def get_casablanca_market():
     return get_casablanca_live_data()
 
 
-async def get_market_overview(minimal: bool = False):
+async def get_market_overview(request: Request, minimal: bool = Query(False), sparkline: Optional[int] = Query(None)):
     """
     Backward-compatible wrapper for legacy imports.
     """
     from .market_data import get_market_overview as _market_overview
 
-    return await _market_overview(minimal=minimal)
+    # Called directly, so FastAPI does not fill the paging parameters in.
+    return await _market_overview(
+        request,
+        minimal=minimal,
+        sparkline=sparkline,
+        market=None,
+        currency=None,
+        sort=None,
+        direction=None,
+        limit=None,
+        cursor=None,
+    )
@@ -1,6 +1,35 @@
-from fastapi import APIRouter, Query
+from typing import Any, Dict, Optional
 
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+from ..services.bvc_ticks import bvc_tick_store
+from ..services.candles import (
+    CANDLE_CAPACITY,
+    CANDLE_INTERVALS,
+    MAX_SPARKLINE_POINTS,
+    candle_store,
+    overview_with_sparklines,
+    sparkline_key,
+)
+from ..services.downsampling import DOWNSAMPLE_METHODS, downsample
+from ..services.instruments import MARKET_BVC, MARKETS, instrument_registry
 from ..services.market_data import MarketDataService
+from ..services.market_movers import ALL_MARKETS
+from ..services.market_snapshot import MINIMAL_FIELDS, EncodedBody, market_snapshot_publisher, minimal_asset
+from ..services.market_views import MAX_PAGE_SIZE, SORT_KEYS, TEXT_SORT_KEYS, decode_cursor, encode_cursor
+from ..services.metrics import metrics
+from ..services.quote_store import normalize_symbol, quote_store
+from ..services.search_index import instrument_search
+from ..services.trading_calendar import trading_calendar
+from ..services.wire_formats import (
+    MEDIA_JSON,
+    columns_from_rows,
+    encode_columns,
+    history_columns,
+    is_available,
+    negotiate,
+)
 
 
 router = APIRouter(
@@ -10,45 +39,359 @@ router = APIRouter(
 
 market_data_service = MarketDataService()
 
+STREAM_KEEPALIVE_SECONDS = 15.0
+# Binance klines cap a request at 1000 bars.
+MAX_HISTORY_POINTS = 1000
+MAX_LEGACY_TICKERS = 50
+
+
+def encoded_response(
+    request: Request,
+    body: EncodedBody,
+    headers: Optional[Dict[str, str]] = None,
+    media_type: str = MEDIA_JSON,
+) -> Response:
+    """
+    Serves a pre-encoded snapshot payload, answering If-None-Match with 304.
+    """
+    content, encoding = body.negotiate(request.headers.get("accept-encoding"))
+    response_headers = {
+        "ETag": body.etag(encoding),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept, Accept-Encoding",
+        **(headers or {}),
+    }
+    if body.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=response_headers)
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type=media_type, headers=response_headers)
+
+
+def wire_format(request: Request) -> str:
+    """
+    Media type negotiated from the Accept header; 406 when a binary format
+    is asked for but its library is not installed.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    if not is_available(media_type):
+        raise HTTPException(status_code=406, detail=f"{media_type} is not available on this server")
+    return media_type
+
+
+def binary_response(content: bytes, media_type: str) -> Response:
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
+
 
 @router.get("/market-overview")
-async def get_market_overview(minimal: bool = Query(False)):
+async def get_market_overview(
+    request: Request,
+    minimal: bool = Query(False),
+    sparkline: Optional[int] = Query(None, ge=2, le=MAX_SPARKLINE_POINTS),
+    market: Optional[str] = Query(None),
+    currency: Optional[str] = Query(None),
+    sort: Optional[str] = Query(None),
+    direction: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+):
     """
     Provides a full overview of all markets, including Nasdaq, Crypto, Forex,
-    and Bourse de Casablanca. Results are cached for 15 seconds.
-    """
-    assets = await market_data_service.get_market_universe_async()
-    if not minimal:
-        return assets
-    return [
-        {
-            "symbol": asset.get("symbol"),
-            "name": asset.get("name"),
-            "market": asset.get("market"),
-            "currency": asset.get("currency"),
-            "price": asset.get("price"),
-            "change_pct": asset.get("change_pct"),
+    and Bourse de Casablanca. The payload is serialised and compressed once per
+    snapshot refresh and served with an ETag. X-Snapshot-Status is `stale`
+    while a warm-started checkpoint is served. `sparkline=N` adds an N-point
+    series of recent closes per asset from the local candle store.
+
+    Any of `market`, `currency`, `sort`, `direction`, `limit` or `cursor`
+    switches to one page of the filtered, sorted universe (see
+    `_overview_page`) instead of every asset.
+
+    Clients that send `Accept: application/msgpack` or
+    `application/vnd.apache.arrow.stream` get the universe column-wise.
+    """
+    media_type = wire_format(request)
+    snapshot = await market_data_service.get_market_snapshot_async()
+    if any(value is not None for value in (market, currency, sort, direction, limit, cursor)):
+        return _overview_page(
+            request, media_type, snapshot, minimal, sparkline, market, currency, sort, direction, limit, cursor
+        )
+    if media_type != MEDIA_JSON:
+        fields = MINIMAL_FIELDS if minimal else None
+        body = snapshot.encoded(
+            f"overview{':minimal' if minimal else ''}:{media_type}",
+            lambda current: columns_from_rows(current.assets, fields),
+            lambda columns: encode_columns(columns, media_type, {"seq": snapshot.seq, "status": snapshot.status}),
+        )
+        return encoded_response(request, body, {"X-Snapshot-Status": snapshot.status}, media_type)
+    if sparkline:
+        body = snapshot.encoded(
+            sparkline_key(sparkline, minimal),
+            lambda current: overview_with_sparklines(current, sparkline, minimal),
+        )
+    else:
+        body = snapshot.encoded("overview:minimal" if minimal else "overview")
+    return encoded_response(request, body, {"X-Snapshot-Status": snapshot.status})
+
+
+def _overview_page(
+    request: Request,
+    media_type: str,
+    snapshot,
+    minimal: bool,
+    sparkline: Optional[int],
+    market: Optional[str],
+    currency: Optional[str],
+    sort: Optional[str],
+    direction: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> Response:
+    """
+    One page of the universe, read from the snapshot's sorted views: `market`
+    (or `all`), `currency`, `sort` (one of SORT_KEYS, default `change_pct`),
+    `direction` (`asc`/`desc`, default `desc` for numbers and `asc` for
+    text), `limit` rows (default 50). Rows without a value for the sort key
+    come last. `next_cursor` resumes after the last row, also across
+    snapshot refreshes; first pages are encoded once per snapshot.
+    """
+    key = ALL_MARKETS
+    if market is not None:
+        names = {name.lower(): name for name in (snapshot.movers.markets() if snapshot.movers else [])}
+        names.update({asset.get("market").lower(): asset.get("market") for asset in snapshot.assets if asset.get("market")})
+        names.update({name.lower(): name for name in MARKETS})
+        names.update({"bvc": MARKET_BVC, "all": ALL_MARKETS, ALL_MARKETS: ALL_MARKETS})
+        key = names.get(market.strip().lower())
+        if key is None:
+            raise HTTPException(status_code=400, detail=f"Unknown market, expected one of: {', '.join(sorted(names))}")
+    currency = currency.strip().upper() if currency and currency.strip() else None
+    sort = sort or "change_pct"
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort, expected one of: {', '.join(SORT_KEYS)}")
+    direction = (direction or ("asc" if sort in TEXT_SORT_KEYS else "desc")).lower()
+    if direction not in {"asc", "desc"}:
+        raise HTTPException(status_code=400, detail="Unsupported direction, expected asc or desc")
+    limit = limit or 50
+    query = (key, currency, sort, direction)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, query, sort)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    def build(current) -> Dict[str, Any]:
+        view = current.views.view(key, currency, sort)
+        symbols, last = view.page(direction == "desc", limit, after)
+        rows = [current.by_symbol[symbol] for symbol in symbols]
+        if minimal:
+            rows = [minimal_asset(row) for row in rows]
+        if sparkline:
+            lines = candle_store.sparklines(symbols, sparkline) if candle_store.enabled else {}
+            rows = [{**row, "sparkline": lines.get(row.get("symbol"), [])} for row in rows]
+        return {
+            "seq": current.seq,
+            "status": current.status,
+            "total": len(view),
+            "limit": limit,
+            "next_cursor": encode_cursor(query, last) if last is not None else None,
+            "items": rows,
         }
-        for asset in assets
-    ]
+
+    headers = {"X-Snapshot-Status": snapshot.status}
+    if media_type != MEDIA_JSON:
+        page = build(snapshot)
+        items = page.pop("items")
+        return binary_response(encode_columns(columns_from_rows(items), media_type, page), media_type)
+    if after is not None or not snapshot.views.has_currency(currency):
+        return encoded_response(request, EncodedBody(build(snapshot)), headers)
+    page_key = f"page:{key}:{currency}:{sort}:{direction}:{limit}:{int(minimal)}:{sparkline or 0}"
+    return encoded_response(request, snapshot.encoded(page_key, build), headers)
+
+
+def _sse_frame(event: str, cursor: str, data: bytes) -> bytes:
+    return b"id: " + cursor.encode() + b"\nevent: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+@router.get("/market-overview/stream")
+async def stream_market_overview(
+    request: Request,
+    last_seq: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None),
+) -> StreamingResponse:
+    """
+    Server-sent events: one `snapshot` event with the full universe, then
+    `delta` events carrying only the symbols whose fields changed. Event ids
+    are `<epoch>:<seq>`; reconnecting with Last-Event-ID (or `last_seq`)
+    resumes from the delta history instead of resending the universe.
+    """
+    publisher = market_snapshot_publisher
+    resume_from = publisher.parse_cursor(last_event_id or last_seq)
+
+    async def event_stream():
+        market_data_service.open_snapshot_stream()
+        try:
+            snapshot = await market_data_service.get_market_snapshot_async()
+            yield b"retry: 3000\n\n"
+            deltas = publisher.deltas_since(resume_from) if resume_from is not None else None
+            if deltas is None:
+                seq = snapshot.seq
+                yield _sse_frame("snapshot", publisher.cursor(seq), snapshot.encoded("overview").identity)
+            else:
+                seq = resume_from
+                for delta_seq, body in deltas:
+                    seq = delta_seq
+                    yield _sse_frame("delta", publisher.cursor(delta_seq), body)
+            while not await request.is_disconnected():
+                if not await publisher.wait_for_publish(seq, STREAM_KEEPALIVE_SECONDS):
+                    yield b": keep-alive\n\n"
+                    continue
+                deltas = publisher.deltas_since(seq)
+                if deltas is None:
+                    snapshot = publisher.current
+                    seq = snapshot.seq
+                    yield _sse_frame("snapshot", publisher.cursor(seq), snapshot.encoded("overview").identity)
+                    continue
+                for delta_seq, body in deltas:
+                    seq = delta_seq
+                    yield _sse_frame("delta", publisher.cursor(delta_seq), body)
+        finally:
+            market_data_service.close_snapshot_stream()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/market-sessions")
+def get_market_sessions():
+    """
+    Session state of each market and the quote refresh interval it implies.
+    """
+    return trading_calendar.sessions()
+
+
+@router.get("/instruments/search")
+def search_instruments(
+    query: str = Query(..., min_length=1, max_length=64),
+    market: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Ranked search over every instrument (Bourse de Casablanca, Nasdaq,
+    crypto, forex) by symbol, name or sector, accents and case ignored.
+    Prices come from the current snapshot when it has the symbol.
+    """
+    snapshot = market_snapshot_publisher.current
+    by_symbol = snapshot.by_symbol if snapshot is not None else {}
+    matches = instrument_search.index().search(query, market)
+    items = []
+    for document in matches[:limit]:
+        asset = by_symbol.get(document["symbol"]) or {}
+        items.append({**document, "price": asset.get("price"), "change_pct": asset.get("change_pct")})
+    return {"query": query, "total": len(matches), "items": items}
+
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    Process-local request counters and latency histograms of this worker.
+    """
+    return metrics.snapshot()
 
 
 @router.get("/market-history")
-async def get_market_history(symbols: str, points: int = 20):
+async def get_market_history(
+    request: Request,
+    symbols: str,
+    points: int = 20,
+    interval: str = Query("1d"),
+    width: Optional[int] = Query(None, ge=3, le=4000),
+    method: str = Query("lttb"),
+    start: Optional[int] = Query(None),
+    end: Optional[int] = Query(None),
+):
     """
     Provides historical data for a list of symbols.
-    Results are cached for 60 seconds.
+    `1d` returns daily closes (cached for 60 seconds); `1m`, `5m` and `1h`
+    return OHLCV bars aggregated from the live snapshots of this worker,
+    optionally limited to bars between `start` and `end` (epoch seconds;
+    rejected for `1d`).
+    Bourse de Casablanca symbols are served from the recorded board ticks
+    for every interval (daily closes for `1d`).
+
+    With `width` (the chart's pixel budget) the raw budget no longer comes
+    from `points`: up to MAX_HISTORY_POINTS daily closes (CANDLE_CAPACITY
+    bars) are read and downsampled to at most `width` points with `lttb` or
+    `minmax`. Binary formats (see /market-overview) return one row per
+    point in long format.
     """
-    symbol_list = [s.strip() for s in symbols.split(",") if s.strip()]
-    symbol_list = symbol_list[:50]
-    points = min(max(points, 5), 100)
-    return await market_data_service.get_history_cached_async(symbol_list, points)
+    media_type = wire_format(request)
+    history = await _market_history(symbols, points, interval, width, method, start, end)
+    if media_type == MEDIA_JSON:
+        return history
+    return binary_response(encode_columns(history_columns(history), media_type, {"interval": interval}), media_type)
+
+
+async def _market_history(
+    symbols: str,
+    points: int,
+    interval: str,
+    width: Optional[int],
+    method: str,
+    start: Optional[int],
+    end: Optional[int],
+) -> Dict[str, list]:
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported method, expected one of: {', '.join(DOWNSAMPLE_METHODS)}")
+    symbol_list = [instrument_registry.canonical_symbol(s) for s in symbols.split(",") if s.strip()]
+    symbol_list = list(dict.fromkeys(symbol_list))[:50]
+    if interval in CANDLE_INTERVALS:
+        ranged = width or start is not None or end is not None
+        limit = CANDLE_CAPACITY if ranged else min(max(points, 5), CANDLE_CAPACITY)
+        bvc = {symbol for symbol in symbol_list if instrument_registry.market_of(symbol) == MARKET_BVC}
+        history = candle_store.history([symbol for symbol in symbol_list if symbol not in bvc], interval, limit)
+        if start is not None or end is not None:
+            lower = start if start is not None else 0
+            upper = end if end is not None else float("inf")
+            history = {symbol: [bar for bar in bars if lower <= bar["time"] <= upper] for symbol, bars in history.items()}
+        # BVC bars come from the recorded board ticks, which survive restarts.
+        for symbol in bvc:
+            history[symbol] = bvc_tick_store.bars(symbol, CANDLE_INTERVALS[interval], limit, start, end)
+        history = {symbol: history[symbol] for symbol in symbol_list}
+        if width:
+            history = {
+                symbol: downsample(bars, width, method, key=lambda bar: bar["close"], x=[bar["time"] for bar in bars])
+                for symbol, bars in history.items()
+            }
+        return history
+    if interval != "1d":
+        raise HTTPException(status_code=400, detail=f"Unsupported interval, expected one of: 1d, {', '.join(CANDLE_INTERVALS)}")
+    if start is not None or end is not None:
+        # Daily closes carry no timestamps to filter on.
+        raise HTTPException(status_code=400, detail=f"start and end are only supported with interval {', '.join(CANDLE_INTERVALS)}")
+    if not width:
+        points = min(max(points, 5), 100)
+        return await market_data_service.get_history_cached_async(symbol_list, points)
+    history = await market_data_service.get_history_cached_async(symbol_list, MAX_HISTORY_POINTS)
+    return {symbol: downsample(series, width, method) for symbol, series in history.items()}
 
 
 @router.get("/market-data")
 async def get_legacy_market_data(tickers: str = "BTC-USD,AAPL,IAM"):
-    """Legacy endpoint. Prefers /market-overview."""
-    ticker_list = [s.strip() for s in tickers.split(",") if s.strip()]
-    snapshot = await market_data_service.get_yahoo_snapshot_async(ticker_list)
-    prices = {ticker: data.get("price") for ticker, data in snapshot.items()}
-    return prices
+    """
+    Legacy endpoint. Prefers /market-overview.
+    Reads at most MAX_LEGACY_TICKERS tickers from the shared quote store;
+    tickers outside the market universe are fetched in the background and
+    left out of the answer until their quote arrives.
+    """
+    ticker_list = [s.strip() for s in tickers.split(",") if s.strip()][:MAX_LEGACY_TICKERS]
+    canonical = {ticker: normalize_symbol(ticker) for ticker in ticker_list}
+    snapshot = await market_data_service.get_market_snapshot_async()
+    quotes, _ = quote_store.lookup(snapshot, list(dict.fromkeys(symbol for symbol in canonical.values() if symbol)))
+    return {
+        ticker: quotes[symbol].get("price")
+        for ticker, symbol in canonical.items()
+        if symbol and quotes.get(symbol) is not None
+    }
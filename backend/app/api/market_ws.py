@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from ..services.broadcaster import Subscription
+from ..services.casablanca_service import bvc_broadcaster
+from ..services.market_gateway import GatewaySession, encode_message
+from ..services.market_snapshot import market_snapshot_publisher
+from .market_data import market_data_service
+
+
+router = APIRouter(
+    prefix="/api",
+    tags=["Market Data"],
+)
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.environ.get("WS_FLUSH_INTERVAL", "1.0"))
+KEEPALIVE_SECONDS = 15.0
+MAX_MESSAGE_BYTES = 16 * 1024
+
+
+@router.websocket("/ws/market")
+async def market_socket(websocket: WebSocket):
+    """
+    One multiplexed connection for all live market data. Clients send
+    `{"op": "subscribe" | "unsubscribe", "topics": [...]}` and `{"op": "ping"}`;
+    topics are `symbols:<a,b,...>`, `market:<name>` (`market:*`), `pulse` and
+    `bvc`. Each subscribe is answered with the current state of the new
+    topics, then updates are coalesced and flushed every WS_FLUSH_INTERVAL.
+    """
+    await websocket.accept()
+    publisher = market_snapshot_publisher
+    session = GatewaySession()
+    send_lock = asyncio.Lock()
+    bvc_task: Optional[asyncio.Task] = None
+    bvc_subscription: Optional[Subscription] = None
+
+    async def send(text: str) -> None:
+        async with send_lock:
+            await websocket.send_text(text)
+
+    async def watch_bvc(subscription: Subscription) -> None:
+        nonlocal bvc_task, bvc_subscription
+        while True:
+            try:
+                item = await subscription.get(KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                continue
+            if item is None:
+                # Reset before notifying, so a re-subscribe to "bvc" starts a new feed.
+                if bvc_subscription is subscription:
+                    bvc_broadcaster.unsubscribe(subscription)
+                    bvc_subscription = None
+                    bvc_task = None
+                session.bvc = False
+                await send(json.dumps({"type": "error", "topic": "bvc", "message": "bvc feed dropped"}))
+                return
+            session.set_bvc(item)
+
+    def stop_bvc() -> None:
+        nonlocal bvc_task, bvc_subscription
+        if bvc_task is not None:
+            bvc_task.cancel()
+            bvc_task = None
+        if bvc_subscription is not None:
+            bvc_broadcaster.unsubscribe(bvc_subscription)
+            bvc_subscription = None
+
+    async def handle(message: dict) -> None:
+        nonlocal bvc_task, bvc_subscription
+        op = message.get("op")
+        if op == "ping":
+            await send(json.dumps({"type": "pong"}))
+            return
+        topics = message.get("topics")
+        if op not in {"subscribe", "unsubscribe"} or not isinstance(topics, list):
+            await send(json.dumps({"type": "error", "message": "expected {op: subscribe|unsubscribe, topics: [...]}"}))
+            return
+        accepted, rejected = session.apply(op, topics)
+        await send(json.dumps({"type": f"{op}d", "topics": accepted, "rejected": rejected}))
+        if op == "unsubscribe":
+            if not session.bvc:
+                stop_bvc()
+            return
+        snapshot = publisher.current
+        if snapshot is not None:
+            assets = session.assets_for(snapshot, accepted)
+            if assets:
+                await send(json.dumps({"type": "snapshot", "seq": snapshot.seq, "status": snapshot.status, "assets": assets}))
+            if "pulse" in accepted:
+                await send(encode_message("pulse", snapshot.encoded("pulse").identity, seq=snapshot.seq))
+        if session.bvc and bvc_subscription is None:
+            # The broadcaster replays its latest payload to late subscribers.
+            bvc_subscription = bvc_broadcaster.subscribe()
+            bvc_task = asyncio.create_task(watch_bvc(bvc_subscription))
+
+    async def receive() -> None:
+        while True:
+            text = await websocket.receive_text()
+            if len(text) > MAX_MESSAGE_BYTES:
+                await send(json.dumps({"type": "error", "message": "message too large"}))
+                continue
+            try:
+                message = json.loads(text)
+            except ValueError:
+                await send(json.dumps({"type": "error", "message": "invalid JSON"}))
+                continue
+            if isinstance(message, dict):
+                await handle(message)
+
+    async def watch_snapshots() -> None:
+        snapshot = await market_data_service.get_market_snapshot_async()
+        seq = snapshot.seq
+        session.seq = seq
+        while True:
+            if not await publisher.wait_for_publish(seq, KEEPALIVE_SECONDS):
+                continue
+            current = publisher.current
+            deltas = publisher.changes_since(seq)
+            if deltas is None:
+                # Too far behind to replay: resend the subscribed rows in full.
+                topics = [f"symbol:{symbol}" for symbol in session.symbols]
+                topics.extend(f"market:{market}" for market in session.markets)
+                assets = session.assets_for(current, topics)
+                seq = current.seq
+                session.seq = seq
+                if assets:
+                    await send(json.dumps({"type": "snapshot", "seq": seq, "status": current.status, "assets": assets}))
+                continue
+            for delta in deltas:
+                session.add_delta(delta, current)
+                seq = delta.seq
+
+    async def flush() -> None:
+        idle = 0.0
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            messages = session.drain(publisher.current)
+            for text in messages:
+                await send(text)
+            idle = 0.0 if messages else idle + FLUSH_INTERVAL
+            if idle >= KEEPALIVE_SECONDS:
+                await send(json.dumps({"type": "heartbeat"}))
+                idle = 0.0
+
+    market_data_service.open_snapshot_stream()
+    tasks = [
+        asyncio.create_task(receive()),
+        asyncio.create_task(watch_snapshots()),
+        asyncio.create_task(flush()),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            exc = task.exception()
+            if exc is not None and not isinstance(exc, WebSocketDisconnect):
+                logger.warning("Market WebSocket closed after error: %s", exc)
+    finally:
+        for task in tasks:
+            task.cancel()
+        stop_bvc()
+        market_data_service.close_snapshot_stream()
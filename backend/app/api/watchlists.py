@@ -0,0 +1,191 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from ..db import models
+from ..db.database import get_db
+from ..services.quote_store import normalize_symbol, quote_store
+from .extra import require_user
+from .market_data import market_data_service
+
+
+router = APIRouter(prefix="/api", tags=["Watchlists"])
+
+WATCHLIST_LIMIT = int(os.environ.get("WATCHLIST_LIMIT", "20"))
+WATCHLIST_SYMBOL_LIMIT = int(os.environ.get("WATCHLIST_SYMBOL_LIMIT", "100"))
+
+
+class WatchlistRequest(BaseModel):
+    name: str
+    symbols: List[str] = []
+
+
+class WatchlistUpdateRequest(BaseModel):
+    name: Optional[str] = None
+    symbols: Optional[List[str]] = None
+
+
+class WatchlistSymbolRequest(BaseModel):
+    symbol: str
+
+
+def _watchlist_to_dict(watchlist: models.Watchlist) -> Dict[str, Any]:
+    return {
+        "id": watchlist.id,
+        "name": watchlist.name,
+        "symbols": [item.symbol for item in watchlist.items],
+        "created_at": watchlist.created_at.isoformat() if watchlist.created_at else None,
+    }
+
+
+def _get_watchlist(db: Session, user: models.User, watchlist_id: int) -> models.Watchlist:
+    watchlist = db.query(models.Watchlist).filter_by(id=watchlist_id, user_id=user.id).first()
+    if watchlist is None:
+        raise HTTPException(status_code=404, detail="Watchlist not found")
+    return watchlist
+
+
+def _clean_name(name: Optional[str]) -> str:
+    name = (name or "").strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Missing watchlist name")
+    return name[:80]
+
+
+def _clean_symbols(symbols: List[str]) -> List[str]:
+    cleaned = []
+    for alias in symbols:
+        symbol = normalize_symbol(alias)
+        if symbol is None:
+            raise HTTPException(status_code=400, detail=f"Invalid symbol: {alias}")
+        cleaned.append(symbol)
+    cleaned = list(dict.fromkeys(cleaned))
+    if len(cleaned) > WATCHLIST_SYMBOL_LIMIT:
+        raise HTTPException(status_code=400, detail=f"A watchlist holds at most {WATCHLIST_SYMBOL_LIMIT} symbols")
+    return cleaned
+
+
+def _set_symbols(watchlist: models.Watchlist, symbols: List[str]) -> None:
+    watchlist.items = [
+        models.WatchlistItem(symbol=symbol, position=position) for position, symbol in enumerate(symbols)
+    ]
+
+
+@router.get("/watchlists")
+def list_watchlists(
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+) -> List[Dict[str, Any]]:
+    watchlists = db.query(models.Watchlist).filter_by(user_id=user.id).order_by(models.Watchlist.id).all()
+    return [_watchlist_to_dict(watchlist) for watchlist in watchlists]
+
+
+@router.post("/watchlists")
+def create_watchlist(
+    payload: WatchlistRequest,
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    if db.query(models.Watchlist).filter_by(user_id=user.id).count() >= WATCHLIST_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {WATCHLIST_LIMIT} watchlists per user")
+    watchlist = models.Watchlist(user_id=user.id, name=_clean_name(payload.name))
+    _set_symbols(watchlist, _clean_symbols(payload.symbols))
+    db.add(watchlist)
+    db.commit()
+    db.refresh(watchlist)
+    return _watchlist_to_dict(watchlist)
+
+
+@router.put("/watchlists/{watchlist_id}")
+def update_watchlist(
+    watchlist_id: int,
+    payload: WatchlistUpdateRequest,
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    watchlist = _get_watchlist(db, user, watchlist_id)
+    if payload.name is not None:
+        watchlist.name = _clean_name(payload.name)
+    if payload.symbols is not None:
+        symbols = _clean_symbols(payload.symbols)
+        watchlist.items = []
+        db.flush()
+        _set_symbols(watchlist, symbols)
+    db.commit()
+    db.refresh(watchlist)
+    return _watchlist_to_dict(watchlist)
+
+
+@router.delete("/watchlists/{watchlist_id}")
+def delete_watchlist(
+    watchlist_id: int,
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    watchlist = _get_watchlist(db, user, watchlist_id)
+    db.delete(watchlist)
+    db.commit()
+    return {"status": "deleted", "id": watchlist_id}
+
+
+@router.post("/watchlists/{watchlist_id}/symbols")
+def add_watchlist_symbol(
+    watchlist_id: int,
+    payload: WatchlistSymbolRequest,
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    watchlist = _get_watchlist(db, user, watchlist_id)
+    symbols = [item.symbol for item in watchlist.items]
+    symbol = _clean_symbols([payload.symbol])[0]
+    if symbol not in symbols:
+        _clean_symbols([*symbols, symbol])
+        position = max((item.position or 0 for item in watchlist.items), default=-1) + 1
+        watchlist.items.append(models.WatchlistItem(symbol=symbol, position=position))
+        db.commit()
+        db.refresh(watchlist)
+    return _watchlist_to_dict(watchlist)
+
+
+@router.delete("/watchlists/{watchlist_id}/symbols/{symbol}")
+def remove_watchlist_symbol(
+    watchlist_id: int,
+    symbol: str,
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    watchlist = _get_watchlist(db, user, watchlist_id)
+    symbol = normalize_symbol(symbol) or symbol
+    watchlist.items = [item for item in watchlist.items if item.symbol != symbol]
+    db.commit()
+    db.refresh(watchlist)
+    return _watchlist_to_dict(watchlist)
+
+
+@router.get("/watchlists/{watchlist_id}/quotes")
+async def get_watchlist_quotes(
+    watchlist_id: int,
+    user: models.User = Depends(require_user),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """
+    Quotes of every symbol of the watchlist, read in one batched lookup from
+    the shared market snapshot and quote store. Symbols outside the market
+    universe are fetched in the background; until then their quote is null
+    and they are listed in `pending`.
+    """
+    watchlist = _get_watchlist(db, user, watchlist_id)
+    symbols = [item.symbol for item in watchlist.items]
+    snapshot = await market_data_service.get_market_snapshot_async()
+    quotes, pending = quote_store.lookup(snapshot, symbols)
+    return {
+        "id": watchlist.id,
+        "name": watchlist.name,
+        "timestamp": snapshot.ts,
+        "status": snapshot.status,
+        "quotes": [quotes[symbol] or {"symbol": symbol, "price": None} for symbol in symbols],
+        "pending": pending,
+    }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -159,3 +159,23 @@ class ContactMessage(Base):
     replied_at = Column(DateTime)
     status = Column(String(20), default='new')
     created_at = Column(DateTime, default=datetime.utcnow)
+
+class Watchlist(Base):
+    __tablename__ = "watchlists"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    name = Column(String(80), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    items = relationship('WatchlistItem', back_populates='watchlist', order_by='WatchlistItem.position', cascade='all, delete-orphan')
+
+class WatchlistItem(Base):
+    __tablename__ = "watchlist_items"
+    __table_args__ = (UniqueConstraint('watchlist_id', 'symbol', name='uq_watchlist_symbol'),)
+    id = Column(Integer, primary_key=True, index=True)
+    watchlist_id = Column(Integer, ForeignKey('watchlists.id'), nullable=False, index=True)
+    symbol = Column(String(32), nullable=False)
+    position = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    watchlist = relationship('Watchlist', back_populates='items')
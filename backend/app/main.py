@@ -8,8 +8,11 @@ import time
 
 from .db import models
 from .db.database import SessionLocal, engine, get_db
-from .api import market, market_data, challenges, extra, compat, auth, chat
+from .api import market, market_data, market_ws, challenges, extra, compat, auth, chat, watchlists
 from .services.auth import hash_password
+from .services.casablanca_service import load_checkpoint as load_bvc_checkpoint
+from .services.market_data import MarketDataService
+from .services.market_scraper import bvc_indices
 
 def load_env_file(path: str) -> None:
     if not os.path.exists(path):
@@ -157,6 +160,21 @@ def on_startup():
     seed_challenges(db)
     db.close()
 
+    # Serve the last known market data until the first live refresh lands.
+    load_bvc_checkpoint()
+    bvc_indices.load_checkpoint()
+    MarketDataService.warm_start()
+
+
+@app.on_event("startup")
+async def start_scheduled_scrapes():
+    bvc_indices.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduled_scrapes():
+    await bvc_indices.stop()
+
 # Configure CORS
 raw_origins = os.environ.get(
     "FRONTEND_ORIGINS",
@@ -173,11 +191,13 @@ app.add_middleware(
 
 app.include_router(market.router)
 app.include_router(market_data.router)
+app.include_router(market_ws.router)
 app.include_router(challenges.router)
 app.include_router(extra.router)
 app.include_router(compat.router)
 app.include_router(auth.router)
 app.include_router(chat.router)
+app.include_router(watchlists.router)
 
 @app.get("/health")
 def health():
@@ -29,8 +29,7 @@ class AIService:
 
     @staticmethod
     def get_prediction(symbol):
-        assets = MarketDataService.get_market_universe_cached()
-        asset = next((a for a in assets if a.get("symbol") == symbol), None)
+        asset = MarketDataService.get_asset_cached(symbol)
         if not asset:
             return None
         change = asset.get("change_pct")
@@ -41,7 +40,7 @@ class AIService:
         else:
             outlook = "bearish"
         return {
-            "symbol": symbol,
+            "symbol": asset.get("symbol"),
             "price": asset.get("price"),
             "outlook": outlook,
             "confidence": 70 if change is not None else 55
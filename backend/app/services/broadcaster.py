@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One consumer of a Broadcaster. Items are pre-encoded bytes; `None` marks
+    the end of the subscription (unsubscribed or dropped as too slow).
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    async def get(self, timeout: float) -> Optional[bytes]:
+        """
+        Waits for the next item. Raises asyncio.TimeoutError when nothing
+        arrives within `timeout` seconds.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broadcaster:
+    """
+    Polls a source once per interval for all subscribers of a worker and fans
+    each changed payload out to bounded per-subscriber queues. A subscriber
+    whose queue is full is dropped instead of slowing everybody down. The
+    poll task only runs while there is at least one subscriber.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        poll: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], bytes],
+        interval: float,
+        queue_size: int = 8,
+    ) -> None:
+        self.name = name
+        self.interval = interval
+        self.queue_size = queue_size
+        self._poll = poll
+        self._encode = encode
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last: Optional[bytes] = None
+        self.dropped_total = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            # The last payload may be arbitrarily old; the new poll task sends a fresh one.
+            self._last = None
+            self._task = asyncio.create_task(self._run())
+        elif self._last is not None:
+            subscription.queue.put_nowait(self._last)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, payload: Any) -> None:
+        data = self._encode(payload)
+        if data == self._last:
+            return
+        self._last = data
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(data)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        subscription.dropped = True
+        self.dropped_total += 1
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        logger.info("Dropped slow %s subscriber (%d still connected)", self.name, len(self._subscribers))
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            started = time.monotonic()
+            try:
+                self.publish(await self._poll())
+            except Exception as exc:
+                logger.warning("%s broadcaster poll failed: %s", self.name, exc)
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(0.0, self.interval - elapsed))
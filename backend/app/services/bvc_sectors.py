@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from .bvc_ticks import TICK_DIR, BvcTickStore
+from .search_index import fold
+
+
+SECTOR_INDEX_BASE = 1000.0
+UNCLASSIFIED = "Unclassified"
+
+
+def sector_slug(sector: str) -> str:
+    return fold(sector).replace(" ", "-").upper() or "UNCLASSIFIED"
+
+
+def _number(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+class SectorAggregator:
+    """
+    Per-sector aggregates of the Casablanca board, computed with numpy at
+    each refresh: constituents, advancers/decliners, average variation, the
+    price-weighted day change, and a synthetic price-weighted index chained
+    from refresh to refresh over the constituents quoted in both boards
+    (base SECTOR_INDEX_BASE). Index levels are recorded in their own tick
+    store, one series per sector slug, with the session open/high/low.
+    """
+
+    def __init__(self, store: Optional[BvcTickStore] = None) -> None:
+        self.store = store or BvcTickStore(os.path.join(TICK_DIR, "sectors"))
+        self._prices: Dict[str, float] = {}
+        self._levels: Dict[str, float] = {}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._board: Optional[List[Dict[str, Any]]] = None
+        self._payload: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None
+
+    def _aggregate(self, stocks: List[Dict[str, Any]], remember: bool = True) -> Dict[str, Any]:
+        tickers = [str(stock.get("ticker") or "").strip().upper() for stock in stocks]
+        sectors, codes = np.unique(
+            np.array([stock.get("sector") or UNCLASSIFIED for stock in stocks], dtype=object).astype(str),
+            return_inverse=True,
+        )
+        size = len(sectors)
+        prices = np.array([_number(stock.get("closing_price")) for stock in stocks], dtype=float)
+        variations = np.array([_number(stock.get("variation")) for stock in stocks], dtype=float)
+        previous = np.array([self._prices.get(ticker, np.nan) for ticker in tickers], dtype=float)
+
+        quoted = np.isfinite(variations)
+        priced = np.isfinite(prices) & (prices > 0)
+        counts = np.bincount(codes, minlength=size)
+        quoted_counts = np.bincount(codes, weights=quoted, minlength=size)
+        advancers = np.bincount(codes, weights=quoted & (variations > 0), minlength=size)
+        decliners = np.bincount(codes, weights=quoted & (variations < 0), minlength=size)
+        variation_sums = np.bincount(codes, weights=np.where(quoted, variations, 0.0), minlength=size)
+        # Price-weighted day change: sum of prices against the sum of implied previous closes.
+        weighted = priced & quoted & (variations > -100)
+        today = np.bincount(codes, weights=np.where(weighted, prices, 0.0), minlength=size)
+        yesterday = np.bincount(
+            codes,
+            weights=np.where(weighted, prices / (1 + np.where(weighted, variations, 0.0) / 100), 0.0),
+            minlength=size,
+        )
+        # Index link: constituents priced in both this and the previous board.
+        common = priced & np.isfinite(previous) & (previous > 0)
+        link_now = np.bincount(codes, weights=np.where(common, prices, 0.0), minlength=size)
+        link_before = np.bincount(codes, weights=np.where(common, previous, 0.0), minlength=size)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            averages = np.where(quoted_counts > 0, variation_sums / quoted_counts, np.nan)
+            changes = np.where(yesterday > 0, (today / yesterday - 1) * 100, np.nan)
+            links = np.where(link_before > 0, link_now / link_before, 1.0)
+
+        rows = []
+        for position, sector in enumerate(sectors.tolist()):
+            rows.append({
+                "sector": sector,
+                "slug": sector_slug(sector),
+                "count": int(counts[position]),
+                "advancers": int(advancers[position]),
+                "decliners": int(decliners[position]),
+                "unchanged": int(quoted_counts[position] - advancers[position] - decliners[position]),
+                "average_variation": round(float(averages[position]), 2) if np.isfinite(averages[position]) else None,
+                "weighted_variation": round(float(changes[position]), 2) if np.isfinite(changes[position]) else None,
+                "_link": float(links[position]),
+            })
+        for ticker, price, ok in zip(tickers, prices.tolist(), priced.tolist()):
+            if remember and ticker and ok:
+                self._prices[ticker] = price
+        return {"sectors": rows}
+
+    def _chain(self, rows: List[Dict[str, Any]], ts: float) -> List[Dict[str, Any]]:
+        stocks = []
+        day = self.store._day(ts)
+        for row in rows:
+            slug = row["slug"]
+            level = self._levels.get(slug)
+            if level is None:
+                last = self.store.last(slug)
+                level = last[1] if last is not None else SECTOR_INDEX_BASE
+                if last is not None and self.store._day(last[0]) == day:
+                    self._sessions[slug] = {"day": day, "open": last[2], "high": last[3], "low": last[4]}
+            level = round(level * row.pop("_link"), 4)
+            self._levels[slug] = level
+            session = self._sessions.get(slug)
+            if session is None or session["day"] != day:
+                session = {"day": day, "open": level, "high": level, "low": level}
+                self._sessions[slug] = session
+            session["high"] = max(session["high"], level)
+            session["low"] = min(session["low"], level)
+            row.update({"index": level, "index_open": session["open"], "index_high": session["high"], "index_low": session["low"]})
+            stocks.append({
+                "ticker": slug,
+                "closing_price": level,
+                "opening_price": session["open"],
+                "high_price": session["high"],
+                "low_price": session["low"],
+            })
+        self.store.record_board(stocks, ts)
+        return rows
+
+    def update(self, stocks: List[Dict[str, Any]], ts: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Aggregates a freshly scraped board, moves the sector indices and
+        records them. Called once per successful BVC refresh.
+        """
+        if not self.enabled or not stocks:
+            return None
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            payload = self._aggregate(stocks)
+            payload["sectors"] = self._chain(payload["sectors"], ts)
+            payload.update({"status": "success", "timestamp": ts})
+            self._board = stocks
+            self._payload = payload
+            return payload
+
+    def payload(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Aggregates for the board in `result`: the precomputed ones when they
+        come from that board, otherwise (a stale warm-started board) computed
+        on the fly without moving the indices.
+        """
+        stocks = result.get("data") or []
+        with self._lock:
+            if self._payload is not None and stocks is self._board:
+                return self._payload
+        if not self.enabled or not stocks:
+            return {"status": result.get("status", "unavailable"), "timestamp": None, "sectors": []}
+        with self._lock:
+            rows = self._aggregate(stocks, remember=False)["sectors"]
+        for row in rows:
+            row.pop("_link")
+            row["index"] = self._levels.get(row["slug"])
+        return {"status": result.get("status", "stale"), "timestamp": None, "sectors": rows}
+
+
+sector_aggregator = SectorAggregator()
@@ -0,0 +1,184 @@
+import logging
+import os
+import struct
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from .instruments import MARKET_BVC
+from .trading_calendar import trading_calendar
+
+
+logger = logging.getLogger(__name__)
+
+TICK_DIR = os.environ.get(
+    "BVC_TICK_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "bvc_ticks")),
+)
+TICK_RETENTION_DAYS = float(os.environ.get("BVC_TICK_RETENTION_DAYS", "10"))
+TICK_MEMORY = int(os.environ.get("BVC_TICK_MEMORY", "20000"))
+# ts, price, open, high, low
+_RECORD = struct.Struct("<ddddd")
+Tick = Tuple[float, float, float, float, float]
+
+
+def _read(path: str) -> List[Tick]:
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+    except FileNotFoundError:
+        return []
+    # A torn last record (crash mid-write) is dropped.
+    data = data[: len(data) - len(data) % _RECORD.size]
+    return list(_RECORD.iter_unpack(data))
+
+
+def _rewrite(path: str, ticks: Iterable[Tick]) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(b"".join(_RECORD.pack(*tick) for tick in ticks))
+    os.replace(tmp_path, path)
+
+
+class BvcTickStore:
+    """
+    Time series of the Casablanca board, appended from every successful
+    scrape. A ticker only gets a new tick when its price, open, high or low
+    changed. Ticks are kept for BVC_TICK_RETENTION_DAYS in one fixed-width
+    binary file per ticker; the last tick of each session is also appended
+    to a per-ticker daily file, which is never pruned.
+    """
+
+    def __init__(self, directory: str = TICK_DIR, retention_days: float = TICK_RETENTION_DAYS) -> None:
+        self.directory = directory
+        self.retention = retention_days * 86400
+        self.tz = trading_calendar.hours[MARKET_BVC].tz
+        self._ticks: Dict[str, Deque[Tick]] = {}
+        self._daily: Dict[str, Dict[str, Tick]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, ticker: str) -> str:
+        return os.path.join(self.directory, kind, f"{ticker}.bin")
+
+    def _day(self, ts: float) -> str:
+        return datetime.fromtimestamp(ts, self.tz).date().isoformat()
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        cutoff = time.time() - self.retention
+        for kind in ("ticks", "daily"):
+            folder = os.path.join(self.directory, kind)
+            try:
+                names = sorted(os.listdir(folder))
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if not name.endswith(".bin"):
+                    continue
+                ticker = name[: -len(".bin")]
+                path = os.path.join(folder, name)
+                records = _read(path)
+                if kind == "daily":
+                    self._daily[ticker] = {self._day(tick[0]): tick for tick in records}
+                    continue
+                kept = [tick for tick in records if tick[0] >= cutoff]
+                if len(kept) < len(records):
+                    try:
+                        _rewrite(path, kept)
+                    except OSError as exc:
+                        logger.warning("Could not prune %s: %s", path, exc)
+                self._ticks[ticker] = deque(kept, maxlen=TICK_MEMORY)
+
+    def _append(self, kind: str, ticker: str, ticks: List[Tick]) -> None:
+        path = self._path(kind, ticker)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as handle:
+                handle.write(b"".join(_RECORD.pack(*tick) for tick in ticks))
+        except OSError as exc:
+            logger.warning("Could not append BVC ticks to %s: %s", path, exc)
+
+    def record_board(self, stocks: Iterable[Dict[str, Any]], ts: Optional[float] = None) -> int:
+        """
+        Appends one tick per ticker whose values moved; returns how many.
+        """
+        ts = time.time() if ts is None else ts
+        day = self._day(ts)
+        recorded = 0
+        with self._lock:
+            self._ensure_loaded()
+            for stock in stocks:
+                ticker = stock.get("ticker")
+                price = stock.get("closing_price")
+                if not isinstance(ticker, str) or not ticker.strip() or not isinstance(price, (int, float)):
+                    continue
+                ticker = ticker.strip().upper()
+                fields = tuple(
+                    float(value) if isinstance(value, (int, float)) else float(price)
+                    for value in (price, stock.get("opening_price"), stock.get("high_price"), stock.get("low_price"))
+                )
+                ticks = self._ticks.setdefault(ticker, deque(maxlen=TICK_MEMORY))
+                last = ticks[-1] if ticks else None
+                if last is not None and last[1:] == fields:
+                    continue
+                if last is not None and self._day(last[0]) != day:
+                    # First tick of a new session: the previous session's last tick is its daily bar.
+                    self._daily.setdefault(ticker, {})[self._day(last[0])] = last
+                    self._append("daily", ticker, [last])
+                tick = (ts, *fields)
+                ticks.append(tick)
+                self._append("ticks", ticker, [tick])
+                recorded += 1
+        return recorded
+
+    def last(self, ticker: str) -> Optional[Tick]:
+        with self._lock:
+            self._ensure_loaded()
+            ticks = self._ticks.get(ticker.upper())
+            return ticks[-1] if ticks else None
+
+    def bars(self, ticker: str, width: int, limit: int, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        OHLC bars of `width` seconds built from the tick prices, newest
+        `limit` bars. The board carries no volume; bars report 0.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            ticks = list(self._ticks.get(ticker.upper(), ()))
+        lower = start if start is not None else float("-inf")
+        upper = end if end is not None else float("inf")
+        bars: List[Dict[str, Any]] = []
+        for ts, price, _, _, _ in ticks:
+            bucket = int(ts) - int(ts) % width
+            if not lower <= bucket <= upper:
+                continue
+            if bars and bars[-1]["time"] == bucket:
+                bar = bars[-1]
+                bar["high"] = max(bar["high"], price)
+                bar["low"] = min(bar["low"], price)
+                bar["close"] = price
+                continue
+            bars.append({"time": bucket, "open": price, "high": price, "low": price, "close": price, "volume": 0.0})
+        return bars[-limit:] if limit > 0 else bars
+
+    def daily_closes(self, ticker: str, points: int) -> List[float]:
+        """
+        Closing price of the last `points` sessions, the current one included.
+        """
+        ticker = ticker.upper()
+        with self._lock:
+            self._ensure_loaded()
+            days = dict(self._daily.get(ticker, {}))
+            ticks = self._ticks.get(ticker)
+            if ticks:
+                days[self._day(ticks[-1][0])] = ticks[-1]
+        closes = [days[day][1] for day in sorted(days)]
+        return [round(close, 4) for close in closes[-points:]] if points > 0 else []
+
+
+bvc_tick_store = BvcTickStore()
@@ -0,0 +1,166 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from .downsampling import downsample
+from .market_snapshot import MarketSnapshot, minimal_asset
+
+
+CANDLE_INTERVALS = {"1m": 60, "5m": 300, "1h": 3600}
+CANDLE_CAPACITY = int(os.environ.get("CANDLE_CAPACITY", "720"))
+SPARKLINE_INTERVAL = os.environ.get("SPARKLINE_INTERVAL", "5m")
+SPARKLINE_BARS = int(os.environ.get("SPARKLINE_BARS", "288"))
+SPARKLINE_POINTS = int(os.environ.get("SPARKLINE_POINTS", "24"))
+MAX_SPARKLINE_POINTS = 120
+_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class CandleRing:
+    """
+    Fixed-size ring of OHLCV bars of one width. Bars are stored column-wise
+    in preallocated arrays, so a symbol costs the same memory however long
+    the process runs; the oldest bar is overwritten when the ring is full.
+    """
+
+    __slots__ = ("width", "capacity", "start", "values", "head", "count")
+
+    def __init__(self, width: int, capacity: int = CANDLE_CAPACITY) -> None:
+        self.width = width
+        self.capacity = capacity
+        self.start = np.zeros(capacity, dtype=np.int64)
+        # Columns: open, high, low, close, volume.
+        self.values = np.zeros((capacity, len(_FIELDS)), dtype=np.float64)
+        self.head = -1
+        self.count = 0
+
+    def update(self, ts: float, price: float, volume: float = 0.0) -> None:
+        bucket = int(ts) - int(ts) % self.width
+        if self.count:
+            last = int(self.start[self.head])
+            if bucket == last:
+                row = self.values[self.head]
+                if price > row[1]:
+                    row[1] = price
+                if price < row[2]:
+                    row[2] = price
+                row[3] = price
+                row[4] += volume
+                return
+            if bucket < last:
+                # Late tick for a closed bar; bars are append-only.
+                return
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.start[self.head] = bucket
+        self.values[self.head] = (price, price, price, price, volume)
+
+    def _indices(self, limit: Optional[int]):
+        count = self.count if limit is None else max(0, min(limit, self.count))
+        # Chronological indices of the newest `count` bars.
+        return (np.arange(self.head - count + 1, self.head + 1)) % self.capacity
+
+    def closes(self, limit: Optional[int] = None) -> List[float]:
+        return self.values[self._indices(limit), 3].tolist()
+
+    def bars(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        indices = self._indices(limit)
+        if not len(indices):
+            return []
+        starts = self.start[indices].tolist()
+        values = self.values[indices].tolist()
+        return [
+            {"time": start, "open": row[0], "high": row[1], "low": row[2], "close": row[3], "volume": row[4]}
+            for start, row in zip(starts, values)
+        ]
+
+
+class CandleStore:
+    """
+    Aggregates snapshot quotes into 1m/5m/1h bars per symbol. Fed by the
+    market snapshot publisher, so intraday history needs no extra upstream
+    calls. Snapshot volumes are cumulative for the day; bars get the
+    increase since the previous quote.
+    """
+
+    def __init__(self, capacity: int = CANDLE_CAPACITY) -> None:
+        self.capacity = capacity
+        self._rings: Dict[str, Dict[str, CandleRing]] = {}
+        self._last_volume: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return np is not None
+
+    def record(self, symbol: str, ts: float, price: float, volume: Optional[float] = None) -> None:
+        with self._lock:
+            rings = self._rings.get(symbol)
+            if rings is None:
+                rings = {name: CandleRing(width, self.capacity) for name, width in CANDLE_INTERVALS.items()}
+                self._rings[symbol] = rings
+            delta = 0.0
+            if volume is not None:
+                previous = self._last_volume.get(symbol)
+                if previous is not None and volume >= previous:
+                    delta = volume - previous
+                self._last_volume[symbol] = volume
+            for ring in rings.values():
+                ring.update(ts, price, delta)
+
+    def on_snapshot(self, snapshot: MarketSnapshot, previous: Optional[MarketSnapshot]) -> None:
+        if not self.enabled or snapshot.status == "stale":
+            return
+        for symbol, asset in snapshot.by_symbol.items():
+            price = asset.get("price")
+            if not isinstance(price, (int, float)):
+                continue
+            volume = asset.get("volume")
+            self.record(symbol, snapshot.ts, float(price), float(volume) if isinstance(volume, (int, float)) else None)
+
+    def history(self, symbols: List[str], interval: str, points: int) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            return {
+                symbol: self._rings[symbol][interval].bars(points) if symbol in self._rings else []
+                for symbol in symbols
+            }
+
+    def sparklines(self, symbols: List[str], points: int) -> Dict[str, List[float]]:
+        """
+        Recent closes per symbol downsampled to `points`. Reads the
+        SPARKLINE_INTERVAL bars, or the 1m bars while those are still too few.
+        """
+        with self._lock:
+            series = {}
+            for symbol in symbols:
+                rings = self._rings.get(symbol)
+                if rings is None:
+                    continue
+                ring = rings.get(SPARKLINE_INTERVAL) or rings["5m"]
+                if ring.count < points:
+                    ring = rings["1m"]
+                series[symbol] = ring.closes(SPARKLINE_BARS)
+        return {symbol: downsample(closes, points) for symbol, closes in series.items()}
+
+
+candle_store = CandleStore()
+
+
+def sparkline_key(points: int, minimal: bool = False) -> str:
+    return f"overview{':minimal' if minimal else ''}:sparkline:{points}"
+
+
+def overview_with_sparklines(snapshot: MarketSnapshot, points: int, minimal: bool = False) -> List[Dict[str, Any]]:
+    """
+    Overview rows with a `sparkline` series each, read from the local candle
+    store only.
+    """
+    lines = candle_store.sparklines(list(snapshot.by_symbol), points) if candle_store.enabled else {}
+    return [
+        {**(minimal_asset(asset) if minimal else asset), "sparkline": lines.get(asset.get("symbol"), [])}
+        for asset in snapshot.assets
+    ]
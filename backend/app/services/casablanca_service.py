@@ -1,6 +1,12 @@
+import asyncio
+import json
 import logging
 import os
+import math
+import random
+import threading
 import time
+from urllib.parse import urlsplit
 
 try:
     import requests
@@ -17,11 +23,80 @@ try:
 except Exception:
     BeautifulSoup = None
 
+try:
+    import lxml.html as lxml_html
+except Exception:
+    lxml_html = None
+
+from .broadcaster import Broadcaster
+from .bvc_sectors import sector_aggregator
+from .bvc_ticks import bvc_tick_store
+from .checkpoint import Checkpoint
+from .http_cassette import build_http_session
+from .metrics import metrics
+from .trading_calendar import trading_calendar
+from .instruments import MARKET_BVC, instrument_registry
+
 
 logger = logging.getLogger(__name__)
 
-CACHE_TTL = int(os.environ.get("BVC_CACHE_TTL", "5"))
-_cache = {"ts": 0.0, "data": None}
+STREAM_INTERVAL = float(os.environ.get("BVC_STREAM_INTERVAL", "5"))
+STREAM_QUEUE_SIZE = int(os.environ.get("BVC_STREAM_QUEUE_SIZE", "8"))
+HTTP_ATTEMPTS = int(os.environ.get("BVC_HTTP_ATTEMPTS", "3"))
+BACKOFF_BASE = float(os.environ.get("BVC_BACKOFF_BASE", "0.4"))
+BACKOFF_MAX = float(os.environ.get("BVC_BACKOFF_MAX", "4"))
+HOST_CONCURRENCY = int(os.environ.get("BVC_HOST_CONCURRENCY", "2"))
+REFRESH_WAIT = float(os.environ.get("BVC_REFRESH_WAIT", "30"))
+POOL_SIZE = int(os.environ.get("BVC_POOL_SIZE", "4"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+OVERVIEW_URL = "https://www.casablanca-bourse.com/fr/live-market/overview"
+# Stock field -> overview cells to try in order: header names, then positions for rows that do not line up.
+OVERVIEW_COLUMNS = (
+    ("ticker", ("ticker", "code", "0")),
+    ("label", ("libellé", "libelle", "name", "1")),
+    ("sector", ("secteur", "sector", "2")),
+    ("closing_price", ("dernier", "cours", "2")),
+    ("opening_price", ("ouverture", "3")),
+    ("high_price", ("haut", "4")),
+    ("low_price", ("bas", "5")),
+    ("variation", ("variation", "6")),
+)
+_TEXT_COLUMNS = {"ticker", "label", "sector"}
+# Stock field -> dashboard API keys, first usable value wins. The closing
+# price falls back to the session's open, high, then low.
+API_TEXT_FIELDS = (
+    ("label", ("label", "libelle")),
+    ("sector", ("sector", "secteur")),
+)
+API_NUMBER_FIELDS = (
+    ("closing_price", (
+        "field_last_price",
+        "field_last_price_value",
+        "field_closing_price",
+        "field_close_price",
+        "field_last",
+        "field_last_trade_price",
+        "field_dernier_cours",
+        "field_last_course",
+        "field_price",
+        "field_opening_price",
+        "field_open",
+        "field_high_price",
+        "field_high",
+        "field_low_price",
+        "field_low",
+    )),
+    ("opening_price", ("field_opening_price", "field_open")),
+    ("high_price", ("field_high_price", "field_high")),
+    ("low_price", ("field_low_price", "field_low")),
+    ("variation", ("field_variation", "field_variation_percent", "field_difference", "field_change")),
+)
+# `generation` counts finished refresh attempts; `result` is what the latest one returned.
+_cache = {"ts": 0.0, "data": None, "generation": 0, "result": None}
+_cache_lock = threading.Lock()
+# Held by the one thread scraping the exchange; the others wait on it and reuse its result.
+_refresh_lock = threading.Lock()
+_checkpoint = Checkpoint("bvc_live")
 _ssl_verify_env = os.environ.get("BVC_SSL_VERIFY", "1").lower()
 if _ssl_verify_env in {"0", "false", "no"}:
     _SSL_VERIFY = False
@@ -34,51 +109,151 @@ _HEADERS = {
     "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
     "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
 }
+# One keep-alive pool for every scrape, so retries and refreshes reuse the TLS connection.
+_SESSION = build_http_session(pool_size=POOL_SIZE)
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+
+_BLANK_VALUES = {"", "-", "—", "N/A"}
 
 
 def _to_float(value):
+    """
+    Number from a provider value, or None. Plain, decimal-comma and
+    space-grouped numbers go straight to float(); anything else (currency
+    or percent suffixes, dotted thousands) goes through a character filter.
+    """
     if value is None:
         return None
     if isinstance(value, (int, float)):
         return float(value)
-    text = str(value).strip()
-    if not text:
-        return None
-    text = text.replace("\xa0", "").replace(" ", "").replace(",", ".")
-    cleaned = []
-    for ch in text:
-        if ch.isdigit() or ch in ".-":
-            cleaned.append(ch)
-    if not cleaned:
+    text = str(value)
+    if text in _BLANK_VALUES:
         return None
+    if not text[-1].isdigit():
+        return _clean_float(text)
     try:
-        return float("".join(cleaned))
-    except Exception:
+        number = float(text.replace(",", ".").replace("\xa0", "").replace(" ", ""))
+    except ValueError:
+        return _clean_float(text)
+    return number if math.isfinite(number) else None
+
+
+def _clean_float(text):
+    cleaned = "".join([ch for ch in text.replace(",", ".") if ch.isdigit() or ch in ".-"])
+    if cleaned.count(".") > 1:
+        # "1.234.567,89" -> the last separator is the decimal one.
+        whole, _, fraction = cleaned.rpartition(".")
+        cleaned = f"{whole.replace('.', '')}.{fraction}"
+    try:
+        return float(cleaned)
+    except ValueError:
         return None
 
 
-def _pick_value(source, *keys):
-    for key in keys:
-        value = source.get(key)
-        if value is None:
-            continue
-        if isinstance(value, str) and value.strip() in {"", "-", "—"}:
-            continue
-        return value
-    return None
+def _compile_api_plan(schema):
+    """
+    Keeps, per stock field, only the candidate keys present in the payload
+    schema, so each row is read with a few direct lookups.
+    """
+    text_plan = tuple((field, tuple(key for key in keys if key in schema)) for field, keys in API_TEXT_FIELDS)
+    number_plan = tuple((field, tuple(key for key in keys if key in schema)) for field, keys in API_NUMBER_FIELDS)
+    return text_plan, number_plan
+
+
+_FULL_API_PLAN = _compile_api_plan(
+    {key for _, keys in (*API_TEXT_FIELDS, *API_NUMBER_FIELDS) for key in keys}
+)
+_api_plan = {"schema": None, "plan": _FULL_API_PLAN}
+
+
+def _parse_api_row(stock_data, plan):
+    ticker = stock_data.get("ticker")
+    if isinstance(ticker, str):
+        ticker = ticker.strip().upper()
+    stock = {"ticker": ticker}
+    text_plan, number_plan = plan
+    for field, keys in text_plan:
+        value = None
+        for key in keys:
+            value = stock_data.get(key)
+            if value:
+                break
+        stock[field] = value
+    for field, keys in number_plan:
+        number = None
+        for key in keys:
+            number = _to_float(stock_data.get(key))
+            if number is not None:
+                break
+        stock[field] = number
+    return stock
+
+
+def _parse_api_values(values, compiled=True):
+    """
+    Stock dicts of the dashboard API rows. The plan is compiled from the
+    first row's keys and reused while the schema stays the same; a row the
+    plan cannot price is re-read with every candidate key and drops the plan.
+    """
+    if not values:
+        return []
+    plan = _FULL_API_PLAN
+    schema = None
+    if compiled and isinstance(values[0], dict):
+        schema = frozenset(values[0])
+        cached = _api_plan
+        if cached["schema"] != schema:
+            cached = {"schema": schema, "plan": _compile_api_plan(schema)}
+            _api_plan.update(cached)
+        plan = cached["plan"]
+    stocks = []
+    for stock_data in values:
+        stock = _parse_api_row(stock_data, plan)
+        if stock["closing_price"] is None and plan is not _FULL_API_PLAN and not stock_data.keys() <= schema:
+            _api_plan["schema"] = None
+            stock = _parse_api_row(stock_data, _FULL_API_PLAN)
+        stocks.append(stock)
+    return stocks
 
 
 def _cache_get(allow_stale: bool = False):
-    if _cache["data"] and (time.time() - _cache["ts"]) < CACHE_TTL:
-        return _cache["data"]
-    if allow_stale and _cache["data"]:
-        return {"status": "stale", "data": _cache["data"].get("data", [])}
+    with _cache_lock:
+        ts, data = _cache["ts"], _cache["data"]
+    # Fresh for BVC_CACHE_TTL while the exchange trades, much longer while it is closed.
+    if data and not trading_calendar.is_due(MARKET_BVC, ts):
+        return data
+    if allow_stale and data:
+        return {"status": "stale", "data": data.get("data", [])}
     return None
 
 
 def _cache_set(data):
-    _cache["ts"] = time.time()
-    _cache["data"] = data
+    now = time.time()
+    with _cache_lock:
+        _cache["ts"] = now
+        _cache["data"] = data
+    _checkpoint.save(json.dumps(data).encode("utf-8"))
+    bvc_tick_store.record_board(data.get("data") or [], now)
+    sector_aggregator.update(data.get("data") or [], now)
+
+
+def load_checkpoint():
+    """
+    Seeds the cache with the last checkpointed board. It is only ever served
+    as stale data, until the first successful scrape replaces it.
+    """
+    data = _checkpoint.load()
+    if not isinstance(data, dict) or not data.get("data"):
+        return False
+    with _cache_lock:
+        if _cache["data"]:
+            return False
+        _cache["ts"] = 0.0
+        _cache["data"] = data
+    instrument_registry.register_bvc(data["data"])
+    return True
 
 
 def _unavailable_payload(message: str):
@@ -89,33 +264,72 @@ def _stale_payload(cached):
     return {"status": "stale", "data": cached.get("data", [])}
 
 
+def _host_slot(url):
+    host = urlsplit(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(HOST_CONCURRENCY)
+            _host_slots[host] = slot
+    return slot
+
+
+def _backoff(attempt, response=None):
+    """
+    Full-jitter exponential backoff, or the server's Retry-After when it
+    sends one, capped at BVC_BACKOFF_MAX either way.
+    """
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
 def _request_with_retries(url, *, params=None, timeout=10, expect_json=False):
     if requests is None:
         raise RuntimeError("requests is not installed")
-    attempts = 3
     verify = False if _FORCE_INSECURE else _SSL_VERIFY
     last_error = None
-    for _ in range(attempts):
-        try:
-            response = requests.get(
-                url,
-                params=params,
-                timeout=timeout,
-                verify=verify,
-                headers=_HEADERS,
-            )
-            response.raise_for_status()
-            return response.json() if expect_json else response.text
-        except requests.exceptions.SSLError as err:
-            last_error = err
-            logger.warning("SSL error while fetching Casablanca data: %s", err)
-            if verify and _ALLOW_INSECURE:
-                verify = False
-                continue
-            break
-        except requests.exceptions.RequestException as err:
-            last_error = err
-            time.sleep(0.4)
+    slot = _host_slot(url)
+    for attempt in range(HTTP_ATTEMPTS):
+        response = None
+        # Hold a host slot only for the request itself, never while backing off.
+        with slot:
+            started = time.perf_counter()
+            try:
+                response = (_SESSION or requests).get(
+                    url,
+                    params=params,
+                    timeout=timeout,
+                    verify=verify,
+                    headers=_HEADERS,
+                )
+                response.raise_for_status()
+                return response.json() if expect_json else response.text
+            except requests.exceptions.SSLError as err:
+                last_error = err
+                logger.warning("SSL error while fetching Casablanca data: %s", err)
+                if verify and _ALLOW_INSECURE:
+                    verify = False
+                    continue
+                break
+            except requests.exceptions.HTTPError as err:
+                last_error = err
+                if response.status_code not in RETRY_STATUSES:
+                    break
+            except requests.exceptions.RequestException as err:
+                last_error = err
+                response = None
+            finally:
+                metrics.observe("bvc.http", time.perf_counter() - started)
+                if response is None or not response.ok:
+                    metrics.increment("bvc.http.errors")
+        if attempt + 1 < HTTP_ATTEMPTS:
+            metrics.increment("bvc.http.retries")
+            time.sleep(_backoff(attempt, response))
     raise last_error
 
 
@@ -135,53 +349,14 @@ def scrape_casablanca_stock_exchange():
         values = data.get("data", {}).get("values", [])
         if not isinstance(values, list):
             raise ValueError("Unexpected JSON payload for Casablanca API")
-        stocks = []
-        for stock_data in values:
-            ticker = stock_data.get("ticker")
-            if isinstance(ticker, str):
-                ticker = ticker.strip().upper()
-            closing_price = _to_float(_pick_value(
-                stock_data,
-                "field_last_price",
-                "field_last_price_value",
-                "field_closing_price",
-                "field_close_price",
-                "field_last",
-                "field_last_trade_price",
-                "field_dernier_cours",
-                "field_last_course",
-                "field_price",
-            ))
-            if closing_price is None:
-                closing_price = _to_float(_pick_value(
-                    stock_data,
-                    "field_opening_price",
-                    "field_open",
-                    "field_high_price",
-                    "field_high",
-                    "field_low_price",
-                    "field_low",
-                ))
-            stocks.append({
-                "ticker": ticker,
-                "label": stock_data.get("label") or stock_data.get("libelle"),
-                "sector": stock_data.get("sector") or stock_data.get("secteur"),
-                "closing_price": closing_price,
-                "opening_price": _to_float(_pick_value(stock_data, "field_opening_price", "field_open")),
-                "high_price": _to_float(_pick_value(stock_data, "field_high_price", "field_high")),
-                "low_price": _to_float(_pick_value(stock_data, "field_low_price", "field_low")),
-                "variation": _to_float(_pick_value(
-                    stock_data,
-                    "field_variation",
-                    "field_variation_percent",
-                    "field_difference",
-                    "field_change",
-                )),
-            })
+        started = time.perf_counter()
+        stocks = _parse_api_values(values)
+        metrics.observe("bvc.parse", time.perf_counter() - started)
         if not stocks:
             cached = _cache_get(allow_stale=True)
             return cached or _unavailable_payload("No Casablanca stocks parsed")
         result = {"status": "success", "data": stocks}
+        instrument_registry.register_bvc(stocks)
         _cache_set(result)
         return result
     except Exception as exc:
@@ -190,10 +365,93 @@ def scrape_casablanca_stock_exchange():
         return cached or _unavailable_payload(str(exc))
 
 
+def _cell_text(cell):
+    # Same text as BeautifulSoup's get_text(strip=True).
+    return "".join(text.strip() for text in cell.itertext())
+
+
+def _overview_table_lxml(html):
+    document = lxml_html.fromstring(html)
+    table = next(document.iter("table"), None)
+    if table is None:
+        return None
+    header_cells = [_cell_text(th).lower() for th in table.iter("th")]
+    rows = []
+    for tr in table.iter("tr"):
+        values = [_cell_text(td) for td in tr.iter("td")]
+        if values:
+            rows.append(values)
+    return header_cells, rows
+
+
+def _overview_table_bs4(html):
+    table = BeautifulSoup(html, "html.parser").find("table")
+    if not table:
+        return None
+    header_cells = [th.get_text(strip=True).lower() for th in table.find_all("th")]
+    rows = []
+    for tr in table.find_all("tr"):
+        values = [td.get_text(strip=True) for td in tr.find_all("td")]
+        if values:
+            rows.append(values)
+    return header_cells, rows
+
+
+def _overview_table(html, parser=None):
+    """
+    Header names and cell texts of the first table of the overview page, or
+    None without a table. Uses lxml when installed (parsing in C and walking
+    only the table), the pure-Python html.parser otherwise or when lxml
+    rejects the document (e.g. a str with an encoding declaration).
+    """
+    parser = parser or ("lxml" if lxml_html is not None else "html.parser")
+    if parser == "lxml" and lxml_html is not None:
+        try:
+            return _overview_table_lxml(html)
+        except (ValueError, lxml_html.etree.ParserError) as exc:
+            logger.debug("lxml could not parse the overview page, using html.parser: %s", exc)
+    if BeautifulSoup is not None:
+        return _overview_table_bs4(html)
+    return None
+
+
+def _column_plan(header_cells):
+    """
+    Cell indices to try per stock field, resolved once per table: one plan
+    for rows that line up with the header, one for rows that do not.
+    """
+    by_name = {name: index for index, name in enumerate(header_cells)}
+    aligned = [(field, [by_name[key] for key in keys if key in by_name]) for field, keys in OVERVIEW_COLUMNS]
+    positional = [(field, [int(key) for key in keys if key.isdigit()]) for field, keys in OVERVIEW_COLUMNS]
+    return aligned, positional
+
+
+def _stocks_from_table(header_cells, rows):
+    aligned, positional = _column_plan(header_cells)
+    stocks = []
+    for values in rows:
+        plan = aligned if header_cells and len(values) == len(header_cells) else positional
+        size = len(values)
+        stock = {}
+        for field, indices in plan:
+            value = next((values[index] for index in indices if index < size and values[index]), None)
+            stock[field] = value if field in _TEXT_COLUMNS else _to_float(value)
+        if not stock["ticker"]:
+            continue
+        if stock["closing_price"] is None:
+            stock["closing_price"] = stock["opening_price"] or stock["high_price"] or stock["low_price"]
+        stocks.append(stock)
+    return stocks
+
+
 def scrape_casablanca_live_overview():
     """
     Scrapes the Casablanca Stock Exchange live market overview page for all companies.
     Falls back to the JSON API if HTML parsing fails.
+
+    Single flight: when the cache expires, one thread scrapes and every
+    concurrent caller waits for it and returns the same result, whether the
+    scrape succeeded or not.
     """
     cached = _cache_get()
     if cached:
@@ -202,74 +460,55 @@ def scrape_casablanca_live_overview():
     if requests is None:
         return _unavailable_payload("requests is not installed")
 
+    with _cache_lock:
+        generation = _cache["generation"]
+    if not _refresh_lock.acquire(timeout=REFRESH_WAIT):
+        metrics.increment("bvc.refresh.wait_timeout")
+        return _cache_get(allow_stale=True) or _unavailable_payload("Casablanca refresh still in progress")
+    try:
+        with _cache_lock:
+            if _cache["generation"] != generation and _cache["result"] is not None:
+                # Another thread refreshed while this one waited.
+                metrics.increment("bvc.refresh.shared")
+                return _cache["result"]
+        cached = _cache_get()
+        if cached:
+            return cached
+        started = time.perf_counter()
+        result = _scrape_live_overview()
+        metrics.observe("bvc.refresh", time.perf_counter() - started)
+        metrics.increment(f"bvc.refresh.{result.get('status', 'unknown')}")
+        with _cache_lock:
+            _cache["generation"] += 1
+            _cache["result"] = result
+        return result
+    finally:
+        _refresh_lock.release()
+
+
+def _scrape_live_overview():
     api_result = scrape_casablanca_stock_exchange()
     if api_result.get("status") == "success" and api_result.get("data"):
         return api_result
 
-    url = "https://www.casablanca-bourse.com/fr/live-market/overview"
     try:
-        html = _request_with_retries(url, timeout=10)
+        html = _request_with_retries(OVERVIEW_URL, timeout=10)
     except Exception as exc:
         logger.warning("Casablanca overview unavailable: %s", exc)
         cached = _cache_get(allow_stale=True)
         return cached or api_result
 
-    if BeautifulSoup is None:
+    table = _overview_table(html)
+    if table is None:
         cached = _cache_get(allow_stale=True)
         return cached or api_result
 
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table")
-    if not table:
-        cached = _cache_get(allow_stale=True)
-        return cached or api_result
-
-    header_cells = [th.get_text(strip=True).lower() for th in table.find_all("th")]
-    rows = []
-    for tr in table.find_all("tr"):
-        tds = tr.find_all("td")
-        if not tds:
-            continue
-        values = [td.get_text(strip=True) for td in tds]
-        if header_cells and len(values) == len(header_cells):
-            row = dict(zip(header_cells, values))
-        else:
-            row = {str(i): v for i, v in enumerate(values)}
-        rows.append(row)
-
-    if not rows:
-        cached = _cache_get(allow_stale=True)
-        return cached or _unavailable_payload("No Casablanca stocks parsed")
-
-    stocks = []
-    for row in rows:
-        ticker = row.get("ticker") or row.get("code") or row.get("0")
-        label = row.get("libellé") or row.get("libelle") or row.get("name") or row.get("1")
-        sector = row.get("secteur") or row.get("sector") or row.get("2")
-        closing_price = _to_float(row.get("dernier") or row.get("cours") or row.get("2"))
-        opening_price = _to_float(row.get("ouverture") or row.get("3"))
-        high_price = _to_float(row.get("haut") or row.get("4"))
-        low_price = _to_float(row.get("bas") or row.get("5"))
-        variation = _to_float(row.get("variation") or row.get("6"))
-        if closing_price is None:
-            closing_price = opening_price or high_price or low_price
-        if not ticker:
-            continue
-        stocks.append({
-            "ticker": ticker,
-            "label": label,
-            "sector": sector,
-            "closing_price": closing_price,
-            "opening_price": opening_price,
-            "high_price": high_price,
-            "low_price": low_price,
-            "variation": variation,
-        })
-
+    stocks = _stocks_from_table(*table)
     if not stocks:
         cached = _cache_get(allow_stale=True)
         return cached or _unavailable_payload("No Casablanca stocks parsed")
     result = {"status": "success", "data": stocks}
+    instrument_registry.register_bvc(stocks)
     _cache_set(result)
     return result
 
@@ -286,3 +525,21 @@ def get_casablanca_live_data():
         return _stale_payload(cached)
     message = result.get("message") if isinstance(result, dict) else "Unknown error"
     return _unavailable_payload(message or "Unknown error")
+
+
+async def _poll_live_data():
+    return await asyncio.to_thread(get_casablanca_live_data)
+
+
+def _encode_json(payload) -> bytes:
+    return json.dumps(payload).encode("utf-8")
+
+
+# One poller per worker feeds every BVC stream and WebSocket client.
+bvc_broadcaster = Broadcaster(
+    "bvc",
+    poll=_poll_live_data,
+    encode=_encode_json,
+    interval=STREAM_INTERVAL,
+    queue_size=STREAM_QUEUE_SIZE,
+)
@@ -2,8 +2,10 @@ from datetime import datetime
 
 try:
     from ..db import models
+    from .instruments import instrument_registry
 except ImportError:  # Fallback for legacy/Flask usage
     import models
+    from services.instruments import instrument_registry
 
 class ChallengeEngine:
     @staticmethod
@@ -63,6 +65,13 @@ class ChallengeEngine:
         if quantity <= 0 or price <= 0:
             return {"error": "Invalid trade quantity or price"}
 
+        # Positions are keyed by canonical symbol, whichever alias the client sent.
+        instrument = instrument_registry.resolve(asset)
+        if instrument is not None:
+            if market and market != instrument.market:
+                return {"error": f"{instrument.symbol} is not listed on {market}"}
+            asset = instrument.symbol
+
         # Reset daily starting equity when a new trading day begins.
         last_trade = db_session.query(models.Trade).filter_by(account_id=account_id).order_by(models.Trade.timestamp.desc()).first()
         if last_trade and last_trade.timestamp.date() != datetime.utcnow().date():
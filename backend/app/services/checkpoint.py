@@ -0,0 +1,69 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.environ.get(
+    "SNAPSHOT_CHECKPOINT_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "checkpoints")),
+)
+CHECKPOINT_INTERVAL = float(os.environ.get("SNAPSHOT_CHECKPOINT_INTERVAL", "30"))
+
+
+class Checkpoint:
+    """
+    Last-known-good copy of a payload on disk. Saves are throttled to one per
+    `min_interval` seconds and written to a temporary file first, then
+    renamed over the previous checkpoint, so a crash never leaves a partial
+    file behind.
+    """
+
+    def __init__(self, name: str, directory: str = CHECKPOINT_DIR, min_interval: float = CHECKPOINT_INTERVAL) -> None:
+        self.path = os.path.join(directory, f"{name}.json")
+        self.min_interval = min_interval
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    def save(self, data: bytes, force: bool = False) -> bool:
+        """
+        Writes already encoded JSON. Returns False when throttled or on error.
+        """
+        now = time.time()
+        if not force and now - self._saved_at < self.min_interval:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self.path)
+            self._saved_at = now
+            return True
+        except OSError as exc:
+            logger.warning("Could not write checkpoint %s: %s", self.path, exc)
+            return False
+        finally:
+            self._lock.release()
+
+    def load(self) -> Optional[Any]:
+        return load_json(self.path)
+
+
+def load_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, "rb") as handle:
+            return json.loads(handle.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable checkpoint %s: %s", path, exc)
+        return None
@@ -0,0 +1,96 @@
+from typing import Optional, Sequence
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def _ends(n: int, threshold: int):
+    # Budgets too small to hold any bucket: the last point, then the first too.
+    return np.array([n - 1] if threshold < 2 else [0, n - 1], dtype=int)
+
+
+def lttb_indices(y: Sequence[float], threshold: int, x: Optional[Sequence[float]] = None):
+    """
+    Largest-Triangle-Three-Buckets: picks `threshold` points (first and last
+    included) that preserve the visual shape of the series. Bucket averages
+    come from cumulative sums; only the per-bucket selection loops, over
+    `threshold` buckets rather than over the raw points.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return _ends(n, threshold)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    csum_x = np.concatenate(([0.0], np.cumsum(x)))
+    csum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[1:] - edges[:-1]
+    avg_x = (csum_x[edges[1:]] - csum_x[edges[:-1]]) / sizes
+    avg_y = (csum_y[edges[1:]] - csum_y[edges[:-1]]) / sizes
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    anchor = 0
+    buckets = threshold - 2
+    for i in range(buckets):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < buckets:
+            next_x, next_y = avg_x[i + 1], avg_y[i + 1]
+        else:
+            next_x, next_y = x[-1], y[-1]
+        ax, ay = x[anchor], y[anchor]
+        area = np.abs((ax - next_x) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y - ay))
+        anchor = lo + int(np.argmax(area))
+        selected[i + 1] = anchor
+    return selected
+
+
+def minmax_indices(y: Sequence[float], threshold: int):
+    """
+    Keeps the minimum and maximum of each equal-width bucket, plus both ends,
+    in at most `threshold` points, so spikes are never dropped.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    buckets = (threshold - 2) // 2
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return _ends(n, threshold)
+    if buckets < 1:
+        # Room for one point besides the ends: the extreme farthest from them.
+        deviation = np.abs(y - (y[0] + y[-1]) / 2)
+        return np.unique([0, int(np.argmax(deviation)), n - 1])
+    bucket_of = (np.arange(n) * buckets) // n
+    # Sorted by (bucket, value): the first entry of a bucket is its min, the last its max.
+    order = np.lexsort((y, bucket_of))
+    boundaries = np.flatnonzero(np.diff(bucket_of[order])) + 1
+    firsts = order[np.concatenate(([0], boundaries))]
+    lasts = order[np.concatenate((boundaries - 1, [n - 1]))]
+    return np.unique(np.concatenate(([0, n - 1], firsts, lasts)))
+
+
+def downsample_indices(y: Sequence[float], threshold: int, method: str = "lttb", x: Optional[Sequence[float]] = None):
+    if np is None:
+        return list(range(len(y)))
+    if method == "minmax":
+        return minmax_indices(y, threshold)
+    return lttb_indices(y, threshold, x)
+
+
+def downsample(values: Sequence, threshold: int, method: str = "lttb", key=None, x=None) -> list:
+    """
+    Returns the subset of `values` that best draws in `threshold` pixels.
+    `key` extracts the plotted value from each item (for bars).
+    """
+    if threshold <= 0 or len(values) <= threshold:
+        return list(values)
+    y = [key(item) for item in values] if key is not None else values
+    return [values[int(index)] for index in downsample_indices(y, threshold, method, x)]
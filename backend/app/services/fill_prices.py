@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .casablanca_service import get_casablanca_live_data
+from .instruments import MARKET_BVC, instrument_registry
+from .market_data import STALE_STATUS, MarketDataService
+from .market_simulator import market_simulator
+from .market_snapshot import market_snapshot_publisher
+from .metrics import metrics
+from .quote_store import quote_store
+
+
+logger = logging.getLogger(__name__)
+
+FILL_PRICE_MAX_AGE = float(os.environ.get("FILL_PRICE_MAX_AGE", "15"))
+FILL_FETCH_TIMEOUT = float(os.environ.get("FILL_FETCH_TIMEOUT", "3"))
+
+
+def _price(quote: Optional[Dict[str, Any]]) -> Optional[float]:
+    value = (quote or {}).get("price")
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+        return float(value)
+    return None
+
+
+class FillPriceService:
+    """
+    Server-side prices for trade fills. Each symbol is read in O(1) from
+    the published market snapshot or the quote store, as long as the quote
+    is at most FILL_PRICE_MAX_AGE seconds old; the rest are fetched in one
+    batch bounded by FILL_FETCH_TIMEOUT. Every lookup is timed into the
+    `fill.price` histogram (`fill.price.fetch` for the fallback alone).
+    """
+
+    def __init__(self, max_age: float = FILL_PRICE_MAX_AGE, fetch_timeout: float = FILL_FETCH_TIMEOUT) -> None:
+        self.max_age = max_age
+        self.fetch_timeout = fetch_timeout
+
+    def lookup(self, symbols: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Fills available without a provider call, and the symbols whose
+        quote is missing or older than the staleness bound.
+        """
+        now = time.time()
+        snapshot = market_snapshot_publisher.current
+        snapshot_age = now - market_snapshot_publisher.checked_at
+        if snapshot is None or snapshot.status == STALE_STATUS or snapshot_age > self.max_age:
+            snapshot = None
+        fills: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for symbol in symbols:
+            price = _price(snapshot.by_symbol.get(symbol)) if snapshot is not None else None
+            if price is not None:
+                fills[symbol] = {"symbol": symbol, "price": price, "source": "snapshot", "age": round(snapshot_age, 3)}
+                continue
+            cached = quote_store.cached(symbol)
+            price = _price(cached[1]) if cached is not None else None
+            if price is not None and now - cached[0] <= self.max_age:
+                fills[symbol] = {"symbol": symbol, "price": price, "source": "quote_store", "age": round(now - cached[0], 3)}
+                continue
+            stale.append(symbol)
+        return fills, stale
+
+    async def fetch(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetches fresh quotes for `symbols` (Casablanca from the board cache,
+        the rest from the snapshot providers) and records them in the quote
+        store. Symbols still without a price after the timeout are left out.
+        """
+        bvc = [
+            symbol for symbol in symbols
+            if not market_simulator.enabled and instrument_registry.market_of(symbol) == MARKET_BVC
+        ]
+        others = [symbol for symbol in symbols if symbol not in bvc]
+
+        async def board() -> Dict[str, Dict[str, Any]]:
+            if not bvc:
+                return {}
+            result = await asyncio.to_thread(get_casablanca_live_data)
+            if result.get("status") != "success":
+                return {}
+            rows = {str(row.get("ticker") or "").strip().upper(): row for row in result.get("data") or []}
+            return {
+                symbol: {"price": rows[symbol].get("closing_price"), "change_pct": rows[symbol].get("variation")}
+                for symbol in bvc if symbol in rows
+            }
+
+        started = time.perf_counter()
+        try:
+            quoted, board_quotes = await asyncio.wait_for(
+                asyncio.gather(MarketDataService.get_yahoo_snapshot_async(others), board()),
+                self.fetch_timeout,
+            )
+        except asyncio.TimeoutError:
+            metrics.increment("fill.price.timeouts")
+            logger.warning("Fill price fetch timed out for %s", ",".join(symbols))
+            return {}
+        except Exception as exc:
+            logger.warning("Fill price fetch failed for %s: %s", ",".join(symbols), exc)
+            return {}
+        finally:
+            metrics.observe("fill.price.fetch", time.perf_counter() - started)
+        fetched = {**(quoted or {}), **board_quotes}
+        quote_store.record(symbols, fetched)
+        fills = {}
+        for symbol in symbols:
+            price = _price(fetched.get(symbol))
+            if price is not None:
+                fills[symbol] = {"symbol": symbol, "price": price, "source": "fetch", "age": 0.0}
+        return fills
+
+    async def prices_async(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fill per canonical symbol (`price`, `source`, `age` in seconds);
+        symbols without any price are absent.
+        """
+        started = time.perf_counter()
+        fills, stale = self.lookup(symbols)
+        if stale:
+            metrics.increment("fill.price.fallback", len(stale))
+            fills.update(await self.fetch(stale))
+        metrics.observe("fill.price", time.perf_counter() - started)
+        return fills
+
+    async def price_async(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return (await self.prices_async([symbol])).get(symbol)
+
+
+fill_prices = FillPriceService()
@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import requests
+    from requests.structures import CaseInsensitiveDict
+except Exception:
+    requests = None
+    CaseInsensitiveDict = dict
+
+
+logger = logging.getLogger(__name__)
+
+MODE_LIVE = "live"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+HTTP_MODE = os.environ.get("MARKET_HTTP_MODE", MODE_LIVE).strip().lower() or MODE_LIVE
+CASSETTE_DIR = os.environ.get(
+    "MARKET_CASSETTE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "cassettes")),
+)
+REPLAY_LATENCY_MS = float(os.environ.get("MARKET_REPLAY_LATENCY_MS", "0"))
+REPLAY_JITTER_MS = float(os.environ.get("MARKET_REPLAY_JITTER_MS", "0"))
+REPLAY_ERROR_RATE = float(os.environ.get("MARKET_REPLAY_ERROR_RATE", "0"))
+REPLAY_SEED = os.environ.get("MARKET_REPLAY_SEED")
+
+# Query parameters that carry credentials are neither part of the key nor written to disk.
+SECRET_PARAMS = {"token", "apikey", "api_key", "key", "access_token"}
+RECORDED_HEADERS = ("Content-Type", "Content-Encoding", "Date", "ETag", "Last-Modified")
+
+
+def is_offline() -> bool:
+    """
+    True when every provider call is served from cassettes, so fetchers that
+    bypass the HTTP session (yfinance) should be skipped.
+    """
+    return HTTP_MODE == MODE_REPLAY
+
+
+def _redact(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key.lower() not in SECRET_PARAMS]
+    query.sort()
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def cassette_path(method: str, url: str, directory: str = CASSETTE_DIR) -> str:
+    redacted = _redact(url)
+    digest = hashlib.sha1(f"{method.upper()} {redacted}".encode("utf-8")).hexdigest()[:20]
+    host = urlsplit(redacted).netloc.replace(":", "_") or "local"
+    return os.path.join(directory, host, f"{digest}.json")
+
+
+def _write_atomic(path: str, payload: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+if requests is not None:
+
+    class CassetteSession(requests.Session):
+        """
+        requests.Session that records provider responses to cassette files or
+        replays them without touching the network. Replay can add latency and
+        fail a fraction of calls with ConnectionError, so the fallback paths of
+        the market services get exercised too. A request without a cassette
+        fails like an unreachable host.
+        """
+
+        def __init__(
+            self,
+            mode: str = HTTP_MODE,
+            directory: str = CASSETTE_DIR,
+            latency_ms: float = REPLAY_LATENCY_MS,
+            jitter_ms: float = REPLAY_JITTER_MS,
+            error_rate: float = REPLAY_ERROR_RATE,
+            seed: Optional[str] = REPLAY_SEED,
+        ) -> None:
+            super().__init__()
+            self.mode = mode
+            self.directory = directory
+            self.latency_ms = latency_ms
+            self.jitter_ms = jitter_ms
+            self.error_rate = error_rate
+            self._random = random.Random(seed)
+            self._random_lock = threading.Lock()
+            self._replayed: Dict[str, Dict[str, Any]] = {}
+            self.stats = {"recorded": 0, "replayed": 0, "missing": 0, "injected_errors": 0}
+
+        def request(self, method, url, params=None, **kwargs):
+            prepared_url = requests.Request(method, url, params=params).prepare().url
+            path = cassette_path(method, prepared_url, self.directory)
+            if self.mode == MODE_REPLAY:
+                return self._replay(method, prepared_url, path)
+            response = super().request(method, url, params=params, **kwargs)
+            if self.mode == MODE_RECORD:
+                self._record(method, prepared_url, path, response)
+            return response
+
+        def _record(self, method: str, url: str, path: str, response) -> None:
+            content = response.content or b""
+            try:
+                body: Dict[str, Any] = {"text": content.decode("utf-8")}
+            except UnicodeDecodeError:
+                body = {"base64": base64.b64encode(content).decode("ascii")}
+            headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+            # requests has already decoded the body.
+            headers.pop("Content-Encoding", None)
+            try:
+                _write_atomic(path, {
+                    "method": method.upper(),
+                    "url": _redact(url),
+                    "status": response.status_code,
+                    "headers": headers,
+                    "encoding": response.encoding,
+                    "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1),
+                    "recorded_at": int(time.time()),
+                    **body,
+                })
+                self.stats["recorded"] += 1
+            except OSError as exc:
+                logger.warning("Could not write cassette %s: %s", path, exc)
+
+        def _load(self, path: str) -> Optional[Dict[str, Any]]:
+            entry = self._replayed.get(path)
+            if entry is not None:
+                return entry
+            try:
+                with open(path, "r", encoding="utf-8") as handle:
+                    entry = json.load(handle)
+            except (OSError, ValueError):
+                return None
+            self._replayed[path] = entry
+            return entry
+
+        def _replay(self, method: str, url: str, path: str):
+            with self._random_lock:
+                delay = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+                fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            if delay > 0:
+                time.sleep(delay / 1000.0)
+            if fail:
+                self.stats["injected_errors"] += 1
+                raise requests.exceptions.ConnectionError(f"Injected replay failure for {_redact(url)}")
+            entry = self._load(path)
+            if entry is None:
+                self.stats["missing"] += 1
+                raise requests.exceptions.ConnectionError(f"No cassette for {method.upper()} {_redact(url)}")
+            self.stats["replayed"] += 1
+            response = requests.Response()
+            response.status_code = int(entry.get("status", 200))
+            response.headers = CaseInsensitiveDict(entry.get("headers") or {})
+            if "base64" in entry:
+                response._content = base64.b64decode(entry["base64"])
+            else:
+                response._content = str(entry.get("text", "")).encode("utf-8")
+            response.encoding = entry.get("encoding") or "utf-8"
+            response.url = url
+            response.reason = "OK" if response.status_code < 400 else "Replayed"
+            response.request = requests.Request(method, url).prepare()
+            return response
+
+else:
+    CassetteSession = None
+
+
+def build_http_session(pool_size: Optional[int] = None):
+    """
+    Session used by the market data providers: a plain requests.Session in
+    live mode, a CassetteSession when MARKET_HTTP_MODE is record or replay.
+    `pool_size` sizes the keep-alive pool per host, for sessions shared by
+    more threads than the default pool of 10 connections.
+    """
+    if requests is None:
+        return None
+    if HTTP_MODE in (MODE_RECORD, MODE_REPLAY):
+        logger.info("Market HTTP %s mode, cassettes in %s", HTTP_MODE, CASSETTE_DIR)
+        session = CassetteSession()
+    else:
+        session = requests.Session()
+    if pool_size:
+        # Retries are left to the callers, which know which errors are worth it.
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
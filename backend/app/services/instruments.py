@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+MARKET_NASDAQ = "Nasdaq"
+MARKET_CRYPTO = "Crypto"
+MARKET_FOREX = "Forex"
+MARKET_BVC = "Bourse de Casablanca"
+MARKETS = (MARKET_NASDAQ, MARKET_CRYPTO, MARKET_FOREX, MARKET_BVC)
+
+# Static asset lists
+NASDAQ_TOP_50 = [
+    {"symbol": "AAPL", "name": "Apple"}, {"symbol": "MSFT", "name": "Microsoft"},
+    {"symbol": "NVDA", "name": "NVIDIA"}, {"symbol": "AMZN", "name": "Amazon"},
+    {"symbol": "META", "name": "Meta Platforms"}, {"symbol": "GOOGL", "name": "Alphabet Class A"},
+    {"symbol": "TSLA", "name": "Tesla"}, {"symbol": "AVGO", "name": "Broadcom"},
+    {"symbol": "COST", "name": "Costco"}, {"symbol": "NFLX", "name": "Netflix"}
+    # Add more if needed, keeping the list manageable
+]
+CRYPTO_TICKERS = [
+    {"symbol": "BTC-USD", "name": "Bitcoin"}, {"symbol": "ETH-USD", "name": "Ethereum"},
+    {"symbol": "BNB-USD", "name": "BNB"}, {"symbol": "SOL-USD", "name": "Solana"}
+]
+FOREX_TICKERS = [
+    {"symbol": "EURUSD=X", "name": "EUR/USD"}, {"symbol": "GBPUSD=X", "name": "GBP/USD"},
+    {"symbol": "USDJPY=X", "name": "USD/JPY"}
+]
+
+BVC_SEED_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "data", "market_overview_fallback.json")
+)
+
+
+@dataclass
+class Instrument:
+    symbol: str
+    name: str
+    market: str
+    currency: str
+    tick_size: float
+    providers: Dict[str, str] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def provider_code(self, provider: str) -> Optional[str]:
+        return self.providers.get(provider)
+
+
+def _crypto_instrument(symbol: str, name: Optional[str] = None) -> Instrument:
+    base = symbol[:-len("-USD")]
+    return Instrument(
+        symbol=symbol,
+        name=name or base,
+        market=MARKET_CRYPTO,
+        currency="$",
+        tick_size=0.01,
+        providers={"yahoo": symbol, "binance": f"{base}USDT"},
+        metadata={"base": base, "quote": "USD"},
+    )
+
+
+def _forex_instrument(symbol: str, name: Optional[str] = None) -> Instrument:
+    pair = symbol[:-len("=X")]
+    base, quote = pair[:3], pair[3:6]
+    return Instrument(
+        symbol=symbol,
+        name=name or f"{base}/{quote}",
+        market=MARKET_FOREX,
+        currency="$",
+        tick_size=0.01 if quote == "JPY" else 0.0001,
+        providers={"yahoo": symbol, "frankfurter": f"{base}/{quote}"},
+        metadata={"base": base, "quote": quote},
+    )
+
+
+def _stock_instrument(symbol: str, name: Optional[str] = None) -> Instrument:
+    return Instrument(
+        symbol=symbol,
+        name=name or symbol,
+        market=MARKET_NASDAQ,
+        currency="$",
+        tick_size=0.01,
+        providers={
+            "yahoo": symbol,
+            "finnhub": symbol,
+            "polygon": symbol,
+            "stooq": f"{symbol.lower()}.us",
+        },
+    )
+
+
+def _bvc_instrument(ticker: str, name: Optional[str] = None, sector: Optional[str] = None) -> Instrument:
+    metadata: Dict[str, Any] = {}
+    if sector:
+        metadata["sector"] = sector
+    return Instrument(
+        symbol=ticker,
+        name=name or ticker,
+        market=MARKET_BVC,
+        currency="DH",
+        tick_size=0.01,
+        providers={"casablanca": ticker, "tradingview": f"CSEMA:{ticker}"},
+        metadata=metadata,
+    )
+
+
+def infer_instrument(symbol: str) -> Optional[Instrument]:
+    """
+    Builds an unregistered instrument from the Yahoo-style symbol conventions
+    (`-USD` for crypto, `=X` for forex, anything else is a US stock).
+    """
+    symbol = (symbol or "").strip().upper()
+    if not symbol:
+        return None
+    if symbol.endswith("-USD") and len(symbol) > len("-USD"):
+        return _crypto_instrument(symbol)
+    if symbol.endswith("=X"):
+        if len(symbol) < 8:
+            return None
+        return _forex_instrument(symbol)
+    return _stock_instrument(symbol)
+
+
+class InstrumentRegistry:
+    """
+    Instrument master keyed by every known alias (canonical symbol, provider
+    codes and common spellings), so lookups are a single dict access.
+    """
+
+    def __init__(self) -> None:
+        self._by_symbol: Dict[str, Instrument] = {}
+        self._by_alias: Dict[str, Instrument] = {}
+        self._by_market: Dict[str, Tuple[Instrument, ...]] = {}
+        self._lock = threading.Lock()
+        # Bumped on every change, so derived indexes know when to rebuild.
+        self.version = 0
+
+    @staticmethod
+    def _key(alias: str) -> str:
+        return str(alias or "").strip().upper()
+
+    @staticmethod
+    def _aliases(instrument: Instrument) -> List[str]:
+        aliases = [instrument.symbol]
+        aliases.extend(instrument.providers.values())
+        base = instrument.metadata.get("base")
+        quote = instrument.metadata.get("quote")
+        if base and quote:
+            aliases.extend([f"{base}{quote}", f"{base}/{quote}", f"{base}-{quote}"])
+            if instrument.market == MARKET_CRYPTO:
+                aliases.append(base)
+        return aliases
+
+    def register(self, instrument: Instrument, aliases: Iterable[str] = ()) -> Instrument:
+        with self._lock:
+            previous = self._by_symbol.get(instrument.symbol)
+            self._by_symbol[instrument.symbol] = instrument
+            for alias in [*self._aliases(instrument), *aliases]:
+                key = self._key(alias)
+                if not key:
+                    continue
+                owner = self._by_alias.get(key)
+                # Canonical symbols always win over provider aliases of other instruments.
+                if owner is not None and owner.symbol != instrument.symbol and self._key(owner.symbol) == key:
+                    continue
+                self._by_alias[key] = instrument
+            if previous is not None and previous.market == instrument.market:
+                members = tuple(
+                    instrument if item.symbol == instrument.symbol else item
+                    for item in self._by_market[instrument.market]
+                )
+            else:
+                if previous is not None:
+                    self._by_market[previous.market] = tuple(
+                        item for item in self._by_market.get(previous.market, ()) if item.symbol != instrument.symbol
+                    )
+                members = (*self._by_market.get(instrument.market, ()), instrument)
+            self._by_market[instrument.market] = members
+            self.version += 1
+        return instrument
+
+    def resolve(self, alias: str) -> Optional[Instrument]:
+        return self._by_alias.get(self._key(alias))
+
+    def resolve_or_infer(self, alias: str) -> Optional[Instrument]:
+        return self.resolve(alias) or infer_instrument(alias)
+
+    def canonical_symbol(self, alias: str) -> str:
+        instrument = self.resolve(alias)
+        if instrument is not None:
+            return instrument.symbol
+        return str(alias or "").strip()
+
+    def market_of(self, alias: str) -> Optional[str]:
+        instrument = self.resolve_or_infer(alias)
+        return instrument.market if instrument else None
+
+    def by_market(self, market: str) -> Tuple[Instrument, ...]:
+        return self._by_market.get(market, ())
+
+    def markets(self) -> List[str]:
+        return list(self._by_market.keys())
+
+    def all(self) -> List[Instrument]:
+        return list(self._by_symbol.values())
+
+    def register_bvc(self, stocks: Iterable[Dict[str, Any]]) -> None:
+        """
+        Upserts Bourse de Casablanca tickers from a scraped payload. Rows that
+        match the registered instrument are skipped without taking the lock.
+        """
+        for stock in stocks:
+            ticker = stock.get("ticker")
+            if not isinstance(ticker, str) or not ticker.strip():
+                continue
+            ticker = ticker.strip().upper()
+            label = stock.get("label")
+            sector = stock.get("sector")
+            existing = self._by_symbol.get(ticker)
+            if existing is not None and existing.market == MARKET_BVC:
+                if (not label or existing.name == label) and (not sector or existing.metadata.get("sector") == sector):
+                    continue
+                metadata = dict(existing.metadata)
+                if sector:
+                    metadata["sector"] = sector
+                self.register(replace(existing, name=label or existing.name, metadata=metadata))
+                continue
+            if existing is not None:
+                # Never let a BVC ticker shadow a registered instrument of another market.
+                continue
+            self.register(_bvc_instrument(ticker, label, sector))
+
+
+def _load_bvc_seed(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            rows = json.load(handle)
+    except Exception:
+        return []
+    if not isinstance(rows, list):
+        return []
+    return [
+        {"ticker": row.get("symbol"), "label": row.get("name")}
+        for row in rows
+        if isinstance(row, dict) and row.get("market") == MARKET_BVC
+    ]
+
+
+def build_instrument_registry() -> InstrumentRegistry:
+    registry = InstrumentRegistry()
+    for item in NASDAQ_TOP_50:
+        registry.register(_stock_instrument(item["symbol"], item["name"]))
+    for item in CRYPTO_TICKERS:
+        registry.register(_crypto_instrument(item["symbol"], item["name"]))
+    for item in FOREX_TICKERS:
+        registry.register(_forex_instrument(item["symbol"], item["name"]))
+    registry.register_bvc(_load_bvc_seed(BVC_SEED_PATH))
+    return registry
+
+
+instrument_registry = build_instrument_registry()
@@ -0,0 +1,147 @@
+"""
+Throughput/latency benchmark of the market snapshot and history paths.
+
+Record provider responses once with network access, then replay them
+anywhere without it:
+
+    MARKET_HTTP_MODE=record python -m app.services.market_bench --iterations 1
+    MARKET_HTTP_MODE=replay MARKET_REPLAY_LATENCY_MS=40 MARKET_REPLAY_ERROR_RATE=0.05 \
+        python -m app.services.market_bench --iterations 50
+
+Run from the backend directory. Caches are bypassed so every iteration goes
+through the providers (or their cassettes).
+
+`--html` benchmarks only the Casablanca overview HTML parsers, on a saved
+page or on the recorded overview cassette:
+
+    python -m app.services.market_bench --html cassette --iterations 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+def _summary(name: str, samples: List[float], errors: int) -> Dict[str, Any]:
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    total = sum(ordered)
+    return {
+        "path": name,
+        "iterations": len(ordered),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(0.50) * 1000, 2),
+        "p95_ms": round(percentile(0.95) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "ops_per_s": round(len(ordered) / total, 2) if total else 0.0,
+    }
+
+
+async def _measure(name: str, iterations: int, call: Callable[[], Awaitable[Any]]) -> Dict[str, Any]:
+    samples: List[float] = []
+    errors = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        try:
+            await call()
+        except Exception:
+            errors += 1
+        samples.append(time.perf_counter() - started)
+    return _summary(name, samples, errors)
+
+
+async def run(iterations: int, history_points: int) -> Dict[str, Any]:
+    from . import casablanca_service
+    from .http_cassette import HTTP_MODE
+    from .instruments import MARKET_CRYPTO, MARKET_FOREX, MARKET_NASDAQ, instrument_registry
+    from .market_data import REQUEST_SESSION, MarketDataService
+    from .market_snapshot import market_snapshot_publisher
+
+    service = MarketDataService()
+    history_symbols = [
+        instruments[0].symbol
+        for instruments in (instrument_registry.by_market(market) for market in (MARKET_NASDAQ, MARKET_CRYPTO, MARKET_FOREX))
+        if instruments
+    ]
+
+    async def snapshot_path():
+        # Force the BVC scrape, every market regardless of its session
+        # schedule, and skip the universe cache on every iteration.
+        casablanca_service._cache["ts"] = 0.0
+        MarketDataService._yahoo_snapshot_ts = 0.0
+        MarketDataService._finnhub_snapshot_ts = 0.0
+        assets = await MarketDataService.get_market_universe_async.__wrapped__(service, force=True)
+        market_snapshot_publisher.publish(assets)
+
+    async def history_path():
+        await MarketDataService.get_history_async(history_symbols, history_points)
+
+    results = [
+        await _measure("snapshot", iterations, snapshot_path),
+        await _measure("history", iterations, history_path),
+    ]
+    return {
+        "mode": HTTP_MODE,
+        "http": {
+            "market_data": dict(getattr(REQUEST_SESSION, "stats", {})),
+            "casablanca": dict(getattr(casablanca_service._SESSION, "stats", {})),
+        },
+        "results": results,
+    }
+
+
+def _recorded_overview_html(source: str) -> str:
+    from .casablanca_service import OVERVIEW_URL
+    from .http_cassette import cassette_path
+
+    if source != "cassette":
+        with open(source, "r", encoding="utf-8") as handle:
+            return handle.read()
+    with open(cassette_path("GET", OVERVIEW_URL), "r", encoding="utf-8") as handle:
+        return json.load(handle)["text"]
+
+
+async def run_parse(iterations: int, source: str) -> Dict[str, Any]:
+    from .casablanca_service import _overview_table, _stocks_from_table
+
+    html = _recorded_overview_html(source)
+    results = []
+    parsed = {}
+    for parser in ("html.parser", "lxml"):
+        async def parse_path(parser=parser):
+            table = _overview_table(html, parser)
+            parsed[parser] = _stocks_from_table(*table) if table else []
+
+        results.append(await _measure(f"parse:{parser}", iterations, parse_path))
+    return {
+        "bytes": len(html),
+        "stocks": len(parsed.get("lxml") or []),
+        "identical": parsed.get("lxml") == parsed.get("html.parser"),
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--history-points", type=int, default=20)
+    parser.add_argument("--html", help="saved overview page, or `cassette` for the recorded one")
+    args = parser.parse_args()
+    if args.html:
+        report = asyncio.run(run_parse(max(1, args.iterations), args.html))
+    else:
+        report = asyncio.run(run(max(1, args.iterations), args.history_points))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
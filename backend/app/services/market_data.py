@@ -3,11 +3,29 @@ try:
 except Exception:
     yf = None
 import asyncio
+import logging
 import math
 import os
 from typing import List, Dict, Any, Optional
+from .bvc_ticks import bvc_tick_store
 from .caching import cache
+from .candles import SPARKLINE_POINTS, candle_store, overview_with_sparklines, sparkline_key
+from .checkpoint import Checkpoint, load_json
+from .http_cassette import build_http_session, is_offline
 from .casablanca_service import scrape_casablanca_stock_exchange, scrape_casablanca_live_overview
+from .instruments import (
+    CRYPTO_TICKERS,
+    FOREX_TICKERS,
+    MARKET_BVC,
+    MARKET_CRYPTO,
+    MARKET_FOREX,
+    MARKET_NASDAQ,
+    NASDAQ_TOP_50,
+    instrument_registry,
+)
+from .market_simulator import market_simulator
+from .market_snapshot import MarketSnapshot, market_snapshot_publisher
+from .trading_calendar import trading_calendar
 
 try:
     import requests
@@ -19,35 +37,34 @@ import json
 import time
 from datetime import datetime, timedelta
 
-# Static asset lists
-NASDAQ_TOP_50 = [
-    {"symbol": "AAPL", "name": "Apple"}, {"symbol": "MSFT", "name": "Microsoft"},
-    {"symbol": "NVDA", "name": "NVIDIA"}, {"symbol": "AMZN", "name": "Amazon"},
-    {"symbol": "META", "name": "Meta Platforms"}, {"symbol": "GOOGL", "name": "Alphabet Class A"},
-    {"symbol": "TSLA", "name": "Tesla"}, {"symbol": "AVGO", "name": "Broadcom"},
-    {"symbol": "COST", "name": "Costco"}, {"symbol": "NFLX", "name": "Netflix"}
-    # Add more if needed, keeping the list manageable
-]
-CRYPTO_TICKERS = [
-    {"symbol": "BTC-USD", "name": "Bitcoin"}, {"symbol": "ETH-USD", "name": "Ethereum"},
-    {"symbol": "BNB-USD", "name": "BNB"}, {"symbol": "SOL-USD", "name": "Solana"}
-]
-FOREX_TICKERS = [
-    {"symbol": "EURUSD=X", "name": "EUR/USD"}, {"symbol": "GBPUSD=X", "name": "GBP/USD"},
-    {"symbol": "USDJPY=X", "name": "USD/JPY"}
-]
-
 REQUEST_TIMEOUT = float(os.environ.get("MARKET_HTTP_TIMEOUT", "6"))
-REQUEST_SESSION = requests.Session() if requests is not None else None
+REQUEST_SESSION = build_http_session()
 YAHOO_CACHE_TTL = int(os.environ.get("YAHOO_CACHE_TTL", "120"))
 FINNHUB_CACHE_TTL = int(os.environ.get("FINNHUB_CACHE_TTL", "30"))
 
+logger = logging.getLogger(__name__)
+
+SIMULATED_STATUS = "simulated"
+STALE_STATUS = "stale"
+OVERVIEW_FALLBACK_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "data", "market_overview_fallback.json")
+)
+snapshot_checkpoint = Checkpoint("market_overview")
+
 
 class MarketDataService:
     _yahoo_snapshot_cache: Dict[str, Dict[str, Any]] = {}
     _yahoo_snapshot_ts: float = 0.0
     _finnhub_snapshot_cache: Dict[str, Dict[str, Any]] = {}
     _finnhub_snapshot_ts: float = 0.0
+    _snapshot_refresh_lock: Optional[asyncio.Lock] = None
+    _snapshot_stream_clients: int = 0
+    _snapshot_stream_task: Optional[asyncio.Task] = None
+    _snapshot_warmup_task: Optional[asyncio.Task] = None
+    # Earliest time of the next warm-up refresh after every provider failed.
+    _snapshot_warmup_retry_at: float = 0.0
+    _market_rows: Dict[str, List[Dict[str, Any]]] = {}
+    _market_refreshed_at: Dict[str, float] = {}
     @staticmethod
     def _http_headers() -> Dict[str, str]:
         return {
@@ -65,21 +82,39 @@ class MarketDataService:
 
     @staticmethod
     def _binance_symbol(symbol: str) -> str:
-        if symbol.endswith("-USD"):
-            return symbol.replace("-USD", "") + "USDT"
-        return symbol
+        instrument = instrument_registry.resolve_or_infer(symbol)
+        if instrument is None:
+            return symbol
+        return instrument.provider_code("binance") or symbol
 
     @staticmethod
     def _forex_pair(symbol: str) -> Optional[Dict[str, str]]:
-        if not symbol.endswith("=X") or len(symbol) < 7:
+        instrument = instrument_registry.resolve_or_infer(symbol)
+        if instrument is None or instrument.market != MARKET_FOREX:
             return None
-        pair = symbol.replace("=X", "")
-        return {"base": pair[:3], "quote": pair[3:6]}
+        return {"base": instrument.metadata["base"], "quote": instrument.metadata["quote"]}
 
     @staticmethod
     def _stooq_symbol(symbol: str) -> str:
+        instrument = instrument_registry.resolve(symbol)
+        if instrument is not None and instrument.provider_code("stooq"):
+            return instrument.provider_code("stooq")
         return f"{symbol.lower()}.us"
 
+    @staticmethod
+    def _split_by_market(symbols: List[str]) -> Dict[str, List[str]]:
+        """
+        Groups requested symbols (kept as given) by the market of their instrument.
+        Unknown symbols are treated as stocks.
+        """
+        groups: Dict[str, List[str]] = {MARKET_CRYPTO: [], MARKET_FOREX: [], MARKET_NASDAQ: []}
+        for symbol in symbols:
+            market = instrument_registry.market_of(symbol)
+            if market not in (MARKET_CRYPTO, MARKET_FOREX):
+                market = MARKET_NASDAQ
+            groups[market].append(symbol)
+        return groups
+
     @staticmethod
     def _fetch_binance_snapshot(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
         if requests is None or not symbols:
@@ -298,13 +333,11 @@ class MarketDataService:
 
     @staticmethod
     def _fetch_free_snapshot(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
-        crypto = [s for s in symbols if s.endswith("-USD")]
-        forex = [s for s in symbols if s.endswith("=X")]
-        stocks = [s for s in symbols if s not in crypto and s not in forex]
+        groups = MarketDataService._split_by_market(symbols)
         snapshot: Dict[str, Dict[str, Any]] = {}
-        snapshot.update(MarketDataService._fetch_binance_snapshot(crypto))
-        snapshot.update(MarketDataService._fetch_forex_snapshot(forex))
-        snapshot.update(MarketDataService._fetch_yahoo_quote_snapshot(stocks))
+        snapshot.update(MarketDataService._fetch_binance_snapshot(groups[MARKET_CRYPTO]))
+        snapshot.update(MarketDataService._fetch_forex_snapshot(groups[MARKET_FOREX]))
+        snapshot.update(MarketDataService._fetch_yahoo_quote_snapshot(groups[MARKET_NASDAQ]))
         return snapshot
 
     @staticmethod
@@ -505,6 +538,21 @@ class MarketDataService:
         service = MarketDataService()
         return MarketDataService._run_async(service.get_market_universe_async())
 
+    @staticmethod
+    def get_asset_cached(symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up one asset of the current market snapshot by any instrument alias.
+        """
+        instrument = instrument_registry.resolve(symbol)
+        if instrument is None:
+            return None
+        snapshot = market_snapshot_publisher.current
+        if market_simulator.enabled:
+            snapshot = MarketDataService._publish_simulated()
+        elif snapshot is None or not market_snapshot_publisher.is_fresh():
+            snapshot = market_snapshot_publisher.publish(MarketDataService.get_market_universe_cached())
+        return snapshot.by_symbol.get(instrument.symbol)
+
     @staticmethod
     def get_history_cached(symbols: List[str], points: int) -> Dict[str, List[float]]:
         service = MarketDataService()
@@ -518,10 +566,13 @@ class MarketDataService:
         """
         if not tickers:
             return {}
+        if market_simulator.enabled:
+            return market_simulator.quotes(tickers)
         
-        crypto = [s for s in tickers if s.endswith("-USD")]
-        forex = [s for s in tickers if s.endswith("=X")]
-        stocks = [s for s in tickers if s not in crypto and s not in forex]
+        groups = MarketDataService._split_by_market(tickers)
+        crypto = groups[MARKET_CRYPTO]
+        forex = groups[MARKET_FOREX]
+        stocks = groups[MARKET_NASDAQ]
 
         crypto_task = asyncio.to_thread(MarketDataService._fetch_binance_snapshot, crypto)
         forex_task = asyncio.to_thread(MarketDataService._fetch_forex_snapshot, forex)
@@ -544,8 +595,8 @@ class MarketDataService:
         if not missing:
             return merged
 
-        # If yfinance is not available (offline dev), return what we have
-        if yf is None:
+        # If yfinance is not available (offline dev or cassette replay), return what we have
+        if yf is None or is_offline():
             return merged
 
         def blocking_download():
@@ -603,20 +654,28 @@ class MarketDataService:
         """
         if not tickers:
             return {}
+        if market_simulator.enabled:
+            return {symbol: market_simulator.history(symbol, points) for symbol in tickers}
 
         history: Dict[str, List[float]] = {}
         for symbol in tickers:
-            if symbol.endswith("-USD"):
+            market = instrument_registry.market_of(symbol)
+            if market == MARKET_BVC:
+                # Recorded from the board scrapes; no provider has BVC history.
+                history[symbol] = bvc_tick_store.daily_closes(symbol, points)
+            elif market == MARKET_CRYPTO:
                 history[symbol] = await asyncio.to_thread(MarketDataService._fetch_binance_history, symbol, points)
-            elif symbol.endswith("=X"):
+            elif market == MARKET_FOREX:
                 history[symbol] = await asyncio.to_thread(MarketDataService._fetch_forex_history, symbol, points)
             else:
                 history[symbol] = await asyncio.to_thread(MarketDataService._fetch_stooq_history, symbol, points)
 
-        missing = [s for s in tickers if not history.get(s)]
+        missing = [s for s in tickers if not history.get(s) and instrument_registry.market_of(s) != MARKET_BVC]
+        if not missing:
+            return history
 
-        # If yfinance is not available (offline dev), return what we have
-        if yf is None:
+        # If yfinance is not available (offline dev or cassette replay), return what we have
+        if yf is None or is_offline():
             return history
 
         def blocking_download():
@@ -652,60 +711,217 @@ class MarketDataService:
         return history
 
     @cache(ttl_seconds=int(os.environ.get("MARKET_OVERVIEW_TTL", "8")))
-    async def get_market_universe_async(self) -> List[Dict[str, Any]]:
+    async def get_market_universe_async(self, force: bool = False) -> List[Dict[str, Any]]:
         """
         Asynchronously builds a full market overview, fetching data from BVC and Yahoo Finance
-        concurrently. Cache TTL is controlled by MARKET_OVERVIEW_TTL (default 8s).
+        concurrently. Cache TTL is controlled by MARKET_OVERVIEW_TTL (default 8s); each
+        market is refreshed on its trading-session cadence (see trading_calendar), or
+        every market at once with `force` (used by the benchmark).
         """
+        if market_simulator.enabled:
+            market_simulator.advance_to_now()
+            return market_simulator.assets()
+
+        # Only markets whose session calls for a refresh hit the providers;
+        # the others reuse their last rows.
+        refreshed_at = MarketDataService._market_refreshed_at
+        quoted_markets = (MARKET_NASDAQ, MARKET_CRYPTO, MARKET_FOREX)
+        due = {
+            market
+            for market in (MARKET_BVC, *quoted_markets)
+            if force
+            or market not in MarketDataService._market_rows
+            or trading_calendar.is_due(market, refreshed_at.get(market))
+        }
+
+        async def no_bvc_refresh() -> Dict[str, Any]:
+            return {}
+
         # Define tasks to be run concurrently
-        bvc_task = asyncio.to_thread(scrape_casablanca_live_overview)
+        bvc_task = asyncio.to_thread(scrape_casablanca_live_overview) if MARKET_BVC in due else no_bvc_refresh()
         
-        yahoo_symbols = [item["symbol"] for item in NASDAQ_TOP_50 + CRYPTO_TICKERS + FOREX_TICKERS]
+        quoted_instruments = [
+            instrument
+            for market in quoted_markets
+            if market in due
+            for instrument in instrument_registry.by_market(market)
+        ]
+        yahoo_symbols = [instrument.symbol for instrument in quoted_instruments]
         yahoo_task = self.get_yahoo_snapshot_async(yahoo_symbols)
 
         # Run tasks concurrently and wait for results
         bvc_result, yahoo_snapshot = await asyncio.gather(bvc_task, yahoo_task)
-
-        assets = []
+        fetched_at = time.time()
+        rows_by_market: Dict[str, List[Dict[str, Any]]] = {market: [] for market in due}
         
         # Process BVC data
         if bvc_result.get("status") == "success":
             for stock in bvc_result.get("data", []):
+                instrument = instrument_registry.resolve(stock.get("ticker") or "")
                 closing_price = stock.get("closing_price")
                 variation = stock.get("variation")
-                assets.append({
-                    "symbol": stock.get("ticker"),
-                    "name": stock.get("label"),
-                    "market": "Bourse de Casablanca",
-                    "currency": "DH",
+                rows_by_market[MARKET_BVC].append({
+                    "symbol": instrument.symbol if instrument else stock.get("ticker"),
+                    "name": stock.get("label") or (instrument.name if instrument else None),
+                    "market": MARKET_BVC,
+                    "currency": instrument.currency if instrument else "DH",
                     "price": MarketDataService._to_json_number(closing_price),
                     "change_pct": MarketDataService._to_json_number(variation),
                     "volume": None, # API doesn't provide volume
                 })
 
         # Process Yahoo Finance data
-        all_yahoo_assets = NASDAQ_TOP_50 + CRYPTO_TICKERS + FOREX_TICKERS
-        for item in all_yahoo_assets:
-            snapshot = yahoo_snapshot.get(item["symbol"], {})
-            market_map = {"-USD": "Crypto", "=X": "Forex"}
-            market = next((m for k, m in market_map.items() if item["symbol"].endswith(k)), "Nasdaq")
-            currency = "DH" if market == "Bourse de Casablanca" else "$"
-            
-            assets.append({
-                "symbol": item["symbol"],
-                "name": item["name"],
-                "market": market,
-                "currency": currency,
+        for instrument in quoted_instruments:
+            snapshot = yahoo_snapshot.get(instrument.symbol, {})
+            rows_by_market[instrument.market].append({
+                "symbol": instrument.symbol,
+                "name": instrument.name,
+                "market": instrument.market,
+                "currency": instrument.currency,
                 "price": MarketDataService._to_json_number(snapshot.get("price")),
                 "change_pct": MarketDataService._to_json_number(snapshot.get("change_pct")),
                 "volume": MarketDataService._to_json_number(snapshot.get("volume"), as_int=True),
             })
-            
+
+        for market, rows in rows_by_market.items():
+            if any(row.get("price") is not None for row in rows):
+                MarketDataService._market_rows[market] = rows
+                refreshed_at[market] = fetched_at
+            elif market not in MarketDataService._market_rows:
+                # Nothing usable yet: keep the placeholders and retry on the next refresh.
+                MarketDataService._market_rows[market] = rows
+
+        assets = []
+        for market in (MARKET_BVC, *quoted_markets):
+            assets.extend(MarketDataService._market_rows.get(market, ()))
         return assets
 
+    async def get_market_snapshot_async(self) -> MarketSnapshot:
+        """
+        Returns the published market snapshot, refreshing it at most once per
+        MARKET_OVERVIEW_TTL no matter how many requests arrive concurrently.
+        """
+        publisher = market_snapshot_publisher
+        if market_simulator.enabled:
+            return MarketDataService._publish_simulated()
+        current = publisher.current
+        if current is not None and current.status == STALE_STATUS:
+            # Warm-started from a checkpoint: answer now, refresh in the background.
+            task = MarketDataService._snapshot_warmup_task
+            if (task is None or task.done()) and time.time() >= MarketDataService._snapshot_warmup_retry_at:
+                MarketDataService._snapshot_warmup_task = asyncio.create_task(self._refresh_snapshot())
+            return current
+        if publisher.is_fresh():
+            return current
+        return await self._refresh_snapshot()
+
+    async def _refresh_snapshot(self) -> MarketSnapshot:
+        publisher = market_snapshot_publisher
+        if MarketDataService._snapshot_refresh_lock is None:
+            MarketDataService._snapshot_refresh_lock = asyncio.Lock()
+        async with MarketDataService._snapshot_refresh_lock:
+            current = publisher.current
+            if current is not None and current.status != STALE_STATUS and publisher.is_fresh():
+                return current
+            assets = await self.get_market_universe_async()
+            if current is not None and current.status == STALE_STATUS and not any(
+                asset.get("price") is not None for asset in assets
+            ):
+                # Every provider failed; keep serving the checkpoint and retry
+                # no sooner than one snapshot TTL from now.
+                MarketDataService._snapshot_warmup_retry_at = time.time() + publisher.ttl_seconds
+                return current
+            return publisher.publish(assets)
+
+    @staticmethod
+    def warm_start() -> Optional[MarketSnapshot]:
+        """
+        Publishes the last checkpointed universe, or the bundled fallback, as
+        a stale snapshot so the first requests after a restart do not wait
+        for the providers.
+        """
+        publisher = market_snapshot_publisher
+        if market_simulator.enabled or publisher.current is not None:
+            return publisher.current
+        assets = snapshot_checkpoint.load()
+        source = snapshot_checkpoint.path
+        if not isinstance(assets, list) or not assets:
+            assets = load_json(OVERVIEW_FALLBACK_PATH)
+            source = OVERVIEW_FALLBACK_PATH
+        if not isinstance(assets, list) or not assets:
+            return None
+        rows = [
+            {
+                "symbol": row.get("symbol"),
+                "name": row.get("name"),
+                "market": row.get("market"),
+                "currency": row.get("currency"),
+                "price": row.get("price"),
+                "change_pct": row.get("change_pct"),
+                "volume": row.get("volume"),
+            }
+            for row in assets
+            if isinstance(row, dict) and row.get("symbol")
+        ]
+        logger.info("Warm-started market snapshot with %d assets from %s", len(rows), source)
+        return publisher.publish(rows, status=STALE_STATUS)
+
+    @staticmethod
+    def _publish_simulated() -> MarketSnapshot:
+        """
+        Publishes the simulator's prices once per elapsed tick instead of
+        refreshing on the provider TTL.
+        """
+        publisher = market_snapshot_publisher
+        if market_simulator.advance_to_now() or publisher.current is None:
+            return publisher.publish(market_simulator.assets(), status=SIMULATED_STATUS)
+        return publisher.current
+
+    def open_snapshot_stream(self) -> None:
+        """
+        Registers a streaming client. A single refresher task per worker keeps
+        the snapshot current while at least one client is connected.
+        """
+        MarketDataService._snapshot_stream_clients += 1
+        task = MarketDataService._snapshot_stream_task
+        if task is None or task.done():
+            MarketDataService._snapshot_stream_task = asyncio.create_task(self._refresh_snapshot_while_streaming())
+
+    def close_snapshot_stream(self) -> None:
+        MarketDataService._snapshot_stream_clients = max(0, MarketDataService._snapshot_stream_clients - 1)
+
+    async def _refresh_snapshot_while_streaming(self) -> None:
+        while MarketDataService._snapshot_stream_clients > 0:
+            try:
+                await self.get_market_snapshot_async()
+            except Exception as exc:
+                logger.warning("Market snapshot refresh failed: %s", exc)
+            interval = market_simulator.tick_interval if market_simulator.enabled else market_snapshot_publisher.ttl_seconds
+            await asyncio.sleep(interval)
+
     @cache(ttl_seconds=60)
     async def get_history_cached_async(self, symbols: List[str], points: int) -> Dict[str, List[float]]:
         """
         Asynchronously gets and caches historical data. Caches the result in Redis for 60 seconds.
         """
         return await self.get_history_async(symbols, points)
+
+
+def _checkpoint_snapshot(snapshot: MarketSnapshot, previous: Optional[MarketSnapshot]) -> None:
+    if snapshot.status == "live":
+        snapshot_checkpoint.save(snapshot.encoded("overview").identity)
+
+
+market_snapshot_publisher.add_listener(_checkpoint_snapshot)
+market_snapshot_publisher.add_listener(candle_store.on_snapshot)
+
+
+def _precompute_sparklines(snapshot: MarketSnapshot, previous: Optional[MarketSnapshot]) -> None:
+    # Runs after the candle store has taken this snapshot's quotes.
+    snapshot.encoded(
+        sparkline_key(SPARKLINE_POINTS),
+        lambda current: overview_with_sparklines(current, SPARKLINE_POINTS),
+    )
+
+
+market_snapshot_publisher.add_listener(_precompute_sparklines)
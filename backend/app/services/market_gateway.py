@@ -0,0 +1,152 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .instruments import instrument_registry
+from .market_snapshot import MarketSnapshot, SnapshotDelta
+
+
+MAX_SYMBOLS = int(os.environ.get("WS_MAX_SYMBOLS", "200"))
+ALL_MARKETS = {"*", "all"}
+
+
+class GatewaySession:
+    """
+    Subscription state of one market WebSocket client, plus the updates that
+    arrived since the last flush. Deltas are merged per symbol, so a client
+    receives at most one update per symbol per flush however often the
+    snapshot changes.
+
+    Topics: `symbols:AAPL,BTC-USD` (any instrument alias), `market:Crypto`
+    (`market:*` for everything), `pulse` and `bvc`.
+    """
+
+    def __init__(self) -> None:
+        self.symbols: Set[str] = set()
+        self.markets: Set[str] = set()
+        self.pulse = False
+        self.bvc = False
+        self.seq = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._removed: Set[str] = set()
+        self._pulse_pending = False
+        self._bvc_pending: Optional[bytes] = None
+
+    def apply(self, op: str, topics: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Subscribes to or unsubscribes from topics. Returns (accepted, rejected).
+        """
+        accepted: List[str] = []
+        rejected: List[str] = []
+        subscribe = op == "subscribe"
+        for raw in topics:
+            topic = str(raw or "").strip()
+            kind, _, value = topic.partition(":")
+            kind = kind.lower()
+            if kind in {"symbol", "symbols"} and value:
+                for alias in value.split(","):
+                    if not alias.strip():
+                        continue
+                    symbol = instrument_registry.canonical_symbol(alias)
+                    if not subscribe:
+                        self.symbols.discard(symbol)
+                    elif symbol in self.symbols:
+                        continue
+                    elif len(self.symbols) >= MAX_SYMBOLS:
+                        rejected.append(f"symbol:{symbol}")
+                        continue
+                    else:
+                        self.symbols.add(symbol)
+                    accepted.append(f"symbol:{symbol}")
+            elif kind == "market" and value:
+                market = "*" if value.lower() in ALL_MARKETS else value
+                if subscribe:
+                    self.markets.add(market)
+                else:
+                    self.markets.discard(market)
+                accepted.append(f"market:{market}")
+            elif topic == "pulse":
+                self.pulse = subscribe
+                accepted.append(topic)
+            elif topic == "bvc":
+                self.bvc = subscribe
+                if not subscribe:
+                    self._bvc_pending = None
+                accepted.append(topic)
+            else:
+                rejected.append(topic)
+        return accepted, rejected
+
+    def wants(self, symbol: str, market: Optional[str]) -> bool:
+        if symbol in self.symbols:
+            return True
+        if "*" in self.markets:
+            return True
+        return market is not None and market in self.markets
+
+    def assets_for(self, snapshot: MarketSnapshot, topics: List[str]) -> List[Dict[str, Any]]:
+        """
+        Current rows for newly accepted symbol/market topics.
+        """
+        symbols = {topic.split(":", 1)[1] for topic in topics if topic.startswith("symbol:")}
+        markets = {topic.split(":", 1)[1] for topic in topics if topic.startswith("market:")}
+        if "*" in markets:
+            return list(snapshot.assets)
+        return [
+            asset
+            for asset in snapshot.assets
+            if asset.get("symbol") in symbols or asset.get("market") in markets
+        ]
+
+    def add_delta(self, delta: SnapshotDelta, snapshot: MarketSnapshot) -> None:
+        self.seq = delta.seq
+        if self.symbols or self.markets:
+            for change in delta.changes:
+                symbol = change.get("symbol")
+                row = snapshot.by_symbol.get(symbol)
+                market = change.get("market") or (row.get("market") if row else instrument_registry.market_of(symbol))
+                if not self.wants(symbol, market):
+                    continue
+                self._removed.discard(symbol)
+                self._pending.setdefault(symbol, {}).update(change)
+            for symbol in delta.removed:
+                if self._pending.pop(symbol, None) is not None or self.wants(symbol, instrument_registry.market_of(symbol)):
+                    self._removed.add(symbol)
+        if self.pulse:
+            self._pulse_pending = True
+
+    def set_bvc(self, payload: bytes) -> None:
+        if self.bvc:
+            self._bvc_pending = payload
+
+    def drain(self, snapshot: Optional[MarketSnapshot]) -> List[str]:
+        """
+        Returns the coalesced messages to send and clears the pending state.
+        """
+        messages: List[str] = []
+        if self._pending or self._removed:
+            messages.append(json.dumps({
+                "type": "update",
+                "seq": self.seq,
+                "changes": list(self._pending.values()),
+                "removed": sorted(self._removed),
+            }))
+            self._pending = {}
+            self._removed = set()
+        if self._pulse_pending and snapshot is not None:
+            messages.append(encode_message("pulse", snapshot.encoded("pulse").identity, seq=snapshot.seq))
+            self._pulse_pending = False
+        if self._bvc_pending is not None:
+            messages.append(encode_message("bvc", self._bvc_pending))
+            self._bvc_pending = None
+        return messages
+
+
+def encode_message(message_type: str, data: bytes, seq: Optional[int] = None) -> str:
+    """
+    Wraps an already encoded JSON payload without re-serialising it.
+    """
+    head = {"type": message_type}
+    if seq is not None:
+        head["seq"] = seq
+    return json.dumps(head)[:-1] + ',"data":' + data.decode("utf-8") + "}"
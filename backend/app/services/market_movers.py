@@ -0,0 +1,134 @@
+import bisect
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+ALL_MARKETS = "*"
+# Movers kept per side and market in each published view (the pulse `k` cap).
+MOVERS_TOP_K = int(os.environ.get("MOVERS_TOP_K", "50"))
+EMPTY_BREADTH = {"advancers": 0, "decliners": 0, "unchanged": 0, "average_change_pct": None}
+Entry = Tuple[float, str]
+
+
+class MoversView:
+    """
+    Immutable per-snapshot copy of the movers index: the MOVERS_TOP_K lowest
+    and highest (change_pct, symbol) entries and the breadth counters, per
+    market and for `*`.
+    """
+
+    __slots__ = ("extremes", "breadth")
+
+    def __init__(
+        self,
+        extremes: Dict[str, Tuple[Tuple[Entry, ...], Tuple[Entry, ...]]],
+        breadth: Dict[str, Dict[str, Any]],
+    ) -> None:
+        self.extremes = extremes
+        self.breadth = breadth
+
+    def markets(self) -> List[str]:
+        return [market for market in self.extremes if market != ALL_MARKETS]
+
+    def gainers(self, market: str = ALL_MARKETS, k: int = 5) -> List[str]:
+        top = self.extremes.get(market, ((), ()))[1]
+        return [symbol for _, symbol in reversed(top[-k:])] if k > 0 else []
+
+    def losers(self, market: str = ALL_MARKETS, k: int = 5) -> List[str]:
+        return [symbol for _, symbol in self.extremes.get(market, ((), ()))[0][:k]] if k > 0 else []
+
+
+class MoversIndex:
+    """
+    Keeps every quoted symbol in a sorted list per market, updated from
+    snapshot deltas with bisect instead of re-sorting the universe, along
+    with advancers/decliners/unchanged counts and the sum of moves. Views
+    only copy the `top_k` extremes of the markets a delta touched.
+    """
+
+    def __init__(self, top_k: int = MOVERS_TOP_K) -> None:
+        self.top_k = max(1, top_k)
+        self._entries: Dict[str, List[Entry]] = {ALL_MARKETS: []}
+        self._counts: Dict[str, Dict[str, float]] = {}
+        self._state: Dict[str, Tuple[str, float]] = {}
+        # Markets changed since the last view; the others keep their extremes.
+        self._dirty: Set[str] = {ALL_MARKETS}
+        self._extremes: Dict[str, Tuple[Tuple[Entry, ...], Tuple[Entry, ...]]] = {}
+
+    def _counter(self, market: str) -> Dict[str, float]:
+        counter = self._counts.get(market)
+        if counter is None:
+            counter = {"advancers": 0, "decliners": 0, "unchanged": 0, "sum": 0.0}
+            self._counts[market] = counter
+        return counter
+
+    def _count(self, market: str, change: float, sign: int) -> None:
+        for key in (market, ALL_MARKETS):
+            counter = self._counter(key)
+            if change > 0:
+                counter["advancers"] += sign
+            elif change < 0:
+                counter["decliners"] += sign
+            else:
+                counter["unchanged"] += sign
+            counter["sum"] += sign * change
+
+    def _remove(self, symbol: str) -> None:
+        state = self._state.pop(symbol, None)
+        if state is None:
+            return
+        market, change = state
+        entry = (change, symbol)
+        for key in (market, ALL_MARKETS):
+            entries = self._entries[key]
+            index = bisect.bisect_left(entries, entry)
+            if index < len(entries) and entries[index] == entry:
+                del entries[index]
+            self._dirty.add(key)
+        self._count(market, change, -1)
+
+    def _insert(self, symbol: str, market: str, change: float) -> None:
+        entry = (change, symbol)
+        for key in (market, ALL_MARKETS):
+            bisect.insort(self._entries.setdefault(key, []), entry)
+            self._dirty.add(key)
+        self._count(market, change, 1)
+        self._state[symbol] = (market, change)
+
+    def apply(
+        self,
+        changes: Iterable[Dict[str, Any]],
+        removed: Iterable[str],
+        by_symbol: Dict[str, Dict[str, Any]],
+    ) -> None:
+        for symbol in removed:
+            self._remove(symbol)
+        for change in changes:
+            if "change_pct" not in change and "market" not in change:
+                continue
+            symbol = change.get("symbol")
+            asset = by_symbol.get(symbol)
+            self._remove(symbol)
+            if asset is None:
+                continue
+            value = asset.get("change_pct")
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self._insert(symbol, asset.get("market") or "", float(value))
+
+    def view(self) -> MoversView:
+        breadth = {}
+        for market, counter in self._counts.items():
+            total = int(counter["advancers"] + counter["decliners"] + counter["unchanged"])
+            breadth[market] = {
+                "advancers": int(counter["advancers"]),
+                "decliners": int(counter["decliners"]),
+                "unchanged": int(counter["unchanged"]),
+                "average_change_pct": (round(counter["sum"] / total, 2) or 0.0) if total else None,
+            }
+        # O(markets touched * top_k): untouched markets share last view's tuples.
+        k = self.top_k
+        for market in self._dirty:
+            entries = self._entries.get(market, [])
+            self._extremes[market] = (tuple(entries[:k]), tuple(entries[-k:]))
+        self._dirty.clear()
+        return MoversView(dict(self._extremes), breadth)
@@ -1,113 +1,323 @@
 import asyncio
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 
-async def get_market_data():
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        try:
-            await page.goto("https://www.casablanca-bourse.com/fr/live-market/overview", wait_until="load", timeout=60000)
-        except Exception as e:
-            print(f"Error navigating to page: {e}")
-            await browser.close()
-            return None
+try:
+    from playwright.async_api import async_playwright
+except Exception:
+    async_playwright = None
+
+try:
+    from bs4 import BeautifulSoup
+except Exception:
+    BeautifulSoup = None
+
+try:
+    import lxml  # noqa: F401
+    _SOUP_PARSER = "lxml"
+except Exception:
+    _SOUP_PARSER = "html.parser"
+
+from .casablanca_service import OVERVIEW_URL, _to_float
+from .checkpoint import Checkpoint
+from .instruments import MARKET_BVC
+from .trading_calendar import trading_calendar
+
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: every worker that enables it runs its own headless Chromium, which
+# needs `python -m playwright install --with-deps chromium` at build time.
+INDICES_ENABLED = os.environ.get("BVC_INDICES_SCRAPE", "0").lower() in {"1", "true", "yes"}
+INDICES_INTERVAL = float(os.environ.get("BVC_INDICES_INTERVAL", "60"))
+INDICES_MAX_BACKOFF = float(os.environ.get("BVC_INDICES_MAX_BACKOFF", "900"))
+BROWSER_CONTEXTS = int(os.environ.get("BVC_BROWSER_CONTEXTS", "1"))
+PAGE_TIMEOUT_MS = float(os.environ.get("BVC_PAGE_TIMEOUT_MS", "30000"))
+# Layout does not need these; skipping them is most of the page weight.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+COOKIE_BUTTON_SELECTOR = 'button:has-text("J\'accepte")'
+TABLE_SELECTOR = r'div.grid.grid-cols-1.md\:grid-cols-2.gap-6'
+
+
+async def _block_heavy_resources(route) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
 
-        cookie_button_selector = 'button:has-text("J\'accepte")'
-        try:
-            await page.click(cookie_button_selector, timeout=5000)
-            print("Cookie banner accepted.")
-        except Exception:
-            print("Cookie banner not found or could not be clicked.")
 
-        table_selector = 'div.grid.grid-cols-1.md\:grid-cols-2.gap-6'
+class BrowserPool:
+    """
+    One headless Chromium per worker with a fixed set of browser contexts,
+    launched on first use and reused by every scrape. Contexts block images,
+    fonts and media and keep their cookies, so the consent banner is only
+    clicked once per context. A crashed browser is relaunched on next use.
+    """
+
+    def __init__(self, size: int = BROWSER_CONTEXTS) -> None:
+        self.size = max(1, size)
+        self.consented: set = set()
+        self._playwright = None
+        self._browser = None
+        self._contexts: Optional[asyncio.Queue] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def available(self) -> bool:
+        return async_playwright is not None
+
+    async def _start(self) -> None:
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=True)
+        contexts: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.size):
+            context = await self._browser.new_context(locale="fr-FR")
+            await context.route("**/*", _block_heavy_resources)
+            contexts.put_nowait(context)
+        self._contexts = contexts
+        logger.info("Started Chromium pool with %d context(s)", self.size)
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Yields `(context, page)`: a fresh page in a pooled context, closed
+        again afterwards while the context goes back to the pool.
+        """
+        if not self.available:
+            raise RuntimeError("playwright is not installed")
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                await self.close()
+                await self._start()
+            contexts = self._contexts
+        context = await contexts.get()
+        page = None
         try:
-            await page.wait_for_selector(table_selector, timeout=30000)
-            print("Variation tables are visible.")
-        except Exception as e:
-            await page.screenshot(path='screenshot_error_table.png')
-            print(f"Error waiting for variation tables: {e}")
-            await browser.close()
-            return None
-        
-        content = await page.content()
-        await browser.close()
-        
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        data = {
-            "indices": [],
-            "market_summary": {},
-            "top_gainers": [],
-            "top_losers": []
-        }
+            page = await context.new_page()
+            yield context, page
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            contexts.put_nowait(context)
+
+    async def close(self) -> None:
+        browser, playwright = self._browser, self._playwright
+        self._browser = self._playwright = self._contexts = None
+        self.consented.clear()
+        for closer in (browser.close if browser else None, playwright.stop if playwright else None):
+            if closer is None:
+                continue
+            try:
+                await closer()
+            except Exception:
+                pass
+
+
+def _text(tag) -> str:
+    return tag.get_text(strip=True) if tag is not None else ""
+
+
+def _variation_rows(table) -> List[Dict[str, Any]]:
+    rows = []
+    for row in table.select("tbody tr"):
+        cols = row.find_all("td")
+        if len(cols) == 4:
+            rows.append({
+                "name": _text(cols[0]),
+                "price": _to_float(_text(cols[1])),
+                "diff_mad": _to_float(_text(cols[2])),
+                "diff_percent": _to_float(_text(cols[3])),
+            })
+    return rows
+
 
-        # Scrape Indices
-        indices_section = soup.find('h3', string='Indices')
-        if indices_section:
-            indices_container = indices_section.find_next_sibling('div')
-            if indices_container:
-                for element in indices_container.find_all('div', class_='bg-gray-800', recursive=False):
-                    name_tag = element.find('p', class_='text-sm leading-5 font-medium text-white')
-                    value_tag = element.find('h3', class_='text-2xl leading-8 font-semibold text-white')
-                    variation_tags = element.find_all('p', class_='text-xs leading-5 font-bold')
-                    
-                    if name_tag and value_tag and len(variation_tags) >= 2:
-                        data['indices'].append({
-                            'name': name_tag.get_text(strip=True),
-                            'value': value_tag.get_text(strip=True),
-                            'variation_points': variation_tags[0].get_text(strip=True),
-                            'variation_percent': variation_tags[1].get_text(strip=True)
-                        })
-
-        # Scrape Market Summary
-        summary_elements = soup.find_all('div', class_='bg-gray-800 py-6 px-4 text-white rounded-lg relative')
-        for element in summary_elements:
-            title_element = element.find('p', class_='text-white mb-[30px]')
-            value_element = element.find('h4')
-            if title_element and value_element:
-                title = title_element.get_text(strip=True)
-                value = value_element.get_text(strip=True).replace('MAD', '').strip()
-                if 'Volume global' in title:
-                    data['market_summary']['volume'] = value
-                elif 'Capitalisation' in title:
-                    data['market_summary']['capitalization'] = value
-        
-        # Scrape Top Gainers and Losers
-        variation_section = soup.find('h3', string='Plus fortes variations')
-        if variation_section:
-            variation_container = variation_section.find_next_sibling('div')
-            variation_tables = variation_container.select('div.relative')
-            
-            if len(variation_tables) > 0:
-                # Plus fortes hausses
-                for row in variation_tables[0].select('tbody tr'):
-                    cols = row.find_all('td')
-                    if len(cols) == 4:
-                        data['top_gainers'].append({
-                            'name': cols[0].get_text(strip=True),
-                            'price': cols[1].get_text(strip=True),
-                            'diff_mad': cols[2].get_text(strip=True),
-                            'diff_percent': cols[3].get_text(strip=True)
-                        })
-                
-                # Plus fortes baisses
-                if len(variation_tables) > 1:
-                    for row in variation_tables[1].select('tbody tr'):
-                        cols = row.find_all('td')
-                        if len(cols) == 4:
-                            data['top_losers'].append({
-                                'name': cols[0].get_text(strip=True),
-                                'price': cols[1].get_text(strip=True),
-                                'diff_mad': cols[2].get_text(strip=True),
-                                'diff_percent': cols[3].get_text(strip=True)
-                            })
-        
+def parse_market_page(content: str) -> Dict[str, Any]:
+    """
+    Indices, market summary (capitalisation and volume, in MAD) and top
+    movers of the rendered overview page, as numbers.
+    """
+    soup = BeautifulSoup(content, _SOUP_PARSER)
+    data: Dict[str, Any] = {
+        "indices": [],
+        "market_summary": {},
+        "top_gainers": [],
+        "top_losers": [],
+    }
+
+    indices_section = soup.find("h3", string="Indices")
+    indices_container = indices_section.find_next_sibling("div") if indices_section else None
+    if indices_container:
+        for element in indices_container.find_all("div", class_="bg-gray-800", recursive=False):
+            name_tag = element.find("p", class_="text-sm leading-5 font-medium text-white")
+            value_tag = element.find("h3", class_="text-2xl leading-8 font-semibold text-white")
+            variation_tags = element.find_all("p", class_="text-xs leading-5 font-bold")
+            if name_tag and value_tag and len(variation_tags) >= 2:
+                data["indices"].append({
+                    "name": _text(name_tag),
+                    "value": _to_float(_text(value_tag)),
+                    "variation_points": _to_float(_text(variation_tags[0])),
+                    "variation_percent": _to_float(_text(variation_tags[1])),
+                })
+
+    for element in soup.find_all("div", class_="bg-gray-800 py-6 px-4 text-white rounded-lg relative"):
+        title_element = element.find("p", class_="text-white mb-[30px]")
+        value_element = element.find("h4")
+        if title_element and value_element:
+            title = _text(title_element)
+            value = _to_float(_text(value_element).replace("MAD", ""))
+            if "Volume global" in title:
+                data["market_summary"]["volume"] = value
+            elif "Capitalisation" in title:
+                data["market_summary"]["capitalization"] = value
+
+    variation_section = soup.find("h3", string="Plus fortes variations")
+    variation_container = variation_section.find_next_sibling("div") if variation_section else None
+    if variation_container:
+        variation_tables = variation_container.select("div.relative")
+        if len(variation_tables) > 0:
+            data["top_gainers"] = _variation_rows(variation_tables[0])
+        if len(variation_tables) > 1:
+            data["top_losers"] = _variation_rows(variation_tables[1])
+    return data
+
+
+class BvcIndicesService:
+    """
+    Scheduled Playwright scrape of the overview page's indices, market
+    summary and top movers. Runs every BVC_INDICES_INTERVAL seconds while
+    the exchange trades and on the closed-market cadence otherwise, backing
+    off after failures; readers only ever get the cached result.
+    """
+
+    def __init__(self, pool: BrowserPool) -> None:
+        self.pool = pool
+        self._data: Optional[Dict[str, Any]] = None
+        self._ts = 0.0
+        self._failures = 0
+        self._checkpoint = Checkpoint("bvc_indices", min_interval=0)
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def enabled(self) -> bool:
+        return INDICES_ENABLED and self.pool.available and BeautifulSoup is not None
+
+    def _interval(self) -> float:
+        return max(INDICES_INTERVAL, trading_calendar.refresh_interval(MARKET_BVC))
+
+    async def _scrape(self) -> Dict[str, Any]:
+        async with self.pool.page() as (context, page):
+            await page.goto(OVERVIEW_URL, wait_until="domcontentloaded", timeout=PAGE_TIMEOUT_MS)
+            if id(context) not in self.pool.consented:
+                try:
+                    await page.click(COOKIE_BUTTON_SELECTOR, timeout=5000)
+                except Exception:
+                    logger.debug("Cookie banner not found or could not be clicked")
+                self.pool.consented.add(id(context))
+            await page.wait_for_selector(TABLE_SELECTOR, timeout=PAGE_TIMEOUT_MS)
+            content = await page.content()
+        return parse_market_page(content)
+
+    async def refresh(self) -> Optional[Dict[str, Any]]:
+        """
+        Scrapes once (concurrent callers share the scrape) and publishes the
+        result when it holds indices or a market summary.
+        """
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        started = self._ts
+        async with self._refresh_lock:
+            if self._ts != started:
+                return self._data
+            data = await self._scrape()
+        if not data["indices"] and not data["market_summary"]:
+            raise ValueError("No indices found on the overview page")
+        self._data = data
+        self._ts = time.time()
+        self._checkpoint.save(json.dumps({"ts": self._ts, **data}).encode("utf-8"))
         return data
 
+    def load_checkpoint(self) -> bool:
+        data = self._checkpoint.load()
+        if self._data is not None or not isinstance(data, dict) or not data.get("indices"):
+            return False
+        data.pop("ts", None)
+        self._data = data
+        # Served as stale until the first scrape of this process.
+        self._ts = 0.0
+        return True
+
+    def payload(self) -> Dict[str, Any]:
+        if self._data is None:
+            message = "BVC indices scraping is disabled" if not self.enabled else "BVC indices not scraped yet"
+            return {"status": "unavailable", "message": message, "updated_at": None}
+        fresh = self._ts and time.time() - self._ts <= 3 * self._interval()
+        return {
+            "status": "success" if fresh else "stale",
+            "updated_at": self._ts or None,
+            **self._data,
+        }
+
+    def start(self) -> None:
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        await self.pool.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                self._failures = 0
+                delay = self._interval()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self._failures += 1
+                delay = min(INDICES_MAX_BACKOFF, INDICES_INTERVAL * (2 ** min(self._failures, 6)))
+                logger.warning("BVC indices scrape failed (%d in a row): %s", self._failures, exc)
+                if self._failures >= 3:
+                    # A wedged browser is cheaper to replace than to debug.
+                    await self.pool.close()
+            await asyncio.sleep(delay)
+
+
+bvc_indices = BvcIndicesService(BrowserPool())
+
+
+async def get_market_data():
+    """
+    One scrape through the shared browser pool. Kept for scripts; the app
+    reads `bvc_indices.payload()` instead.
+    """
+    try:
+        return await bvc_indices.refresh()
+    except Exception as exc:
+        logger.warning("BVC indices scrape failed: %s", exc)
+        return None
+
+
 async def main():
     market_data = await get_market_data()
-    import json
+    await bvc_indices.stop()
     if market_data:
         with open("market_data.json", "w", encoding="utf-8") as f:
             json.dump(market_data, f, indent=2, ensure_ascii=False)
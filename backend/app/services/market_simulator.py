@@ -0,0 +1,274 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from .instruments import (
+    BVC_SEED_PATH,
+    MARKET_BVC,
+    MARKET_CRYPTO,
+    MARKET_FOREX,
+    MARKET_NASDAQ,
+    instrument_registry,
+)
+
+
+logger = logging.getLogger(__name__)
+
+SIMULATED_SOURCE = "simulated"
+MARKET_DATA_SOURCE = os.environ.get("MARKET_DATA_SOURCE", "live").strip().lower()
+# Snapshot publishes per second; each one moves SIM_ACTIVITY of the instruments.
+SIM_TICK_RATE = float(os.environ.get("SIM_TICK_RATE", "2"))
+SIM_ACTIVITY = float(os.environ.get("SIM_ACTIVITY", "0.5"))
+# Simulated seconds per wall-clock second, so demo prices visibly move.
+SIM_TIME_SCALE = float(os.environ.get("SIM_TIME_SCALE", "60"))
+SIM_SEED = os.environ.get("SIM_SEED")
+SIM_VOLATILITY = os.environ.get("SIM_VOLATILITY", "")
+
+SECONDS_PER_YEAR = 365.0 * 24 * 3600
+HISTORY_STEP_SECONDS = 24 * 3600.0
+
+# Annualised (drift, volatility) per market.
+DEFAULT_PARAMS = {
+    MARKET_NASDAQ: (0.08, 0.30),
+    MARKET_CRYPTO: (0.10, 0.80),
+    MARKET_FOREX: (0.0, 0.08),
+    MARKET_BVC: (0.05, 0.20),
+}
+DEFAULT_PRICES = {
+    MARKET_NASDAQ: 150.0,
+    MARKET_CRYPTO: 100.0,
+    MARKET_FOREX: 1.0,
+    MARKET_BVC: 300.0,
+}
+
+
+def _seed_value(seed: Optional[str]) -> Optional[int]:
+    """
+    RNG seed for `SIM_SEED`: the integer itself, or a stable hash of any
+    other string so every value gives a reproducible run.
+    """
+    seed = (seed or "").strip()
+    if not seed:
+        return None
+    try:
+        return abs(int(seed))
+    except ValueError:
+        logger.info("SIM_SEED %r is not an integer, seeding from its hash", seed)
+        return int(hashlib.blake2b(seed.encode(), digest_size=8).hexdigest(), 16)
+
+
+def _parse_overrides(spec: str) -> Dict[str, float]:
+    """
+    Parses `SIM_VOLATILITY`, e.g. `BTC-USD=1.2,Crypto=0.9`: keys are
+    instrument aliases or market names.
+    """
+    overrides: Dict[str, float] = {}
+    for part in spec.split(","):
+        key, _, value = part.partition("=")
+        key = key.strip()
+        if not key or not value.strip():
+            continue
+        try:
+            overrides[key] = float(value)
+        except ValueError:
+            logger.warning("Ignoring invalid SIM_VOLATILITY entry %r", part)
+    return overrides
+
+
+def _load_seed_prices(path: str = BVC_SEED_PATH) -> Dict[str, float]:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            rows = json.load(handle)
+    except Exception:
+        return {}
+    prices = {}
+    for row in rows if isinstance(rows, list) else []:
+        if not isinstance(row, dict):
+            continue
+        try:
+            price = float(row.get("price"))
+        except (TypeError, ValueError):
+            continue
+        if price > 0 and row.get("symbol"):
+            prices[row["symbol"]] = price
+    return prices
+
+
+class MarketSimulator:
+    """
+    Geometric Brownian motion price feed for every registered instrument,
+    producing rows in the same shape as MarketDataService's market universe.
+    Enabled with MARKET_DATA_SOURCE=simulated; no provider is contacted.
+    """
+
+    def __init__(
+        self,
+        tick_rate: float = SIM_TICK_RATE,
+        activity: float = SIM_ACTIVITY,
+        time_scale: float = SIM_TIME_SCALE,
+        seed: Optional[str] = SIM_SEED,
+        volatility: str = SIM_VOLATILITY,
+    ) -> None:
+        self.tick_rate = max(0.01, tick_rate)
+        self.activity = min(1.0, max(0.0, activity))
+        self.time_scale = time_scale
+        self.seed = seed
+        self._overrides = _parse_overrides(volatility)
+        self._rng = np.random.default_rng(_seed_value(seed)) if np is not None else None
+        self._lock = threading.Lock()
+        self._instruments: List[Any] = []
+        self._positions: Dict[str, int] = {}
+        self._last_tick = 0.0
+        self.ticks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return MARKET_DATA_SOURCE == SIMULATED_SOURCE
+
+    @property
+    def tick_interval(self) -> float:
+        return 1.0 / self.tick_rate
+
+    def _params_for(self, instrument) -> tuple:
+        drift, sigma = DEFAULT_PARAMS.get(instrument.market, (0.05, 0.25))
+        for key in (instrument.symbol, instrument.market):
+            if key in self._overrides:
+                sigma = self._overrides[key]
+                break
+        return drift, sigma
+
+    def _ensure_state(self) -> None:
+        instruments = instrument_registry.all()
+        if len(instruments) == len(self._instruments):
+            return
+        if np is None:
+            raise RuntimeError("numpy is required for MARKET_DATA_SOURCE=simulated")
+        seeds = _load_seed_prices()
+        known = {instrument.symbol: index for index, instrument in enumerate(self._instruments)}
+        prices, opens, volumes, drifts, sigmas = [], [], [], [], []
+        for instrument in instruments:
+            index = known.get(instrument.symbol)
+            if index is not None:
+                prices.append(self._price[index])
+                opens.append(self._open[index])
+                volumes.append(self._volume[index])
+            else:
+                price = seeds.get(instrument.symbol) or DEFAULT_PRICES.get(instrument.market, 100.0)
+                prices.append(price)
+                opens.append(price)
+                volumes.append(0.0)
+            drift, sigma = self._params_for(instrument)
+            drifts.append(drift)
+            sigmas.append(sigma)
+        self._instruments = instruments
+        self._positions = {instrument.symbol: index for index, instrument in enumerate(instruments)}
+        self._price = np.array(prices, dtype=float)
+        self._open = np.array(opens, dtype=float)
+        self._volume = np.array(volumes, dtype=float)
+        self._drift = np.array(drifts, dtype=float)
+        self._sigma = np.array(sigmas, dtype=float)
+        self._tick_size = np.array([instrument.tick_size or 0.01 for instrument in instruments], dtype=float)
+
+    def step(self, ticks: int = 1) -> None:
+        """
+        Advances the simulation by `ticks` tick intervals in one vectorised pass.
+        """
+        with self._lock:
+            self._ensure_state()
+            count = len(self._instruments)
+            if not count or ticks <= 0:
+                return
+            dt = ticks * self.tick_interval * self.time_scale / SECONDS_PER_YEAR
+            shocks = self._rng.standard_normal(count)
+            log_return = (self._drift - 0.5 * self._sigma ** 2) * dt + self._sigma * math.sqrt(dt) * shocks
+            if self.activity < 1.0:
+                log_return *= self._rng.random(count) < self.activity
+            moved = log_return != 0
+            self._price *= np.exp(log_return)
+            self._volume += moved * self._rng.integers(1, 500, count)
+            self.ticks += ticks
+
+    def advance_to_now(self) -> bool:
+        """
+        Applies the ticks due since the last call. Returns False when no tick
+        interval has elapsed yet.
+        """
+        now = time.monotonic()
+        if not self._last_tick:
+            self._last_tick = now
+            self.step(1)
+            return True
+        due = int((now - self._last_tick) * self.tick_rate)
+        if due <= 0:
+            return False
+        self._last_tick += due / self.tick_rate
+        self.step(due)
+        return True
+
+    def assets(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_state()
+            prices = np.round(self._price / self._tick_size) * self._tick_size
+            change = (self._price / self._open - 1.0) * 100.0
+            rows = []
+            for index, instrument in enumerate(self._instruments):
+                decimals = max(0, -int(math.floor(math.log10(self._tick_size[index]))))
+                rows.append({
+                    "symbol": instrument.symbol,
+                    "name": instrument.name,
+                    "market": instrument.market,
+                    "currency": instrument.currency,
+                    "price": round(float(prices[index]), decimals),
+                    "change_pct": round(float(change[index]), 2) or 0.0,
+                    "volume": int(self._volume[index]),
+                })
+            return rows
+
+    def quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshot rows keyed by canonical symbol, shaped like get_yahoo_snapshot_async.
+        """
+        by_symbol = {row["symbol"]: row for row in self.assets()}
+        quotes = {}
+        for symbol in symbols:
+            row = by_symbol.get(instrument_registry.canonical_symbol(symbol))
+            if row is not None:
+                quotes[symbol] = {"price": row["price"], "change_pct": row["change_pct"], "volume": row["volume"]}
+        return quotes
+
+    def history(self, symbol: str, points: int) -> List[float]:
+        """
+        Daily closes ending at the current simulated price. The path is
+        derived from the symbol, so repeated calls return the same shape.
+        """
+        if points <= 0:
+            return []
+        with self._lock:
+            self._ensure_state()
+            canonical = instrument_registry.canonical_symbol(symbol)
+            index = self._positions.get(canonical)
+            if index is None:
+                return []
+            last = float(self._price[index])
+            drift, sigma = float(self._drift[index]), float(self._sigma[index])
+            decimals = max(0, -int(math.floor(math.log10(self._tick_size[index]))))
+        seed = int(hashlib.blake2b(f"{self.seed}:{canonical}".encode(), digest_size=8).hexdigest(), 16)
+        rng = np.random.default_rng(seed)
+        dt = HISTORY_STEP_SECONDS / SECONDS_PER_YEAR
+        steps = (drift - 0.5 * sigma ** 2) * dt + sigma * math.sqrt(dt) * rng.standard_normal(points - 1)
+        # Walk backwards from the current price.
+        offsets = np.concatenate(([0.0], np.cumsum(steps[::-1])))[::-1]
+        return [round(float(value), max(decimals, 2)) for value in last * np.exp(-offsets)]
+
+
+market_simulator = MarketSimulator()
@@ -0,0 +1,357 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+from .market_movers import ALL_MARKETS, EMPTY_BREADTH, MoversIndex, MoversView
+from .market_views import MarketViews
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL = int(os.environ.get("MARKET_OVERVIEW_TTL", "8"))
+GZIP_LEVEL = int(os.environ.get("SNAPSHOT_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("SNAPSHOT_BROTLI_QUALITY", "5"))
+DELTA_HISTORY = int(os.environ.get("SNAPSHOT_DELTA_HISTORY", "256"))
+MINIMAL_FIELDS = ("symbol", "name", "market", "currency", "price", "change_pct")
+
+
+class EncodedBody:
+    """
+    One document serialised once (JSON unless another `encode` is given),
+    with its gzip/brotli variants and a content-hash ETag, ready to be
+    written to any number of clients.
+    """
+
+    __slots__ = ("identity", "gzip", "br", "digest")
+
+    def __init__(self, payload: Any, encode: Optional[Callable[[Any], bytes]] = None) -> None:
+        # Same settings as FastAPI's JSONResponse so the bytes are interchangeable.
+        self.identity = (encode or _dumps)(payload)
+        self.gzip = gzip.compress(self.identity, compresslevel=GZIP_LEVEL, mtime=0)
+        self.br = brotli.compress(self.identity, quality=BROTLI_QUALITY) if brotli is not None else None
+        self.digest = hashlib.blake2b(self.identity, digest_size=16).hexdigest()
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        if encoding:
+            return f'"{self.digest}-{encoding}"'
+        return f'"{self.digest}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        for candidate in if_none_match.split(","):
+            tag = candidate.strip()
+            if tag == "*":
+                return True
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            tag = tag.strip('"')
+            if tag.split("-", 1)[0] == self.digest:
+                return True
+        return False
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """
+        Picks the smallest representation the client accepts.
+        """
+        accepted = set()
+        for part in (accept_encoding or "").lower().split(","):
+            name, _, params = part.strip().partition(";")
+            if not name:
+                continue
+            quality = params.replace(" ", "")
+            if quality in {"q=0", "q=0.0", "q=0.00", "q=0.000"}:
+                continue
+            accepted.add(name)
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if "gzip" in accepted or "*" in accepted:
+            return self.gzip, "gzip"
+        return self.identity, None
+
+
+def _dumps(payload: Any) -> bytes:
+    return json.dumps(
+        payload,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def minimal_asset(asset: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: asset.get(key) for key in MINIMAL_FIELDS}
+
+
+def diff_assets(
+    previous: Optional["MarketSnapshot"],
+    assets: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Returns the per-symbol field changes between a snapshot and a new universe,
+    plus the symbols that disappeared. Each change carries `symbol` and only
+    the fields whose value moved.
+    """
+    if previous is None:
+        return [dict(asset) for asset in assets if asset.get("symbol")], []
+    changes = []
+    seen = set()
+    for asset in assets:
+        symbol = asset.get("symbol")
+        if not symbol:
+            continue
+        seen.add(symbol)
+        before = previous.by_symbol.get(symbol)
+        if before is None:
+            changes.append(dict(asset))
+            continue
+        if before == asset:
+            continue
+        change = {"symbol": symbol}
+        for key, value in asset.items():
+            if before.get(key) != value:
+                change[key] = value
+        changes.append(change)
+    removed = [symbol for symbol in previous.by_symbol if symbol not in seen]
+    return changes, removed
+
+
+class MarketSnapshot:
+    """
+    Immutable view of the market universe at one refresh, with the derived
+    payloads (and their encodings) computed at most once.
+    """
+
+    def __init__(self, seq: int, assets: List[Dict[str, Any]], status: str = "live") -> None:
+        self.seq = seq
+        self.ts = time.time()
+        self.status = status
+        self.assets = assets
+        self.by_symbol: Dict[str, Dict[str, Any]] = {
+            asset.get("symbol"): asset for asset in assets if asset.get("symbol")
+        }
+        # Set by the publisher from its incrementally maintained movers index.
+        self.movers: Optional[MoversView] = None
+        # Sorted (market, currency, key) views for paginated overview reads.
+        self.views = MarketViews(self)
+        # Delta against the previous sequence number, set by the publisher.
+        self.changes: List[Dict[str, Any]] = []
+        self.removed: List[str] = []
+        self.delta: Optional[bytes] = None
+        self._encoded: Dict[str, EncodedBody] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pulse(self) -> Dict[str, Any]:
+        return self.market_pulse()
+
+    def market_pulse(self, market: str = ALL_MARKETS, k: int = 5) -> Dict[str, Any]:
+        """
+        Top-k gainers and losers plus breadth, for one market or all (`*`).
+        """
+        if self.movers is None:
+            index = MoversIndex()
+            index.apply(self.assets, [], self.by_symbol)
+            self.movers = index.view()
+        movers = self.movers
+        return {
+            "timestamp": int(self.ts),
+            "gainers": [self.by_symbol[symbol] for symbol in movers.gainers(market, k)],
+            "losers": [self.by_symbol[symbol] for symbol in movers.losers(market, k)],
+            "breadth": movers.breadth.get(market) or dict(EMPTY_BREADTH),
+        }
+
+    def encoded(
+        self,
+        key: str,
+        build: Optional[Callable[["MarketSnapshot"], Any]] = None,
+        encode: Optional[Callable[[Any], bytes]] = None,
+    ) -> EncodedBody:
+        body = self._encoded.get(key)
+        if body is not None:
+            return body
+        with self._lock:
+            body = self._encoded.get(key)
+            if body is None:
+                builder = build or _PAYLOAD_BUILDERS[key]
+                body = EncodedBody(builder(self), encode)
+                self._encoded[key] = body
+        return body
+
+
+_PAYLOAD_BUILDERS: Dict[str, Callable[[MarketSnapshot], Any]] = {
+    "overview": lambda snapshot: snapshot.assets,
+    "overview:minimal": lambda snapshot: [minimal_asset(asset) for asset in snapshot.assets],
+    "pulse": lambda snapshot: snapshot.pulse,
+}
+
+
+class SnapshotDelta(NamedTuple):
+    seq: int
+    body: bytes
+    changes: List[Dict[str, Any]]
+    removed: List[str]
+
+
+class SnapshotPublisher:
+    """
+    Holds the current market snapshot and swaps in a new one whenever the
+    universe changes. Listeners are called with (snapshot, previous) after
+    each publish.
+
+    Every publish also records a per-symbol delta under a monotonic sequence
+    number, so streaming clients can resume from the last sequence they saw
+    as long as it is still in the delta history. The epoch changes on every
+    process start, which invalidates sequence numbers from other workers.
+    """
+
+    def __init__(self, ttl_seconds: int = SNAPSHOT_TTL, delta_history: int = DELTA_HISTORY) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.epoch = uuid.uuid4().hex[:8]
+        self._current: Optional[MarketSnapshot] = None
+        self._seq = 0
+        self._checked_at = 0.0
+        self._listeners: List[Callable[[MarketSnapshot, Optional[MarketSnapshot]], None]] = []
+        self._deltas: Deque[SnapshotDelta] = deque(maxlen=max(1, delta_history))
+        self._movers = MoversIndex()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def current(self) -> Optional[MarketSnapshot]:
+        return self._current
+
+    @property
+    def checked_at(self) -> float:
+        """
+        When the universe was last fetched, even if nothing changed.
+        """
+        return self._checked_at
+
+    def is_fresh(self) -> bool:
+        return self._current is not None and (time.time() - self._checked_at) < self.ttl_seconds
+
+    def add_listener(self, listener: Callable[[MarketSnapshot, Optional[MarketSnapshot]], None]) -> None:
+        self._listeners.append(listener)
+
+    def publish(self, assets: List[Dict[str, Any]], status: str = "live") -> MarketSnapshot:
+        with self._lock:
+            previous = self._current
+            self._checked_at = time.time()
+            if previous is not None and previous.status == status and (
+                previous.assets is assets or previous.assets == assets
+            ):
+                return previous
+            self._seq += 1
+            snapshot = MarketSnapshot(self._seq, assets, status)
+            snapshot.changes, snapshot.removed = diff_assets(previous, assets)
+            self._movers.apply(snapshot.changes, snapshot.removed, snapshot.by_symbol)
+            snapshot.movers = self._movers.view()
+            for key in _PAYLOAD_BUILDERS:
+                snapshot.encoded(key)
+            snapshot.delta = _dumps({
+                "seq": snapshot.seq,
+                "prev_seq": previous.seq if previous is not None else None,
+                "timestamp": int(snapshot.ts),
+                "status": snapshot.status,
+                "changes": snapshot.changes,
+                "removed": snapshot.removed,
+            })
+            self._deltas.append(SnapshotDelta(snapshot.seq, snapshot.delta, snapshot.changes, snapshot.removed))
+            self._current = snapshot
+            waiters = list(self._waiters)
+        for listener in self._listeners:
+            try:
+                listener(snapshot, previous)
+            except Exception:
+                logger.exception("Snapshot listener %r failed", listener)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop is closed; it will be discarded by its owner.
+                pass
+        return snapshot
+
+    def changes_since(self, seq: int) -> Optional[List[SnapshotDelta]]:
+        """
+        Returns the deltas published after `seq`, or None when the gap can no
+        longer be replayed and the client needs a full snapshot.
+        """
+        with self._lock:
+            current = self._current
+            if current is None or seq > current.seq or seq < 0:
+                return None
+            if seq == current.seq:
+                return []
+            deltas = list(self._deltas)
+        if not deltas or deltas[0].seq > seq + 1:
+            return None
+        return [delta for delta in deltas if delta.seq > seq]
+
+    def deltas_since(self, seq: int) -> Optional[List[Tuple[int, bytes]]]:
+        """
+        Encoded form of `changes_since`: (seq, JSON body) pairs.
+        """
+        deltas = self.changes_since(seq)
+        if deltas is None:
+            return None
+        return [(delta.seq, delta.body) for delta in deltas]
+
+    def parse_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """
+        Parses an `<epoch>:<seq>` stream cursor (a bare sequence is accepted).
+        Cursors from another epoch are rejected.
+        """
+        if not cursor:
+            return None
+        epoch, _, seq = cursor.strip().rpartition(":")
+        if epoch and epoch != self.epoch:
+            return None
+        try:
+            return int(seq)
+        except ValueError:
+            return None
+
+    def cursor(self, seq: int) -> str:
+        return f"{self.epoch}:{seq}"
+
+    async def wait_for_publish(self, after_seq: int, timeout: float) -> bool:
+        """
+        Waits until a snapshot newer than `after_seq` is published. Returns
+        False on timeout.
+        """
+        current = self._current
+        if current is not None and current.seq > after_seq:
+            return True
+        entry = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(entry)
+        try:
+            current = self._current
+            if current is not None and current.seq > after_seq:
+                return True
+            await asyncio.wait_for(entry[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+
+market_snapshot_publisher = SnapshotPublisher()
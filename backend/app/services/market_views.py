@@ -0,0 +1,175 @@
+import base64
+import bisect
+import json
+import math
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from .market_movers import ALL_MARKETS
+
+
+SORT_KEYS = ("change_pct", "price", "volume", "symbol", "name")
+TEXT_SORT_KEYS = {"symbol", "name"}
+MAX_PAGE_SIZE = 500
+# Position of the last row of a page: ("v", value, symbol) inside the sorted
+# rows, ("m", symbol) among the rows without a value for the sort key.
+Token = Tuple[Any, ...]
+
+
+def _sort_value(asset: Dict[str, Any], key: str) -> Any:
+    value = asset.get(key)
+    if key in TEXT_SORT_KEYS:
+        return value.casefold() if isinstance(value, str) and value else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return float(value)
+    return None
+
+
+class SortedView:
+    """
+    Symbols of one (market, currency) slice ordered by one key: `valued`
+    holds (value, symbol) pairs in ascending order, `missing` the symbols
+    without a value, which come last in either direction.
+    """
+
+    __slots__ = ("valued", "missing")
+
+    def __init__(self, valued: Tuple[Tuple[Any, str], ...], missing: Tuple[str, ...]) -> None:
+        self.valued = valued
+        self.missing = missing
+
+    def __len__(self) -> int:
+        return len(self.valued) + len(self.missing)
+
+    def page(self, descending: bool, limit: int, after: Optional[Token] = None) -> Tuple[List[str], Optional[Token]]:
+        """
+        Up to `limit` symbols following the `after` position, and the
+        position of the last one when more rows follow.
+        """
+        valued: List[Tuple[Any, str]] = []
+        missing_start = 0
+        if after is None or after[0] == "v":
+            if after is None:
+                start, stop = (len(self.valued), 0) if descending else (0, len(self.valued))
+            else:
+                entry = (after[1], after[2])
+                if descending:
+                    start, stop = bisect.bisect_left(self.valued, entry), 0
+                else:
+                    start, stop = bisect.bisect_right(self.valued, entry), len(self.valued)
+            if descending:
+                valued = list(reversed(self.valued[max(stop, start - limit):start]))
+            else:
+                valued = list(self.valued[start:min(stop, start + limit)])
+        else:
+            missing_start = bisect.bisect_right(self.missing, after[1])
+        symbols = [symbol for _, symbol in valued]
+        room = limit - len(symbols)
+        missing = list(self.missing[missing_start:missing_start + room]) if room > 0 else []
+        symbols.extend(missing)
+        if missing:
+            last: Token = ("m", missing[-1])
+            more = missing_start + len(missing) < len(self.missing)
+        elif valued:
+            last = ("v", *valued[-1])
+            tail = self.valued[-1] if not descending else self.valued[0]
+            more = valued[-1] != tail or bool(self.missing)
+        else:
+            return symbols, None
+        return symbols, last if more else None
+
+
+_EMPTY_VIEW = SortedView((), ())
+
+
+class MarketViews:
+    """
+    Sorted views of one snapshot, built on first use and at most once per
+    (market, currency, key). Views are never carried over to the next
+    snapshot: cursors hold a keyset position (value, symbol) rather than an
+    offset, so a cursor issued on snapshot N resumes on snapshot N+1 right
+    after that position in the new ordering, even if the row it points at
+    moved or is gone.
+    """
+
+    def __init__(self, snapshot: Any) -> None:
+        self.snapshot = snapshot
+        self._views: Dict[Tuple[str, Optional[str], str], SortedView] = {}
+        self._currencies: Optional[FrozenSet[str]] = None
+        self._lock = threading.Lock()
+
+    def has_currency(self, currency: Optional[str]) -> bool:
+        """
+        Whether any asset of the snapshot is quoted in `currency` (None: any).
+        """
+        if currency is None:
+            return True
+        if self._currencies is None:
+            self._currencies = frozenset(str(asset.get("currency") or "").upper() for asset in self.snapshot.assets)
+        return currency in self._currencies
+
+    def view(self, market: str = ALL_MARKETS, currency: Optional[str] = None, key: str = "change_pct") -> SortedView:
+        if not self.has_currency(currency):
+            # Not cached: arbitrary currencies must not grow the per-snapshot caches.
+            return _EMPTY_VIEW
+        cache_key = (market, currency, key)
+        view = self._views.get(cache_key)
+        if view is None:
+            with self._lock:
+                view = self._views.get(cache_key)
+                if view is None:
+                    view = self._build(market, currency, key)
+                    self._views[cache_key] = view
+        return view
+
+    def _build(self, market: str, currency: Optional[str], key: str) -> SortedView:
+        assets = [
+            asset for asset in self.snapshot.assets
+            if asset.get("symbol")
+            and (market == ALL_MARKETS or asset.get("market") == market)
+            and (currency is None or str(asset.get("currency") or "").upper() == currency)
+        ]
+        pairs = []
+        for asset in assets:
+            value = _sort_value(asset, key)
+            if value is not None:
+                pairs.append((value, asset["symbol"]))
+        valued = tuple(sorted(pairs))
+        quoted = {symbol for _, symbol in valued}
+        missing = tuple(sorted(asset["symbol"] for asset in assets if asset["symbol"] not in quoted))
+        return SortedView(valued, missing)
+
+
+def encode_cursor(query: Tuple[Any, ...], token: Token) -> str:
+    raw = json.dumps([list(query), list(token)], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, query: Tuple[Any, ...], key: str) -> Token:
+    """
+    Position stored in a cursor from `encode_cursor` for sort `key`. Raises
+    ValueError when the cursor is malformed, holds a value of the wrong type
+    for `key`, or was issued for another query.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_query, token = json.loads(raw.decode("utf-8"))
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if cursor_query != list(query):
+        raise ValueError("Cursor does not belong to this query")
+    if not isinstance(token, list) or not token or not isinstance(token[-1], str):
+        raise ValueError("Malformed cursor")
+    if token[0] == "m" and len(token) == 2:
+        return ("m", token[1])
+    if token[0] != "v" or len(token) != 3:
+        raise ValueError("Malformed cursor")
+    value = token[1]
+    if key in TEXT_SORT_KEYS:
+        if not isinstance(value, str):
+            raise ValueError("Malformed cursor")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        value = float(value)
+    else:
+        raise ValueError("Malformed cursor")
+    return ("v", value, token[2])
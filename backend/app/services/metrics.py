@@ -0,0 +1,103 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Sequence
+
+# Upper bounds in seconds; the last bucket takes everything slower.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram: constant memory, O(log buckets) per
+    observation, quantiles estimated from bucket upper bounds.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+                "p50_ms": round(self.quantile(0.5) * 1000, 2),
+                "p95_ms": round(self.quantile(0.95) * 1000, 2),
+                "p99_ms": round(self.quantile(0.99) * 1000, 2),
+                "max_ms": round(self.max * 1000, 2),
+                "buckets": {
+                    **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                    "+Inf": self.counts[-1],
+                },
+            }
+
+
+class MetricsRegistry:
+    """
+    Process-local counters and latency histograms, created on first use and
+    exposed as one JSON document by /api/metrics.
+    """
+
+    def __init__(self) -> None:
+        self._counters: Dict[str, int] = {}
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def observe(self, name: str, seconds: float) -> None:
+        self.histogram(name).observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+        return {
+            "counters": counters,
+            "latency": {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+        }
+
+
+metrics = MetricsRegistry()
@@ -4,6 +4,13 @@ try:
 except Exception:
     requests = None
 
+try:
+    from .http_cassette import build_http_session
+except ImportError:  # Fallback for legacy/Flask usage
+    from services.http_cassette import build_http_session
+
+_SESSION = build_http_session()
+
 class NewsService:
     FINNHUB_API_KEY = os.getenv('FINNHUB_API_KEY')
 
@@ -12,7 +19,7 @@ class NewsService:
         if not NewsService.FINNHUB_API_KEY or requests is None:
             return NewsService._fallback()
         try:
-            res = requests.get(
+            res = (_SESSION or requests).get(
                 "https://finnhub.io/api/v1/news",
                 params={"category": "general", "token": NewsService.FINNHUB_API_KEY},
                 timeout=10,
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .instruments import instrument_registry
+from .market_data import MarketDataService
+from .market_snapshot import MarketSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+QUOTE_TTL = float(os.environ.get("QUOTE_STORE_TTL", "30"))
+QUOTE_MISS_TTL = float(os.environ.get("QUOTE_STORE_MISS_TTL", "300"))
+QUOTE_STORE_LIMIT = int(os.environ.get("QUOTE_STORE_LIMIT", "2000"))
+QUOTE_FETCH_BATCH = int(os.environ.get("QUOTE_FETCH_BATCH", "25"))
+QUOTE_QUEUE_LIMIT = int(os.environ.get("QUOTE_QUEUE_LIMIT", "500"))
+QUOTE_FIELDS = ("symbol", "name", "market", "currency", "price", "change_pct", "volume")
+_SYMBOL_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9.\-=^/]{0,31}$")
+
+
+def normalize_symbol(alias: str) -> Optional[str]:
+    """
+    Canonical symbol for a user-supplied ticker, or None when it cannot be
+    a quotable instrument.
+    """
+    alias = str(alias or "").strip().upper()
+    if not _SYMBOL_PATTERN.match(alias):
+        return None
+    instrument = instrument_registry.resolve_or_infer(alias)
+    return instrument.symbol if instrument is not None else None
+
+
+def _quote(asset: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: asset.get(field) for field in QUOTE_FIELDS}
+
+
+class QuoteStore:
+    """
+    Quotes by symbol for watchlists and the legacy ticker endpoint. Symbols
+    of the market universe are read from the current snapshot; anything else
+    comes from a small per-symbol cache filled by a background fetch queue.
+    A lookup never calls a provider: unknown or expired symbols are queued
+    (once, however many readers ask) and reported as pending.
+    """
+
+    def __init__(self) -> None:
+        self._quotes: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # Miss time per symbol, oldest first; at most QUOTE_STORE_LIMIT entries.
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+        # Insertion-ordered set of symbols waiting for the fetcher.
+        self._queue: Dict[str, None] = {}
+        self._inflight: Set[str] = set()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def lookup(
+        self,
+        snapshot: Optional[MarketSnapshot],
+        symbols: List[str],
+    ) -> Tuple[Dict[str, Optional[Dict[str, Any]]], List[str]]:
+        """
+        Resolves `symbols` in one pass. Returns the quote per symbol (None
+        while unknown; the last value while a refresh is queued) and the
+        symbols waiting for the fetcher.
+        """
+        universe = snapshot.by_symbol if snapshot is not None else {}
+        now = time.time()
+        quotes: Dict[str, Optional[Dict[str, Any]]] = {}
+        pending: List[str] = []
+        with self._lock:
+            for symbol in symbols:
+                asset = universe.get(symbol)
+                if asset is not None:
+                    quotes[symbol] = _quote(asset)
+                    continue
+                cached = self._quotes.get(symbol)
+                quotes[symbol] = cached[1] if cached is not None else None
+                if cached is not None and now - cached[0] <= QUOTE_TTL:
+                    continue
+                if self._enqueue_locked(symbol, now):
+                    pending.append(symbol)
+        if pending:
+            self._schedule()
+        return quotes, pending
+
+    def _enqueue_locked(self, symbol: str, now: float) -> bool:
+        if symbol in self._queue or symbol in self._inflight:
+            return True
+        missed = self._misses.get(symbol)
+        if missed is not None and now - missed <= QUOTE_MISS_TTL:
+            return False
+        if len(self._queue) >= QUOTE_QUEUE_LIMIT:
+            return False
+        self._queue[symbol] = None
+        return True
+
+    def _schedule(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop in this thread; the next async lookup starts the fetcher.
+            return
+        with self._lock:
+            if self._task is not None and not self._task.done():
+                return
+            self._task = loop.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while True:
+            with self._lock:
+                batch = list(islice(self._queue, QUOTE_FETCH_BATCH))
+                if not batch:
+                    return
+                for symbol in batch:
+                    del self._queue[symbol]
+                self._inflight.update(batch)
+            try:
+                fetched = await MarketDataService.get_yahoo_snapshot_async(batch)
+            except Exception as exc:
+                logger.warning("Quote fetch failed for %s: %s", ",".join(batch), exc)
+                fetched = {}
+            self.record(batch, fetched or {})
+
+    def cached(self, symbol: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        (fetched at, quote) of an off-universe symbol, however old, or None.
+        """
+        return self._quotes.get(symbol)
+
+    def record(self, batch: List[str], fetched: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Stores provider quotes for `batch`; symbols without a price are
+        remembered as misses.
+        """
+        now = time.time()
+        with self._lock:
+            for symbol in batch:
+                data = fetched.get(symbol)
+                if not data or data.get("price") is None:
+                    self._misses[symbol] = now
+                    self._misses.move_to_end(symbol)
+                    continue
+                instrument = instrument_registry.resolve_or_infer(symbol)
+                self._quotes[symbol] = (now, _quote({
+                    "symbol": symbol,
+                    "name": instrument.name if instrument else symbol,
+                    "market": instrument.market if instrument else None,
+                    "currency": instrument.currency if instrument else None,
+                    **data,
+                }))
+                self._misses.pop(symbol, None)
+            self._inflight.difference_update(batch)
+            if len(self._quotes) > QUOTE_STORE_LIMIT:
+                oldest = sorted(self._quotes, key=lambda symbol: self._quotes[symbol][0])
+                for symbol in oldest[: len(self._quotes) - QUOTE_STORE_LIMIT]:
+                    del self._quotes[symbol]
+            while self._misses and (
+                len(self._misses) > QUOTE_STORE_LIMIT or now - next(iter(self._misses.values())) > QUOTE_MISS_TTL
+            ):
+                self._misses.popitem(last=False)
+
+
+quote_store = QuoteStore()
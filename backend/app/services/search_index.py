@@ -0,0 +1,163 @@
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from .instruments import MARKET_BVC, instrument_registry
+
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_EMPTY: FrozenSet[int] = frozenset()
+MAX_GRAM = 3
+
+
+def fold(text: Any) -> str:
+    """
+    Search form of a string: accents stripped, case-folded, punctuation
+    collapsed to single spaces ("Société Générale" -> "societe generale").
+    """
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    return " ".join(_NON_ALNUM.sub(" ", text).split())
+
+
+def _grams(text: str) -> Iterable[str]:
+    for size in range(1, MAX_GRAM + 1):
+        for start in range(len(text) - size + 1):
+            yield text[start:start + size]
+
+
+def _field_score(value: str, query: str, exact: int, prefix: int, word: int, contains: int) -> int:
+    if not value or query not in value:
+        return 0
+    if value == query:
+        return exact
+    if value.startswith(query):
+        return prefix
+    if f" {query}" in value:
+        return word
+    return contains
+
+
+class SearchIndex:
+    """
+    Immutable n-gram index over instrument documents (`symbol`, `name`,
+    `market`, `sector`). Every 1- to 3-gram of the folded fields maps to
+    the documents containing it: short queries are one lookup, longer ones
+    intersect their trigrams and verify the few candidates left.
+    """
+
+    def __init__(self, documents: Sequence[Dict[str, Any]]) -> None:
+        self.documents = list(documents)
+        self._folded: List[Tuple[str, str, str]] = []
+        grams: Dict[str, set] = {}
+        for position, document in enumerate(self.documents):
+            fields = (fold(document.get("symbol")), fold(document.get("name")), fold(document.get("sector")))
+            self._folded.append(fields)
+            for field in fields:
+                for gram in _grams(field):
+                    grams.setdefault(gram, set()).add(position)
+        self._grams: Dict[str, FrozenSet[int]] = {gram: frozenset(members) for gram, members in grams.items()}
+
+    def _candidates(self, query: str) -> FrozenSet[int]:
+        if len(query) <= MAX_GRAM:
+            return self._grams.get(query, _EMPTY)
+        sets = sorted(
+            (self._grams.get(query[start:start + MAX_GRAM], _EMPTY) for start in range(len(query) - MAX_GRAM + 1)),
+            key=len,
+        )
+        return sets[0].intersection(*sets[1:])
+
+    def _score(self, position: int, query: str) -> int:
+        symbol, name, sector = self._folded[position]
+        return max(
+            _field_score(symbol, query, 100, 90, 75, 70),
+            _field_score(name, query, 85, 80, 60, 40),
+            _field_score(sector, query, 30, 30, 25, 20),
+        )
+
+    def search(self, query: str, market: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Documents matching `query` as a substring of any field, best first:
+        symbol matches, then name, then sector; exact before prefix before
+        word start before anywhere; shorter symbols first on ties.
+        """
+        query = fold(query)
+        if not query:
+            return []
+        ranked = []
+        for position in self._candidates(query):
+            document = self.documents[position]
+            if market is not None and document.get("market") != market:
+                continue
+            score = self._score(position, query)
+            if score:
+                ranked.append((-score, len(document["symbol"]), document["symbol"], position))
+        ranked.sort()
+        return [self.documents[position] for *_, position in ranked]
+
+
+class InstrumentSearch:
+    """
+    Current search index over the instrument registry plus the Casablanca
+    board. It is rebuilt only when the registry version or the board's
+    tickers, labels or sectors change, never per query.
+    """
+
+    def __init__(self) -> None:
+        self._index = SearchIndex([])
+        self._registry_version = -1
+        self._board: Optional[List[Dict[str, Any]]] = None
+        self._board_key: Tuple = ()
+        self._by_ticker: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def index(self, board: Optional[List[Dict[str, Any]]] = None) -> SearchIndex:
+        board_key = self._board_key
+        by_ticker = None
+        if board is not None and board is not self._board:
+            board_key = tuple((item.get("ticker"), item.get("label"), item.get("sector")) for item in board)
+            by_ticker = {str(item.get("ticker") or "").strip().upper(): item for item in board}
+        with self._lock:
+            if by_ticker is not None:
+                # Keep a reference so the identity check above stays valid.
+                self._board = board
+                self._by_ticker = by_ticker
+            if instrument_registry.version == self._registry_version and board_key == self._board_key:
+                return self._index
+            self._registry_version = instrument_registry.version
+            self._board_key = board_key
+            self._index = SearchIndex(self._documents(board_key))
+            return self._index
+
+    def board_items(self, symbols: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Board rows (with their prices) of the given BVC symbols, in order.
+        """
+        by_ticker = self._by_ticker
+        return [by_ticker[symbol] for symbol in symbols if symbol in by_ticker]
+
+    @staticmethod
+    def _documents(board_key: Tuple) -> List[Dict[str, Any]]:
+        documents = []
+        seen = set()
+        for ticker, label, sector in board_key:
+            if not isinstance(ticker, str) or not ticker.strip():
+                continue
+            symbol = ticker.strip().upper()
+            seen.add((MARKET_BVC, symbol))
+            documents.append({"symbol": symbol, "name": label or symbol, "market": MARKET_BVC, "currency": "DH", "sector": sector})
+        for instrument in instrument_registry.all():
+            if (instrument.market, instrument.symbol) in seen:
+                continue
+            documents.append({
+                "symbol": instrument.symbol,
+                "name": instrument.name,
+                "market": instrument.market,
+                "currency": instrument.currency,
+                "sector": instrument.metadata.get("sector"),
+            })
+        return documents
+
+
+instrument_search = InstrumentSearch()
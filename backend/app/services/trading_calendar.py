@@ -0,0 +1,245 @@
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+except Exception:
+    ZoneInfo = None
+
+from .instruments import MARKET_BVC, MARKET_CRYPTO, MARKET_FOREX, MARKET_NASDAQ
+
+
+logger = logging.getLogger(__name__)
+
+STATE_OPEN = "open"
+STATE_CLOSED = "closed"
+
+OPEN_INTERVAL = float(os.environ.get("MARKET_OVERVIEW_TTL", "8"))
+BVC_OPEN_INTERVAL = float(os.environ.get("BVC_CACHE_TTL", "5"))
+CLOSED_INTERVAL = float(os.environ.get("MARKET_REFRESH_CLOSED", "900"))
+# One more refresh this long after the close picks up the official closing prices.
+CLOSE_GRACE_SECONDS = float(os.environ.get("MARKET_CLOSE_GRACE", "120"))
+
+NASDAQ_HOLIDAYS = {
+    "2025-01-01", "2025-01-20", "2025-02-17", "2025-04-18", "2025-05-26", "2025-06-19",
+    "2025-07-04", "2025-09-01", "2025-11-27", "2025-12-25",
+    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25", "2026-06-19",
+    "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+    "2027-01-01", "2027-01-18", "2027-02-15", "2027-03-26", "2027-05-31", "2027-06-18",
+    "2027-07-05", "2027-09-06", "2027-11-25", "2027-12-24",
+}
+NASDAQ_EARLY_CLOSES = {
+    "2025-07-03", "2025-11-28", "2025-12-24",
+    "2026-11-27", "2026-12-24",
+    "2027-11-26",
+}
+# Fixed-date Moroccan holidays, plus the lunar ones announced per year. The
+# lunar dates depend on moon sighting; extend them with TRADING_HOLIDAYS_BVC.
+BVC_FIXED_HOLIDAYS = {"01-01", "01-11", "01-14", "05-01", "07-30", "08-14", "08-20", "08-21", "11-06", "11-18"}
+BVC_HOLIDAYS = {
+    "2025-03-31", "2025-04-01", "2025-06-06", "2025-06-07", "2025-06-27", "2025-09-04", "2025-09-05",
+    "2026-03-20", "2026-03-21", "2026-05-27", "2026-05-28", "2026-06-16", "2026-08-25", "2026-08-26",
+}
+
+
+def _dates(values) -> FrozenSet[date]:
+    parsed = set()
+    for value in values:
+        try:
+            parsed.add(date.fromisoformat(value.strip()))
+        except ValueError:
+            logger.warning("Ignoring invalid holiday %r", value)
+    return frozenset(parsed)
+
+
+def _env_dates(name: str) -> List[str]:
+    return [value for value in os.environ.get(name, "").split(",") if value.strip()]
+
+
+def _zone(name: str, fallback_hours: int):
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(name)
+        except Exception:
+            pass
+    return timezone(timedelta(hours=fallback_hours))
+
+
+@dataclass(frozen=True)
+class MarketHours:
+    """
+    Trading hours of one market. `weekly` markets (forex) trade continuously
+    from `open` on the first weekday to `close` on the last one.
+    """
+
+    tz: object
+    open: time
+    close: time
+    weekdays: FrozenSet[int] = frozenset(range(5))
+    holidays: FrozenSet[date] = frozenset()
+    fixed_holidays: FrozenSet[str] = frozenset()
+    early_closes: Dict[date, time] = field(default_factory=dict)
+    always_open: bool = False
+    weekly: Optional[Tuple[int, int]] = None
+    open_interval: float = OPEN_INTERVAL
+    closed_interval: float = CLOSED_INTERVAL
+
+    def is_holiday(self, day: date) -> bool:
+        return day in self.holidays or day.strftime("%m-%d") in self.fixed_holidays
+
+    def sessions(self, now: datetime, days: int = 10) -> List[Tuple[datetime, datetime]]:
+        """
+        Session (open, close) intervals in UTC from a few days before `now` to
+        `days` days after.
+        """
+        local_today = now.astimezone(self.tz).date()
+        sessions = []
+        if self.weekly is not None:
+            first, last = self.weekly
+            start_of_week = local_today - timedelta(days=(local_today.weekday() - first) % 7)
+            for week in (-7, 0, 7):
+                opens = start_of_week + timedelta(days=week)
+                closes = opens + timedelta(days=(last - first) % 7)
+                sessions.append((
+                    datetime.combine(opens, self.open, self.tz).astimezone(timezone.utc),
+                    datetime.combine(closes, self.close, self.tz).astimezone(timezone.utc),
+                ))
+            return sessions
+        for offset in range(-7, days + 1):
+            day = local_today + timedelta(days=offset)
+            if day.weekday() not in self.weekdays or self.is_holiday(day):
+                continue
+            close = self.early_closes.get(day, self.close)
+            sessions.append((
+                datetime.combine(day, self.open, self.tz).astimezone(timezone.utc),
+                datetime.combine(day, close, self.tz).astimezone(timezone.utc),
+            ))
+        return sessions
+
+
+DEFAULT_HOURS: Dict[str, MarketHours] = {
+    MARKET_NASDAQ: MarketHours(
+        tz=_zone("America/New_York", -5),
+        open=time(9, 30),
+        close=time(16, 0),
+        holidays=_dates([*NASDAQ_HOLIDAYS, *_env_dates("TRADING_HOLIDAYS_NASDAQ")]),
+        early_closes={day: time(13, 0) for day in _dates(NASDAQ_EARLY_CLOSES)},
+    ),
+    MARKET_BVC: MarketHours(
+        tz=_zone("Africa/Casablanca", 1),
+        open=time(9, 30),
+        close=time(15, 30),
+        holidays=_dates([*BVC_HOLIDAYS, *_env_dates("TRADING_HOLIDAYS_BVC")]),
+        fixed_holidays=frozenset(BVC_FIXED_HOLIDAYS),
+        open_interval=BVC_OPEN_INTERVAL,
+    ),
+    # Forex trades from Sunday 17:00 to Friday 17:00 New York time.
+    MARKET_FOREX: MarketHours(
+        tz=_zone("America/New_York", -5),
+        open=time(17, 0),
+        close=time(17, 0),
+        weekly=(6, 4),
+    ),
+    MARKET_CRYPTO: MarketHours(
+        tz=timezone.utc,
+        open=time(0, 0),
+        close=time(0, 0),
+        always_open=True,
+    ),
+}
+
+
+class TradingCalendar:
+    """
+    Session state and refresh cadence per market: the provider refresh
+    interval is short while a market trades, long while it is closed, and a
+    refresh is always due right after the close and at the next open.
+    """
+
+    def __init__(self, hours: Optional[Dict[str, MarketHours]] = None) -> None:
+        self.hours = dict(hours or DEFAULT_HOURS)
+
+    @staticmethod
+    def _now(now: Optional[datetime]) -> datetime:
+        if now is None:
+            return datetime.now(timezone.utc)
+        if now.tzinfo is None:
+            return now.replace(tzinfo=timezone.utc)
+        return now
+
+    def session(self, market: str, now: Optional[datetime] = None) -> Dict[str, object]:
+        """
+        Returns {market, state, opens_at, closes_at, last_close}; unknown
+        markets are treated as always open.
+        """
+        now = self._now(now)
+        hours = self.hours.get(market)
+        if hours is None or hours.always_open:
+            return {"market": market, "state": STATE_OPEN, "opens_at": None, "closes_at": None, "last_close": None}
+        current = None
+        next_open = None
+        last_close = None
+        for opens, closes in hours.sessions(now):
+            if opens <= now < closes:
+                current = (opens, closes)
+            elif closes <= now and (last_close is None or closes > last_close):
+                last_close = closes
+            elif opens > now and (next_open is None or opens < next_open):
+                next_open = opens
+        if current is not None:
+            return {"market": market, "state": STATE_OPEN, "opens_at": current[0], "closes_at": current[1], "last_close": last_close}
+        return {"market": market, "state": STATE_CLOSED, "opens_at": next_open, "closes_at": None, "last_close": last_close}
+
+    def is_open(self, market: str, now: Optional[datetime] = None) -> bool:
+        return self.session(market, now)["state"] == STATE_OPEN
+
+    def refresh_interval(self, market: str, now: Optional[datetime] = None) -> float:
+        """
+        Seconds a quote of `market` stays fresh, never past the next open.
+        """
+        now = self._now(now)
+        hours = self.hours.get(market)
+        info = self.session(market, now)
+        if info["state"] == STATE_OPEN:
+            return hours.open_interval if hours is not None else OPEN_INTERVAL
+        interval = hours.closed_interval if hours is not None else CLOSED_INTERVAL
+        opens_at = info["opens_at"]
+        if opens_at is not None:
+            interval = min(interval, max(1.0, (opens_at - now).total_seconds()))
+        return interval
+
+    def is_due(self, market: str, last_refresh: Optional[float], now: Optional[datetime] = None) -> bool:
+        """
+        True when quotes of `market` fetched at `last_refresh` (epoch seconds)
+        should be fetched again.
+        """
+        if not last_refresh:
+            return True
+        now = self._now(now)
+        info = self.session(market, now)
+        last_close = info["last_close"]
+        if info["state"] == STATE_CLOSED and last_close is not None:
+            settled = last_close.timestamp() + CLOSE_GRACE_SECONDS
+            if last_refresh < settled <= now.timestamp():
+                return True
+        return now.timestamp() - last_refresh >= self.refresh_interval(market, now)
+
+    def sessions(self, now: Optional[datetime] = None) -> List[Dict[str, object]]:
+        now = self._now(now)
+        rows = []
+        for market in self.hours:
+            info = self.session(market, now)
+            rows.append({
+                **info,
+                "opens_at": info["opens_at"].isoformat() if info["opens_at"] else None,
+                "closes_at": info["closes_at"].isoformat() if info["closes_at"] else None,
+                "last_close": info["last_close"].isoformat() if info["last_close"] else None,
+                "refresh_interval": round(self.refresh_interval(market, now), 1),
+            })
+        return rows
+
+
+trading_calendar = TradingCalendar()
@@ -0,0 +1,125 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except Exception:
+    pa = None
+    pa_ipc = None
+
+
+MEDIA_JSON = "application/json"
+MEDIA_MSGPACK = "application/msgpack"
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+_ALIASES = {
+    "application/x-msgpack": MEDIA_MSGPACK,
+    "application/vnd.msgpack": MEDIA_MSGPACK,
+    "application/vnd.apache.arrow.file": MEDIA_ARROW,
+}
+BINARY_MEDIA_TYPES = (MEDIA_MSGPACK, MEDIA_ARROW)
+
+
+class WireFormatUnavailable(Exception):
+    """
+    The client asked for a binary format whose library is not installed.
+    """
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Picks a columnar binary format only when the client lists one explicitly
+    with a higher preference than JSON; everything else gets JSON.
+    """
+    best = MEDIA_JSON
+    best_quality = -1.0
+    for position, part in enumerate((accept or "").split(",")):
+        media, _, params = part.strip().partition(";")
+        media = _ALIASES.get(media.strip().lower(), media.strip().lower())
+        if media not in BINARY_MEDIA_TYPES and media != MEDIA_JSON:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = media, quality
+    return best
+
+
+def is_available(media_type: str) -> bool:
+    if media_type == MEDIA_MSGPACK:
+        return msgpack is not None
+    if media_type == MEDIA_ARROW:
+        return pa is not None
+    return True
+
+
+def columns_from_rows(rows: Iterable[Dict[str, Any]], fields: Optional[Sequence[str]] = None) -> Dict[str, List[Any]]:
+    rows = list(rows)
+    if fields is None:
+        seen: Dict[str, None] = {}
+        for row in rows:
+            for key in row:
+                seen.setdefault(key, None)
+        fields = list(seen)
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def encode_columns(
+    columns: Dict[str, List[Any]],
+    media_type: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> bytes:
+    """
+    Encodes a column table. msgpack gets `{"columns": {...}, "length": n,
+    **metadata}`; Arrow gets an IPC stream with metadata in the schema.
+    """
+    length = len(next(iter(columns.values()))) if columns else 0
+    if media_type == MEDIA_MSGPACK:
+        if msgpack is None:
+            raise WireFormatUnavailable(media_type)
+        return msgpack.packb({**(metadata or {}), "length": length, "columns": columns}, use_bin_type=True)
+    if media_type == MEDIA_ARROW:
+        if pa is None:
+            raise WireFormatUnavailable(media_type)
+        table = pa.table(columns)
+        if metadata:
+            table = table.replace_schema_metadata({str(k): str(v) for k, v in metadata.items()})
+        sink = pa.BufferOutputStream()
+        with pa_ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"Unsupported media type {media_type}")
+
+
+def history_columns(history: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """
+    Long-format columns for /api/market-history: one row per point, with
+    `symbol` plus either `index`/`close` (daily closes) or the bar fields.
+    """
+    symbols: List[str] = []
+    columns: Dict[str, List[Any]] = {}
+    bars = any(series and isinstance(series[0], dict) for series in history.values())
+    if bars:
+        fields = ("time", "open", "high", "low", "close", "volume")
+        columns = {field: [] for field in fields}
+        for symbol, series in history.items():
+            symbols.extend([symbol] * len(series))
+            for field in fields:
+                columns[field].extend(bar[field] for bar in series)
+    else:
+        columns = {"index": [], "close": []}
+        for symbol, series in history.items():
+            symbols.extend([symbol] * len(series))
+            columns["index"].extend(range(len(series)))
+            columns["close"].extend(series)
+    return {"symbol": symbols, **columns}
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Configure the app before anything imports it: simulated market data, a
+# throwaway database and scratch directories for checkpoints and ticks.
+_SCRATCH = tempfile.mkdtemp(prefix="tradesense-tests-")
+os.environ.setdefault("MARKET_DATA_SOURCE", "simulated")
+os.environ.setdefault("SIM_SEED", "7")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_SCRATCH, 'test.db')}")
+os.environ.setdefault("SNAPSHOT_CHECKPOINT_DIR", os.path.join(_SCRATCH, "checkpoints"))
+os.environ.setdefault("BVC_TICK_DIR", os.path.join(_SCRATCH, "bvc_ticks"))
+os.environ.setdefault("BVC_INDICES_SCRAPE", "0")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from backend.app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+
+def test_trade_fill_respects_fetch_timeout_under_slow_provider(client, monkeypatch):
+    from backend.app.services import fill_prices as fill_module
+    from backend.app.services.market_data import MarketDataService
+
+    async def slow_snapshot(tickers):
+        await asyncio.to_thread(time.sleep, 2.0)
+        return {symbol: {"price": 10.0} for symbol in tickers}
+
+    monkeypatch.setattr(MarketDataService, "get_yahoo_snapshot_async", staticmethod(slow_snapshot))
+    monkeypatch.setattr(fill_module.fill_prices, "fetch_timeout", 0.3)
+    monkeypatch.setattr(fill_module.fill_prices, "max_age", 0.0)
+
+    started = time.monotonic()
+    response = client.post("/api/trade", json={"account_id": 1, "asset": "AAPL", "side": "buy", "quantity": 1})
+    elapsed = time.monotonic() - started
+
+    assert response.status_code == 200
+    assert "No current price" in response.json()["error"]
+    assert elapsed < 1.0
+
+
+def test_trade_fills_at_server_price(client):
+    response = client.post("/api/trade", json={"account_id": 999999, "asset": "aapl", "side": "buy", "quantity": 1, "price": 1})
+    # The client's price is ignored; the account check runs after the fill.
+    assert response.json() == {"error": "Account not found"}
@@ -0,0 +1,36 @@
+import asyncio
+
+
+def test_snapshot_bench_fetches_the_full_universe_every_iteration(monkeypatch):
+    from backend.app.services import market_bench, market_data, market_simulator
+    from backend.app.services.instruments import MARKET_CRYPTO, MARKET_FOREX, MARKET_NASDAQ, instrument_registry
+    from backend.app.services.market_data import MarketDataService
+    from backend.app.services.market_snapshot import market_snapshot_publisher
+
+    scrapes = []
+    fetched = []
+
+    def scrape():
+        scrapes.append(1)
+        return {"status": "success", "data": [{"ticker": "IAM", "label": "Maroc Telecom", "closing_price": 100.0, "variation": 1.0}]}
+
+    async def snapshot(tickers):
+        fetched.append(len(tickers))
+        return {symbol: {"price": 1.0, "change_pct": 0.0, "volume": 1} for symbol in tickers}
+
+    async def history(tickers, points=20):
+        return {}
+
+    monkeypatch.setattr(market_simulator, "MARKET_DATA_SOURCE", "live")
+    monkeypatch.setattr(market_data, "scrape_casablanca_live_overview", scrape)
+    monkeypatch.setattr(MarketDataService, "get_yahoo_snapshot_async", staticmethod(snapshot))
+    monkeypatch.setattr(MarketDataService, "get_history_async", staticmethod(history))
+    monkeypatch.setattr(market_snapshot_publisher, "publish", lambda assets, status="live": None)
+
+    iterations = 4
+    report = asyncio.run(market_bench.run(iterations, 5))
+
+    universe = sum(len(instrument_registry.by_market(market)) for market in (MARKET_NASDAQ, MARKET_CRYPTO, MARKET_FOREX))
+    assert report["results"][0]["errors"] == 0
+    assert fetched == [universe] * iterations
+    assert len(scrapes) == iterations
@@ -0,0 +1,9 @@
+def test_width_sets_the_daily_history_budget(client):
+    plain = client.get("/api/market-history", params={"symbols": "AAPL"}).json()
+    assert len(plain["AAPL"]) == 20
+
+    wide = client.get("/api/market-history", params={"symbols": "AAPL", "width": 200}).json()
+    assert len(wide["AAPL"]) == 200
+
+    narrow = client.get("/api/market-history", params={"symbols": "AAPL", "width": 40, "points": 500}).json()
+    assert len(narrow["AAPL"]) == 40
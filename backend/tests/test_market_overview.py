@@ -0,0 +1,26 @@
+def test_compat_market_overview_returns_full_universe(client):
+    response = client.get("/market-overview")
+    assert response.status_code == 200
+    assets = response.json()
+    assert isinstance(assets, list) and assets
+    assert {"symbol", "price", "change_pct"} <= set(assets[0])
+
+
+def test_compat_market_overview_pages(client):
+    response = client.get("/market-overview", params={"sort": "symbol", "limit": 3})
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["items"]) == 3
+    assert page["next_cursor"]
+
+
+def test_legacy_market_overview_wrapper(client):
+    import asyncio
+
+    from starlette.requests import Request
+
+    from backend.app.api.market import get_market_overview
+
+    request = Request({"type": "http", "method": "GET", "path": "/market-overview", "headers": [], "query_string": b""})
+    response = asyncio.run(get_market_overview(request, minimal=False, sparkline=None))
+    assert response.status_code == 200
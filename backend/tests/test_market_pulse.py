@@ -0,0 +1,16 @@
+from backend.app.services.instruments import MARKET_FOREX, MARKET_NASDAQ
+from backend.app.services.market_snapshot import MarketSnapshot
+
+
+def test_market_pulse_rejects_markets_outside_the_registry(client):
+    response = client.get("/api/market-pulse", params={"market": "nyse"})
+    assert response.status_code == 400
+    assert client.get("/api/market-pulse", params={"market": "forex"}).status_code == 200
+
+
+def test_known_market_without_movers_has_empty_pulse():
+    snapshot = MarketSnapshot(1, [{"symbol": "AAPL", "market": MARKET_NASDAQ, "change_pct": 1.5}])
+    pulse = snapshot.market_pulse(MARKET_FOREX, 5)
+    assert pulse["gainers"] == [] and pulse["losers"] == []
+    assert pulse["breadth"]["advancers"] == 0
+    assert [row["symbol"] for row in snapshot.market_pulse(MARKET_NASDAQ, 5)["gainers"]] == ["AAPL"]
@@ -0,0 +1,18 @@
+from backend.app.services.market_simulator import MarketSimulator, _seed_value
+
+
+def test_non_numeric_seed_gives_a_reproducible_rng():
+    assert _seed_value("demo") == _seed_value(" demo ")
+    assert _seed_value("demo") != _seed_value("other")
+    assert _seed_value("-7") == 7
+    assert _seed_value("") is None
+    first, second = MarketSimulator(seed="demo"), MarketSimulator(seed="demo")
+    assert first._rng.random(4).tolist() == second._rng.random(4).tolist()
+
+
+def test_history_looks_up_the_symbol_and_ends_at_the_current_price():
+    simulator = MarketSimulator(seed="7")
+    history = simulator.history("AAPL", 30)
+    assert len(history) == 30
+    assert history == simulator.history("AAPL", 30)
+    assert simulator.history("NOT-LISTED", 30) == []
@@ -0,0 +1,24 @@
+from backend.app.services.market_snapshot import MarketSnapshot
+from backend.app.services.market_views import decode_cursor, encode_cursor
+
+
+def _asset(symbol, change_pct):
+    return {"symbol": symbol, "name": symbol, "market": "NASDAQ", "currency": "USD", "change_pct": change_pct}
+
+
+def test_cursor_from_previous_snapshot_resumes_after_its_position():
+    query = ("NASDAQ", None, "change_pct", "desc")
+    first = MarketSnapshot(1, [_asset("A", 5.0), _asset("B", 4.0), _asset("C", 3.0), _asset("D", 2.0), _asset("E", 1.0)])
+    symbols, last = first.views.view("NASDAQ", None, "change_pct").page(True, 2)
+    assert symbols == ["A", "B"]
+    cursor = encode_cursor(query, last)
+
+    # B, the last row of the page, is gone; C moved above it and F is new.
+    second = MarketSnapshot(2, [_asset("A", 5.0), _asset("C", 4.5), _asset("D", 2.0), _asset("E", 1.0), _asset("F", 3.5)])
+    after = decode_cursor(cursor, query, "change_pct")
+    symbols, last = second.views.view("NASDAQ", None, "change_pct").page(True, 2, after)
+    assert symbols == ["F", "D"]
+    symbols, last = second.views.view("NASDAQ", None, "change_pct").page(True, 2, last)
+    assert symbols == ["E"]
+    assert last is None
+    assert first.views is not second.views
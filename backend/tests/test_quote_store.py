@@ -0,0 +1,17 @@
+from backend.app.services import quote_store as quote_store_module
+from backend.app.services.quote_store import QuoteStore
+
+
+def test_misses_are_capped_within_the_ttl(monkeypatch):
+    monkeypatch.setattr(quote_store_module, "QUOTE_STORE_LIMIT", 10)
+    store = QuoteStore()
+    for start in range(0, 100, 7):
+        store.record([f"MISS{number}" for number in range(start, start + 7)], {})
+    assert len(store._misses) == 10
+    assert list(store._misses)[-1] == "MISS104"
+    assert "MISS0" not in store._misses
+
+    store.record(["MISS95"], {})
+    assert list(store._misses)[-1] == "MISS95"
+    store.record(["MISS95"], {"MISS95": {"price": 1.0}})
+    assert "MISS95" not in store._misses